@@ -0,0 +1,175 @@
+"""benchmarks for loris.dataframe.Transformer
+
+Run with asv (see asv.conf.json), e.g.::
+
+    asv run --python=same
+    asv continuous master HEAD
+
+`time_*` benchmarks measure runtime and `peakmem_*` benchmarks the peak
+memory of the process.
+"""
+
+import numpy as np
+
+from loris.dataframe import Transformer
+
+from .synthetic import raw_twophoton_table, roi_table, response_table
+
+
+class TolongRawTwoPhoton:
+    """expand timestamps and movies to different depths
+    """
+
+    params = ([10, 50], [100, 500], [1, 2, 3])
+    param_names = ['n_rows', 'length', 'max_depth']
+
+    def setup(self, n_rows, length, max_depth):
+        self.transformer = Transformer(
+            raw_twophoton_table(n_rows, length),
+            datacols=['timestamps', 'movie'],
+            indexcols=['subject_name', 'recording_id', 'rate'],
+        )
+
+    def time_tolong(self, n_rows, length, max_depth):
+        self.transformer.tolong(max_depth=max_depth)
+
+    def time_tolong_shared_axes(self, n_rows, length, max_depth):
+        self.transformer.tolong(
+            max_depth=max_depth, frame=dict(timestamps=0, movie=0)
+        )
+
+    def peakmem_tolong(self, n_rows, length, max_depth):
+        self.transformer.tolong(max_depth=max_depth)
+
+
+class TolongRoi:
+    """expand roi signals with shared time axes
+    """
+
+    params = ([100, 1000], [100, 1000], [False, True])
+    param_names = ['n_rows', 'length', 'ragged']
+
+    def setup(self, n_rows, length, ragged):
+        self.transformer = Transformer(
+            roi_table(n_rows, length, ragged=ragged),
+            datacols=['timestamps', 'signal'],
+            indexcols=['recording_id', 'cell_id', 'label', 'rate'],
+        )
+
+    def time_tolong(self, n_rows, length, ragged):
+        self.transformer.tolong()
+
+    def time_tolong_shared_axes(self, n_rows, length, ragged):
+        self.transformer.tolong(time=dict(timestamps=0, signal=0))
+
+    def time_cols_tolong(self, n_rows, length, ragged):
+        self.transformer.cols_tolong('signal')
+
+    def peakmem_tolong_shared_axes(self, n_rows, length, ragged):
+        self.transformer.tolong(time=dict(timestamps=0, signal=0))
+
+
+class ExpandCol:
+    """expand a column of nested long dataframes
+    """
+
+    params = ([100, 1000], [100, 1000])
+    param_names = ['n_rows', 'length']
+
+    def setup(self, n_rows, length):
+        self.transformer = Transformer(
+            response_table(n_rows, length),
+            datacols=['response'],
+            indexcols=['subject_name', 'cell_id'],
+        )
+
+    def time_expand_col(self, n_rows, length):
+        self.transformer.expand_col('response')
+
+    def time_expand_col_multiindex(self, n_rows, length):
+        self.transformer.expand_col('response', reset_index=False)
+
+    def time_expand_col_categorical(self, n_rows, length):
+        self.transformer.expand_col('response', categorical=True)
+
+    def peakmem_expand_col(self, n_rows, length):
+        self.transformer.expand_col('response')
+
+    def peakmem_expand_col_categorical(self, n_rows, length):
+        self.transformer.expand_col('response', categorical=True)
+
+
+class MapApply:
+    """map and apply functions to roi signals
+    """
+
+    params = ([1000, 10000], [100, 1000])
+    param_names = ['n_rows', 'length']
+
+    def setup(self, n_rows, length):
+        self.transformer = Transformer(
+            roi_table(n_rows, length),
+            datacols=['rate', 'timestamps', 'signal'],
+            indexcols=['recording_id', 'cell_id', 'label'],
+        )
+
+    def time_mapfunc(self, n_rows, length):
+        self.transformer.mapfunc(np.mean, 'signal', 'mean')
+
+    def time_applyfunc(self, n_rows, length):
+        self.transformer.applyfunc(
+            _dff, 'dff', 'signal', rate='rate'
+        )
+
+    def time_applyfunc_vectorized(self, n_rows, length):
+        self.transformer.applyfunc(
+            _dff, 'dff', 'signal', rate='rate', vectorized=True
+        )
+
+    def time_applyfunc_scalar(self, n_rows, length):
+        self.transformer.applyfunc(
+            _scale, 'scaled', 'rate', 'cell_id'
+        )
+
+    def time_applyfunc_scalar_vectorized(self, n_rows, length):
+        self.transformer.applyfunc(
+            _scale, 'scaled', 'rate', 'cell_id', vectorized=True
+        )
+
+    def peakmem_applyfunc(self, n_rows, length):
+        self.transformer.applyfunc(
+            _dff, 'dff', 'signal', rate='rate'
+        )
+
+
+class ParallelApply:
+    """apply functions to roi signals in a process pool
+    """
+
+    params = ([10000], [1000], [1, 2, 4])
+    param_names = ['n_rows', 'length', 'n_jobs']
+    timeout = 120
+
+    def setup(self, n_rows, length, n_jobs):
+        self.transformer = Transformer(
+            roi_table(n_rows, length),
+            datacols=['rate', 'timestamps', 'signal'],
+            indexcols=['recording_id', 'cell_id', 'label'],
+        )
+
+    def time_applyfunc(self, n_rows, length, n_jobs):
+        self.transformer.applyfunc(
+            _dff, 'dff', 'signal', rate='rate',
+            n_jobs=n_jobs, partition_by='recording_id'
+        )
+
+
+def _dff(signal, rate):
+    # baseline normalized signal per second (works per row or on
+    # stacked arrays)
+    baseline = signal[..., :10].mean(axis=-1, keepdims=True)
+    return (signal - baseline) / baseline * np.asarray(rate)[..., None]
+
+
+def _scale(rate, cell_id):
+    return rate * cell_id
@@ -0,0 +1,85 @@
+"""synthetic wide tables resembling tables of the loris schemas
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def raw_twophoton_table(n_rows, length, frame_shape=(8, 8), seed=0):
+    """table resembling RawTwoPhotonData with timestamps and movies
+
+    Parameters
+    ----------
+    n_rows : int
+        Number of recordings.
+    length : int
+        Number of frames in each recording.
+    frame_shape : tuple
+        Shape of each frame of a movie.
+    """
+
+    rng = np.random.default_rng(seed)
+
+    return pd.DataFrame({
+        'subject_name': [f'fly{idx // 5}' for idx in range(n_rows)],
+        'recording_id': np.arange(n_rows),
+        'rate': np.full(n_rows, 30.0),
+        'timestamps': [np.arange(length) / 30.0 for _ in range(n_rows)],
+        'movie': [
+            rng.random((length,) + tuple(frame_shape), dtype=np.float32)
+            for _ in range(n_rows)
+        ],
+    })
+
+
+def roi_table(n_rows, length, mask_shape=(8, 8), ragged=False, seed=0):
+    """table resembling ExtractedData.Roi with signals and timestamps
+
+    Parameters
+    ----------
+    n_rows : int
+        Number of rois.
+    length : int
+        Length of each signal. If ragged, the maximum length.
+    mask_shape : tuple
+        Shape of each roi mask.
+    ragged : bool
+        Whether signals have different lengths.
+    """
+
+    rng = np.random.default_rng(seed)
+    lengths = (
+        rng.integers(length // 2, length + 1, n_rows)
+        if ragged else np.full(n_rows, length)
+    )
+
+    return pd.DataFrame({
+        'recording_id': np.arange(n_rows) // 100,
+        'cell_id': np.arange(n_rows),
+        'label': [f'roi{idx % 10}' for idx in range(n_rows)],
+        'rate': np.full(n_rows, 30.0),
+        'mask': [rng.random(mask_shape) > 0.5 for _ in range(n_rows)],
+        'timestamps': [np.arange(n) / 30.0 for n in lengths],
+        'signal': [rng.standard_normal(n) for n in lengths],
+    })
+
+
+def response_table(n_rows, length, seed=0):
+    """table with a column of nested long dataframes, e.g. the responses
+    of each roi to each trial.
+    """
+
+    rng = np.random.default_rng(seed)
+
+    return pd.DataFrame({
+        'subject_name': [f'fly{idx // 50}' for idx in range(n_rows)],
+        'cell_id': np.arange(n_rows),
+        'response': [
+            pd.DataFrame({
+                'trial': np.repeat(np.arange(10), length // 10),
+                'time': np.tile(np.arange(length // 10) / 30.0, 10),
+                'response': rng.standard_normal(length // 10 * 10),
+            })
+            for _ in range(n_rows)
+        ],
+    })
@@ -0,0 +1,110 @@
+"""bulk import of a csv, parquet or json file into a table
+
+All rows are validated first (see `DynamicForm.bulk_insert`), then
+inserted in chunks within a single transaction. Progress is printed to
+stdout, which is streamed to the web UI.
+"""
+
+import argparse
+import sys
+import os
+import json
+import time
+import traceback
+
+
+def import_loris():
+    """import loris config and conn (add loris to path if not installed)
+    """
+
+    try:
+        from loris import config, conn
+    except (ModuleNotFoundError, ImportError):
+        filepath = __file__
+        for i in range(4):
+            filepath = os.path.dirname(filepath)
+        sys.path.append(filepath)
+        from loris import config, conn
+
+    return config, conn
+
+
+def read_rows(filepath):
+    """read file with one row per entry into a dataframe
+    """
+
+    from loris.app.readers import read_file, as_frame
+
+    return as_frame(read_file(filepath))
+
+
+def run(schema, table, filepath, kwargs, defaults=None):
+    """import file into table given the keyword arguments of
+    `DynamicForm.bulk_insert`; `defaults` are values set for all rows.
+
+    Returns
+    -------
+    n_inserted : int
+    """
+
+    config, conn = import_loris()
+    conn()
+
+    from loris.app.forms.dynamic_form import DynamicForm
+
+    # config['tables'] does not contain lookup and settings tables
+    table_class = getattr(config['schemata'][schema], table)
+    dynamicform = DynamicForm(table_class)
+
+    rows = read_rows(filepath)
+    for name, value in (defaults or {}).items():
+        rows[name] = value
+    print(
+        f"importing {len(rows)} rows into {schema}.{table}", flush=True
+    )
+
+    start = time.time()
+
+    def progress(done, total):
+        elapsed = time.time() - start
+        throughput = done / elapsed if elapsed else 0
+        print(
+            f"progress: {done}/{total} rows; {elapsed:.1f}s elapsed; "
+            f"{throughput:.1f} rows/s", flush=True
+        )
+
+    n_inserted = dynamicform.bulk_insert(rows, progress=progress, **kwargs)
+
+    print(
+        f"committed {n_inserted} rows in {time.time() - start:.1f}s",
+        flush=True
+    )
+    return n_inserted
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--schema", help="name of schema", type=str)
+    parser.add_argument(
+        "--table", help="name of table", type=str)
+    parser.add_argument(
+        "--file", help="csv, parquet or json file to import", type=str)
+    parser.add_argument(
+        "--kwargs", help="keyword arguments to pass to bulk_insert",
+        type=str
+    )
+
+    args = parser.parse_args()
+    # the import connects with the credentials of the app (as populate
+    # jobs do); the view sets the user name of all rows of non-admins
+    # through `defaults`, so users cannot import entries of others
+
+    kwargs = json.loads(args.kwargs)
+    defaults = kwargs.pop('defaults', None)
+
+    try:
+        run(args.schema, args.table, args.file, kwargs, defaults)
+    except Exception:
+        traceback.print_exc()
+        sys.exit(1)
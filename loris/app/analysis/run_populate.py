@@ -1,10 +1,205 @@
 """run populate
+
+Computes the keys left to populate once, splits them into chunks and
+populates the chunks in a pool of worker processes. Each worker opens a
+single database connection when it starts and reuses it for all its chunks.
+Progress (per-key timing and throughput) is printed to stdout, which is
+streamed to the web UI.
 """
 
 import argparse
 import sys
 import os
 import json
+import math
+import time
+import traceback
+import multiprocessing as mp
+
+
+# keys per chunk are capped so that progress is reported regularly
+MAX_CHUNKSIZE = 50
+# chunks per worker for load balancing
+CHUNKS_PER_WORKER = 4
+
+# table class of the worker process
+_table_class = None
+
+
+def import_loris():
+    """import loris config and conn (add loris to path if not installed)
+    """
+
+    try:
+        from loris import config, conn
+    except (ModuleNotFoundError, ImportError):
+        filepath = __file__
+        for i in range(4):
+            filepath = os.path.dirname(filepath)
+        sys.path.append(filepath)
+        from loris import config, conn
+
+    return config, conn
+
+
+def get_table_class(schema, table):
+    """connect to database and get table class
+    """
+
+    config, conn = import_loris()
+    conn()
+
+    return getattr(config['schemata'][schema], table)
+
+
+def init_worker(schema, table):
+    """connect once per worker process
+    """
+
+    global _table_class
+    _table_class = get_table_class(schema, table)
+
+
+def populate_keys(keys, kwargs, table_class=None):
+    """populate each key separately and time it
+
+    Returns
+    -------
+    timings : list of tuples
+        (key, seconds, error message or None) for each key.
+    """
+
+    if table_class is None:
+        table_class = _table_class
+
+    suppress_errors = kwargs.get('suppress_errors', False)
+    timings = []
+
+    for key in keys:
+        start = time.time()
+        try:
+            table_class.populate(**{**kwargs, 'restriction': key})
+        except Exception as e:
+            if not suppress_errors:
+                raise
+            timings.append((key, time.time() - start, f"{e}"))
+        else:
+            timings.append((key, time.time() - start, None))
+
+    return timings
+
+
+def chunk_keys(keys, n_workers):
+    """split keys into chunks for the workers
+    """
+
+    chunksize = math.ceil(len(keys) / (n_workers * CHUNKS_PER_WORKER))
+    chunksize = min(max(chunksize, 1), MAX_CHUNKSIZE)
+
+    return [
+        keys[idx:idx + chunksize]
+        for idx in range(0, len(keys), chunksize)
+    ]
+
+
+def keys_to_populate(table_class, restriction=None, limit=None):
+    """keys of the key source that are not populated yet
+    """
+
+    key_source = table_class.key_source
+    if restriction:
+        key_source = key_source & restriction
+
+    keys = (key_source - table_class).fetch('KEY')
+
+    if limit is not None:
+        keys = keys[:limit]
+
+    return list(keys)
+
+
+def report(done, total, timings, start):
+    """print progress of populate
+    """
+
+    elapsed = time.time() - start
+    throughput = done / elapsed if elapsed else 0
+    for key, seconds, error in timings:
+        status = 'failed' if error else 'done'
+        print(f"{status} {key} in {seconds:.2f}s", flush=True)
+        if error:
+            print(f"    {error}", flush=True)
+    print(
+        f"progress: {done}/{total} keys; "
+        f"{elapsed:.1f}s elapsed; {throughput:.3f} keys/s",
+        flush=True
+    )
+
+
+def run(schema, table, kwargs):
+    """populate table in parallel given the populate keyword arguments
+
+    Returns
+    -------
+    failed : int
+        number of keys that failed (only if errors are suppressed).
+    """
+
+    table_class = get_table_class(schema, table)
+
+    kwargs = dict(kwargs)
+    n_workers = kwargs.pop('multiprocess', 0) or 1
+    limit = kwargs.pop('limit', None)
+    restriction = kwargs.pop('restriction', None)
+
+    keys = keys_to_populate(table_class, restriction, limit)
+    total = len(keys)
+    n_workers = max(min(n_workers, total), 1)
+
+    print(
+        f"populating {total} keys of {schema}.{table} "
+        f"with {n_workers} worker(s)", flush=True
+    )
+
+    start = time.time()
+    done = 0
+    failed = 0
+
+    if n_workers == 1:
+        # populate in this process with the existing connection
+        for chunk in chunk_keys(keys, n_workers):
+            timings = populate_keys(chunk, kwargs, table_class)
+            done += len(timings)
+            failed += sum(error is not None for _, _, error in timings)
+            report(done, total, timings, start)
+    else:
+        # spawn so that workers do not share the parent's connection
+        context = mp.get_context('spawn')
+        with context.Pool(
+            n_workers, initializer=init_worker, initargs=(schema, table)
+        ) as pool:
+            results = pool.imap_unordered(
+                _populate_chunk,
+                [(chunk, kwargs) for chunk in chunk_keys(keys, n_workers)]
+            )
+            for timings in results:
+                done += len(timings)
+                failed += sum(error is not None for _, _, error in timings)
+                report(done, total, timings, start)
+
+    elapsed = time.time() - start
+    print(
+        f"finished {done - failed}/{total} keys in {elapsed:.1f}s "
+        f"({(done / elapsed if elapsed else 0):.3f} keys/s); "
+        f"{failed} failed", flush=True
+    )
+
+    return failed
+
+
+def _populate_chunk(args):
+    keys, kwargs = args
+    return populate_keys(keys, kwargs)
 
 
 if __name__ == '__main__':
@@ -22,22 +217,10 @@ if __name__ == '__main__':
 
     kwargs = json.loads(args.kwargs)
 
-    # add loris to path if not installed
     try:
-        from loris import config, conn
-    except (ModuleNotFoundError, ImportError):
-        filepath = __file__
-        for i in range(4):
-            filepath = os.path.dirname(filepath)
-        print(filepath)
-        sys.path.append(filepath)
-        from loris import config, conn
-
-    conn()
-
-    table_class = getattr(
-        config['schemata'][args.schema],
-        args.table
-    )
+        failed = run(args.schema, args.table, kwargs)
+    except Exception:
+        traceback.print_exc()
+        sys.exit(1)
 
-    table_class.populate(**kwargs)
+    sys.exit(1 if failed else 0)
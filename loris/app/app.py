@@ -8,6 +8,9 @@ import dash_html_components as html
 
 from loris import config
 from loris.app.login import User
+from loris.app.scheduler import Scheduler
+from loris.app.uploads import UploadStore
+from loris.app.erd import ErdCache
 
 
 if config['init_database']:
@@ -19,15 +22,17 @@ if config['init_database']:
 
 class LorisApp(Flask):
 
-    def session_refresh(self):
-        config.refresh()
-        # for testing when refresh happens
-        config.refresh()
+    def session_refresh(self, force=False):
+        config.refresh(force=force)
         self.config['schemata'] = list(config['schemata'].keys())
         self.config['tables'], self.config['autotables'] = \
             config.tables_to_list()
 
 
+if config['connection_pool_size'] is not None:
+    config.start_pool()
+
+
 app = LorisApp(__name__)
 app.secret_key = config['secret_key']
 app.config['include_fish'] = config['include_fish']
@@ -35,6 +40,12 @@ app.config['external_wiki'] = config['external_wiki']
 app.config['schemata'] = list(config['schemata'].keys())
 app.config['tables'], app.config['autotables'] = config.tables_to_list()
 
+config['_scheduler'] = Scheduler.from_config(config)
+config['_uploads'] = UploadStore.from_config(config)
+config['_erds'] = ErdCache()
+# the connection used during startup is not needed by the main thread
+config.checkin()
+
 login_manager = LoginManager(app)
 
 # Test of dash app
@@ -44,6 +55,11 @@ dash_app.layout = html.Div(
 )
 
 
+@app.teardown_request
+def checkin_connection(exception=None):
+    config.checkin()
+
+
 @login_manager.user_loader
 def load_user(user_id):
     return User(user_id)
@@ -29,7 +29,6 @@ from loris.app.forms.formmixin import FormMixin
 from loris.app.autoscripting.form_creater import dynamic_autoscripted_form
 from loris.app.forms.fixed import SettingsNameForm
 from loris.errors import LorisError
-from loris.app.subprocess import Run
 
 
 CURRENT_CONFIG = "_current_config.pkl"
@@ -182,8 +181,8 @@ class ConfigReader:
 
         return truth
 
-    def run(self, button):
-        """run subprocess given the button key
+    def run(self, button, user=None):
+        """queue subprocess given the button key
         """
 
         # assert that script exists
@@ -210,48 +209,55 @@ class ConfigReader:
         # save configurations to pickle file
         with open(self.current_config_file, 'wb') as f:
             pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        # each queued job gets its own copy of the configuration
+        location = os.path.join(
+            config['tmp_folder'], f'{uuid.uuid4()}{CURRENT_CONFIG}'
+        )
+        with open(location, 'wb') as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
 
-        process = config.get('subprocess', Run())
+        if self.buttons[button].get('insert', False):
+            # running the insert script
+            command = [
+                "python",
+                "-u",
+                f"{INSERT_SCRIPT}",
+                "--tablename",
+                f"{self.table_name}",
+                "--script",
+                f"{script_file}",
+                "--location",
+                f"{location}",
+                "--outputfile",
+                f"{self.buttons.get('outputfile', 'null')}",
+                "--configattr",
+                f"{self.buttons.get('configattr', 'null')}",
+                "--outputattr",
+                f"{self.buttons.get('outputattr', 'null')}",
+            ]
+        else:
+            # just run the python script
+            command = [
+                "python",
+                "-u",
+                f"{script_file}",
+                "--location",
+                f"{location}",
+            ]
+
+        job_id = config['_scheduler'].submit(
+            self.job_name, command, os.path.dirname(script_file), user=user,
+            files=[location]
+        )
+        flash(f'queued script {script}')
 
-        if not process.running:
+        return job_id
 
-            if self.buttons[button].get('insert', False):
-                # running the insert script
-                command = [
-                    "python",
-                    "-u",
-                    f"{INSERT_SCRIPT}",
-                    "--tablename",
-                    f"{self.table_name}",
-                    "--script",
-                    f"{script_file}",
-                    "--location",
-                    f"{self.current_config_file}",
-                    "--outputfile",
-                    f"{self.buttons.get('outputfile', 'null')}",
-                    "--configattr",
-                    f"{self.buttons.get('configattr', 'null')}",
-                    "--outputattr",
-                    f"{self.buttons.get('outputattr', 'null')}",
-                ]
-            else:
-                # just run the python script
-                command = [
-                    "python",
-                    "-u",
-                    f"{script_file}",
-                    "--location",
-                    f"{self.current_config_file}",
-                ]
-
-            process.start(command, os.path.dirname(script_file))
-            config['subprocess'] = process
-            flash(f'running script {script}')
-        else:
-            flash(
-                'Abort running subprocess before running a new process',
-                'warning'
-            )
+    @property
+    def job_name(self):
+        """name of jobs in the scheduler
+        """
+        return f'{self.table_name}/{self.autoscript_folder}'
 
     def save_settings(self):
         """save new settings to _save_settings.json - creates uuid
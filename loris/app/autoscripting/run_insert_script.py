@@ -162,20 +162,16 @@ if __name__ == '__main__':
             cwd = os.path.dirname(args.script)
             process.start(command, cwd)
 
-            lnumbers = 0
+            # stream output of script as it arrives
+            offset = 0
             while True:
-                length = len(process.lines)
-                if length > lnumbers:
-                    print(''.join(process.lines[lnumbers:length]))
-                    lnumbers = length
-                if process.p is not None and process.p.poll() is not None:
+                output, offset = process.wait_output(offset)
+                if output:
+                    print(output, end='', flush=True)
+                elif process.stdout_buffer.closed:
                     break
 
-            if process.thread.is_alive():
-                process.wait()
-
-            if process.stdout is not None:
-                print(process.stdout)
+            process.wait()
 
             if process.rc != 0:
                 raise LorisError(f'automatic script error:\n{process.stderr}')
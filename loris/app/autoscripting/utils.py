@@ -2,10 +2,10 @@
 """
 
 import numpy as np
-import json
-import pickle
 import pandas as pd
 
+from loris.app.readers import read_file, read_json, as_array, as_frame
+
 
 def json_reader(value):
     """read json file fields
@@ -13,10 +13,7 @@ def json_reader(value):
     if value is None:
         return
 
-    with open(value, 'r') as f:
-        value = json.load(f)
-
-    return value
+    return read_json(value)
 
 
 def array_reader(value):
@@ -25,13 +22,7 @@ def array_reader(value):
     if value is None:
         return
 
-    if value.endswith('npy'):
-        value = np.load(value)
-    elif value.endswith('csv'):
-        value = pd.read_csv(value).values
-    elif value.endswith('pkl'):
-        with open(value, 'rb') as f:
-            value = pickle.load(f)
+    value = as_array(read_file(value))
 
     assert isinstance(value, np.ndarray)
     return value
@@ -53,15 +44,7 @@ def frame_reader(value):
     if value is None:
         return
 
-    if value.endswith('csv'):
-        value = pd.read_csv(value)
-    elif value.endswith('pkl'):
-        with open(value, 'rb') as f:
-            value = pickle.load(f)
-    elif value.endswith('npy'):
-        value = pd.DataFrame(np.load(value))
-    elif value.endswith('json'):
-        value = pd.DataFrame(json_reader(value))
+    value = as_frame(read_file(value))
 
     assert isinstance(value, pd.DataFrame)
     return value
@@ -0,0 +1,60 @@
+"""entity relationship diagrams laid out in the browser
+
+Diagrams are served as json graphs (see `loris.app.utils.dependency_graph`)
+that are keyed by a hash of the dependency graph, so that a graph is
+reused until the schema changes.
+"""
+
+import hashlib
+import threading
+
+
+def graph_digest(dependencies):
+    """hash of the tables and foreign keys of a dependency graph
+
+    Alias nodes of renamed foreign keys are numbered in the order in which
+    they were loaded, so edges through them are hashed by the tables they
+    connect.
+    """
+
+    edges = []
+    for parent, child, data in dependencies.edges(data=True):
+        if parent.isdigit():
+            continue
+        if child.isdigit():
+            child = next(iter(dependencies.successors(child)))
+        edges.append((parent, child, sorted(data.items(), key=str)))
+
+    digest = hashlib.sha1()
+    for node in sorted(dependencies.nodes):
+        if not node.isdigit():
+            digest.update(f'{node}\n'.encode())
+    for edge in sorted(edges, key=str):
+        digest.update(f'{edge!r}\n'.encode())
+    return digest.hexdigest()
+
+
+class ErdCache:
+    """json graphs of diagrams by name, valid for a single dependency
+    graph digest
+    """
+
+    def __init__(self):
+        self._graphs = {}
+        self._lock = threading.Lock()
+
+    def get_graph(self, name, digest):
+        """cached graph of the diagram called name (see
+        `loris.app.utils.dependency_graph`) or None if the dependency
+        graph changed.
+        """
+
+        with self._lock:
+            graph = self._graphs.get(name, None)
+        if graph is None or graph['digest'] != digest:
+            return None
+        return graph
+
+    def set_graph(self, name, graph):
+        with self._lock:
+            self._graphs[name] = graph
@@ -0,0 +1,176 @@
+"""export (joined) tables in batches to parquet, feather or csv
+
+Relations are fetched in primary key ordered batches (see
+`loris.dataframe.Fetcher`), so that only one batch is in memory at a
+time. Blobs are either excluded or written as separate .npy files next
+to the table in a zip archive.
+"""
+
+import os
+import uuid
+import zipfile
+
+import numpy as np
+
+from loris.errors import LorisError
+from loris.dataframe.fetcher import (
+    Fetcher, write_parquet, write_feather, write_csv, csv_lines
+)
+
+
+WRITERS = {
+    'parquet': write_parquet,
+    'feather': write_feather,
+    'csv': write_csv,
+}
+BLOB_OPTIONS = ('exclude', 'npy')
+BLOB_FOLDER = 'blobs'
+
+
+def blob_attributes(relation):
+    """attributes that are not plain values (blobs, attachments, filepaths)
+    """
+
+    non_blobs = set(relation.heading.non_blobs)
+    return [name for name in relation.heading.names if name not in non_blobs]
+
+
+def _sidecars(batches, blobs, archive):
+    """write blob values of each batch into archive and replace them
+    with the paths of the .npy files
+    """
+
+    for batch in batches:
+        batch = batch.reset_index()
+        for name in blobs:
+            paths = []
+            for value in batch[name]:
+                if value is None:
+                    paths.append(None)
+                    continue
+                path = f'{BLOB_FOLDER}/{name}/{uuid.uuid4().hex}.npy'
+                with archive.open(path, 'w', force_zip64=True) as f:
+                    np.save(f, np.asanyarray(value), allow_pickle=True)
+                paths.append(path)
+            batch[name] = paths
+        yield batch
+
+
+def _plain(batches):
+    for batch in batches:
+        yield batch.reset_index()
+
+
+def export_relation(
+    relation, folder, fmt='parquet', blobs='exclude', batch_size=1000
+):
+    """write relation to a file in folder
+
+    Parameters
+    ----------
+    relation : datajoint expression
+        (Joined) relation to export.
+    folder : str
+        Folder to write the file to.
+    fmt : str
+        'parquet', 'feather' or 'csv'.
+    blobs : str
+        'exclude' to skip blob attributes or 'npy' to write each blob as a
+        .npy file; the table and the .npy files are then put into a zip
+        archive and the blob columns contain the paths within the archive.
+        Attachments and filepaths are always skipped.
+    batch_size : int
+        Number of entries fetched at a time.
+
+    Returns
+    -------
+    filename : str
+        Name of the file in folder.
+    """
+
+    if fmt not in WRITERS:
+        raise LorisError(
+            f'Format {fmt} not supported; choose from {list(WRITERS)}.'
+        )
+    if blobs not in BLOB_OPTIONS:
+        raise LorisError(
+            f'Blob option {blobs} not supported; '
+            f'choose from {list(BLOB_OPTIONS)}.'
+        )
+
+    skipped = blob_attributes(relation)
+    if blobs == 'npy':
+        sidecars = [
+            name for name in skipped if relation.heading[name].is_blob
+        ]
+    else:
+        sidecars = []
+
+    relation = relation.proj(*(
+        name for name in relation.heading.secondary_attributes
+        if name not in skipped or name in sidecars
+    ))
+    fetcher = Fetcher(relation, batch_size=batch_size)
+
+    name = uuid.uuid4().hex
+    table_filename = f'{name}.{fmt}'
+    table_filepath = os.path.join(folder, table_filename)
+
+    if not sidecars:
+        filename = table_filename
+    else:
+        filename = f'{name}.zip'
+    filepath = os.path.join(folder, filename)
+
+    kwargs = {}
+    if fmt != 'csv':
+        # types of columns that are empty in the first batch;
+        # blob columns hold the paths of the .npy files
+        kwargs['types'] = {
+            **fetcher.arrow_types(), **{name: 'string' for name in sidecars}
+        }
+
+    try:
+        if not sidecars:
+            n_rows = WRITERS[fmt](
+                _plain(fetcher.batches()), table_filepath, **kwargs
+            )
+        else:
+            # parquet, feather and npy files are not compressed further
+            with zipfile.ZipFile(filepath, 'w', zipfile.ZIP_STORED) as archive:
+                n_rows = WRITERS[fmt](
+                    _sidecars(fetcher.batches(), sidecars, archive),
+                    table_filepath, **kwargs
+                )
+                if n_rows:
+                    archive.write(table_filepath, f'table.{fmt}')
+        if not n_rows:
+            raise LorisError('No entries to export.')
+    except Exception:
+        if os.path.exists(filepath):
+            os.remove(filepath)
+        raise
+    finally:
+        if sidecars and os.path.exists(table_filepath):
+            os.remove(table_filepath)
+
+    return filename
+
+
+def stream_csv(relation, batch_size=1000):
+    """csv text of relation without blobs in batches, e.g. for streaming
+    an HTTP response
+
+    Yields
+    ------
+    text : str
+    """
+
+    skipped = blob_attributes(relation)
+    relation = relation.proj(*(
+        name for name in relation.heading.secondary_attributes
+        if name not in skipped
+    ))
+    fetcher = Fetcher(relation, batch_size=batch_size)
+
+    yield from csv_lines(_plain(fetcher.batches()))
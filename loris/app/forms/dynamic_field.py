@@ -2,6 +2,7 @@
 """
 
 import datetime
+import decimal
 import os
 import warnings
 import pandas as pd
@@ -25,7 +26,9 @@ from werkzeug.datastructures import FileStorage
 
 from loris import config
 from loris.utils import is_manuallookup
-from loris.app.utils import name_lookup, datareader
+from loris.app.utils import (
+    name_lookup, datareader, get_foreign_data, invalidate_foreign_data
+)
 from loris.app.forms import NONES
 from loris.app.forms.formmixin import (
     ManualLookupForm, ParentFormField, DynamicFileField, DictField, ListField,
@@ -133,10 +136,7 @@ class DynamicField:
 
     @property
     def foreign_data(self):
-        if self.aliased is None:
-            data = self.foreign_table.proj(self.name).fetch()[self.name]
-        else:
-            data = self.foreign_table.proj(**self.aliased).fetch()[self.name]
+        data = get_foreign_data(self.foreign_table, self.name, self.aliased)
         # sort values if integer
         if match_type(self.attr.type) == "INTEGER":
             data = np.sort(data)
@@ -418,6 +418,10 @@ class DynamicField:
             kwargs['validators'].append(Email())
         elif attr_type_name == 'lookupname':
             kwargs['validators'].append(LookupNameValidator())
+        elif attr_type_name in ('memmaparray', 'chunkedarray'):
+            # the uploaded .npy file is copied into the filestore
+            kwargs['validators'] = [Optional(), Extension(['npy'])]
+            return AttachFileField(**kwargs)
 
         return self._create_field(attr_type, kwargs)
 
@@ -493,6 +497,7 @@ class DynamicField:
                         "An error occured while inserting into parent table"
                         f" {self.foreign_table.full_table_name}: {e}"
                     )
+                invalidate_foreign_data(self.foreign_table.full_table_name)
                 if self.aliased is None:
                     value = value[self.name]
                 else:
@@ -505,6 +510,44 @@ class DynamicField:
 
         return value
 
+    def convert_value(self, value):
+        """convert a value read from a file (e.g. a string of a csv file)
+        to the type the database returns for the attribute, so that it
+        can be compared to existing entries.
+        """
+
+        if value is None or self.attr.is_blob:
+            return value
+
+        try:
+            type = match_type(self.attr.type)
+        except dj.DataJointError:
+            # adapted types
+            return value
+
+        if type == 'INTEGER':
+            if isinstance(value, float) and not value.is_integer():
+                raise ValueError(f"{value!r} is not an integer")
+            return int(value)
+        elif type == 'FLOAT':
+            return float(value)
+        elif type == 'DECIMAL':
+            return decimal.Decimal(str(value))
+        elif type in ('STRING', 'ENUM'):
+            return str(value)
+        elif type == 'UUID':
+            if isinstance(value, uuid.UUID):
+                return value
+            return uuid.UUID(str(value))
+        elif type == 'TEMPORAL':
+            sql_type = self.attr.type.split('(')[0].strip().lower()
+            if sql_type in ('datetime', 'timestamp'):
+                return pd.Timestamp(value).to_pydatetime()
+            elif sql_type == 'date':
+                return pd.Timestamp(value).date()
+
+        return value
+
     @staticmethod
     def _process_blob_value(value):
         """process blobs by loading files
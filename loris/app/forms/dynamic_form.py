@@ -18,8 +18,11 @@ from loris.errors import LorisError
 from loris import config
 from loris.app.forms.dynamic_field import DynamicField
 from loris.app.forms.formmixin import FormMixin, ParentFormField
-from loris.app.utils import draw_helper, get_jsontable
-from loris.utils import save_join
+from loris.app.utils import (
+    get_jsontable, use_serverside, get_serverside_url, serverside_relation,
+    invalidate_foreign_data
+)
+from loris.utils import save_join, is_manuallookup
 
 
 class DynamicForm:
@@ -197,14 +200,11 @@ class DynamicForm:
         if name in self.joined_datatable_container:
             return self.joined_datatable_container[name]
 
-        joined_table = save_join([self.table]+tables)
-
-        if self.restriction is not None:
-            joined_table = joined_table & self.restriction
+        joined_table = save_join(
+            [self.table]+tables, self.restriction, skip_blobs=True
+        )
 
-        datatable = joined_table.proj(
-            *joined_table.heading.non_blobs
-        ).fetch(
+        datatable = joined_table.fetch(
             format='frame', apply_adapter=False
         ).reset_index()
 
@@ -218,22 +218,49 @@ class DynamicForm:
         self, edit_url=None, delete_url=None, overwrite_url=None,
         join_tables=None,
         joined_name=None,
-        load_url=None
+        load_url=None,
+        server_side=None
     ):
+        """get json table for rendering with datatables
 
+        If `server_side` is True, only the columns are fetched and the rows
+        are loaded page by page. If None, `server_side` is set to True for
+        tables with more rows than `serverside_row_limit` in the config.
+        """
+
+        tables = [self.table]
         if join_tables is not None:
+            tables = tables + list(join_tables)
+
+        if server_side is None:
+            server_side = (
+                self.restriction is None
+                and use_serverside(tables)
+            )
+
+        if server_side:
+            joined_table = serverside_relation(tables)
+            heading = joined_table.proj(
+                *joined_table.heading.non_blobs
+            ).heading
+            table = pd.DataFrame(columns=heading.names)
+            primary_key = heading.primary_key
+            ajax_url = get_serverside_url(tables)
+        elif join_tables is not None:
             table, primary_key = self.get_joined_datatable(
                 join_tables, joined_name
             )
+            ajax_url = None
         else:
             table = self.datatable
             primary_key = self.table.primary_key
+            ajax_url = None
 
         return get_jsontable(
             table, primary_key,
             edit_url=edit_url, delete_url=delete_url,
             overwrite_url=overwrite_url, name=self.table.name,
-            load_url=load_url
+            load_url=load_url, ajax_url=ajax_url
         )
 
     def insert(self, form, _id=None, **kwargs):
@@ -403,8 +430,217 @@ class DynamicForm:
                         f"{self.table.full_table_name}: {e}"
                     )
 
+        invalidate_foreign_data(self.table.full_table_name)
+
         return primary_dict
 
+    def bulk_insert(
+        self, rows, chunk_size=1000, progress=None, check_reserved=True,
+        max_errors=20, **kwargs
+    ):
+        """insert many entries into the table (without part tables)
+
+        Every row is formatted with `DynamicField.format_value` and checked
+        before anything is inserted. Missing entries of manual lookup
+        parents are created in one batch and the rows are inserted in
+        chunks; everything happens within a single transaction.
+
+        Parameters
+        ----------
+        rows : pandas.DataFrame or list of dicts
+            Entries to insert; columns are attribute names. Missing values
+            (None or NaN) are treated as not given.
+        chunk_size : int
+            Number of entries per insert statement.
+        progress : callable
+            Called with the number of inserted entries and the total
+            number of entries after each chunk.
+        check_reserved : bool
+            Check that no entry has been reserved in the jobs table.
+        max_errors : int
+            Maximum number of row errors reported.
+        kwargs : dict
+            arguments passed to datajoint Table.insert function
+            (e.g. skip_duplicates).
+
+        Returns
+        -------
+        n_inserted : int
+        """
+
+        if isinstance(rows, pd.DataFrame):
+            rows = rows.astype(object).where(rows.notna(), None)
+            rows = rows.to_dict('records')
+        else:
+            rows = [dict(row) for row in rows]
+
+        columns = set().union(*rows) if rows else set()
+        unknown = columns - set(self.fields)
+        if unknown:
+            raise LorisError(
+                f"Columns {sorted(unknown)} are not attributes of table "
+                f"{self.table.full_table_name}."
+            )
+
+        required = [
+            name for name, field in self.fields.items()
+            if not (
+                field.attr.nullable or field.attr.autoincrement
+                or field.attr.default is not None
+            )
+        ]
+        blobs = [
+            name for name in columns
+            if self.fields[name].attr.is_blob
+        ]
+
+        # values read from files (e.g. dates of csv files or integers with
+        # missing values read as floats) are converted to the types the
+        # database returns, before they are compared to existing entries
+        errors = []
+        invalid = set()
+        for idx, row in enumerate(rows):
+            try:
+                for name, value in row.items():
+                    if value is not None and name not in blobs:
+                        row[name] = self.fields[name].convert_value(value)
+            except (ValueError, TypeError, ArithmeticError) as e:
+                errors.append(f"row {idx}: {name}={value!r}: {e}")
+                invalid.add(idx)
+                if len(errors) >= max_errors:
+                    break
+
+        # values of foreign keys and lookup entries to create
+        lookups = []
+        foreign_values = {}
+        for name in columns:
+            field = self.fields[name]
+            if not field.is_foreign_key:
+                continue
+            foreign_name = (
+                name if field.aliased is None else field.aliased[name]
+            )
+            existing = set(field.foreign_table.fetch(foreign_name))
+            values = {
+                row[name] for idx, row in enumerate(rows)
+                if row.get(name) is not None and idx not in invalid
+            }
+            if field.foreign_is_manuallookup and is_manuallookup(
+                field.foreign_table
+            ):
+                lookups.append((
+                    field.foreign_table,
+                    [{foreign_name: value} for value in values - existing]
+                ))
+            else:
+                foreign_values[name] = existing
+
+        entries = []
+        for idx, row in enumerate(rows):
+            if len(errors) >= max_errors:
+                break
+            entry = {}
+            if idx in invalid:
+                entries.append(entry)
+                continue
+            try:
+                missing = [
+                    name for name in required if row.get(name) is None
+                ]
+                if missing:
+                    raise LorisError(f"missing values for {missing}")
+                for name, value in row.items():
+                    if value is None:
+                        continue
+                    field = self.fields[name]
+                    if (
+                        name in foreign_values
+                        and value not in foreign_values[name]
+                    ):
+                        raise LorisError(
+                            f"{name}={value!r} does not exist in "
+                            f"{field.foreign_table.full_table_name}"
+                        )
+                    if name in blobs:
+                        # files are read chunk by chunk during insertion
+                        entry[name] = value
+                    elif field.foreign_is_manuallookup:
+                        entry[name] = field.format_value(
+                            {'existing_entries': value}
+                        )
+                    else:
+                        entry[name] = field.format_value(value)
+            except Exception as e:
+                errors.append(f"row {idx}: {e}")
+                if len(errors) >= max_errors:
+                    break
+            entries.append(entry)
+
+        if check_reserved and not errors:
+            jobs = config['schemata'][self.table.database].schema.jobs
+            reserved = set((
+                jobs & {'table_name': self.table.full_table_name}
+            ).fetch('key_hash'))
+            for idx, entry in enumerate(entries):
+                primary_dict = {
+                    key: value for key, value in entry.items()
+                    if key in self.table.primary_key
+                }
+                if key_hash(primary_dict) in reserved:
+                    errors.append(
+                        f"row {idx}: entry {primary_dict} has been "
+                        "reserved; change your primary key values."
+                    )
+                    if len(errors) >= max_errors:
+                        break
+
+        if errors:
+            raise LorisError(
+                f"{len(errors)} invalid row(s) for table "
+                f"{self.table.full_table_name}:\n" + '\n'.join(errors)
+            )
+
+        def insert_helper():
+            for lookup_table, lookup_entries in lookups:
+                if lookup_entries:
+                    lookup_table.insert(lookup_entries, skip_duplicates=True)
+
+            for start in range(0, len(entries), chunk_size):
+                chunk = entries[start:start + chunk_size]
+                if blobs:
+                    chunk = [
+                        {
+                            key: (
+                                self.fields[key].format_value(value)
+                                if key in blobs else value
+                            )
+                            for key, value in entry.items()
+                        }
+                        for entry in chunk
+                    ]
+                try:
+                    self.table.insert(chunk, **kwargs)
+                except dj.DataJointError as e:
+                    raise dj.DataJointError(
+                        "An error occured while inserting rows "
+                        f"{start}-{start + len(chunk) - 1} into table "
+                        f"{self.table.full_table_name}: {e}"
+                    )
+                if progress is not None:
+                    progress(start + len(chunk), len(entries))
+
+        if self.table.connection.in_transaction:
+            insert_helper()
+        else:
+            with self.table.connection.transaction:
+                insert_helper()
+
+        # bulk inserts run in a job subprocess, so cached foreign key
+        # choices of the app are not invalidated here; the app notices
+        # the new rows when it probes the tables (see `get_foreign_data`)
+
+        return len(entries)
+
     def populate_form(
         self, restriction, form, is_edit='False', **kwargs
     ):
@@ -453,8 +689,3 @@ class DynamicForm:
         for field in self.fields.values():
             field.update_field(form)
 
-    def draw_relations(self):
-        """draw relations
-        """
-
-        return draw_helper(self.table)
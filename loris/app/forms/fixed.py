@@ -249,6 +249,36 @@ def dynamic_jointablesform():
                 'nullable': True
             }
         )
+        download_format = SelectField(
+            'download format',
+            description='file format of downloaded table (csv is streamed)',
+            choices=[
+                ('parquet', 'parquet'),
+                ('feather', 'feather'),
+                ('csv', 'csv'),
+            ],
+            default='parquet',
+            validators=[InputRequired()]
+        )
+        blobs = SelectField(
+            'blobs',
+            description='exclude blobs or add them as .npy files to a zip archive',
+            choices=[
+                ('exclude', 'exclude'),
+                ('npy', '.npy files'),
+            ],
+            default='exclude',
+            validators=[InputRequired()]
+        )
+        confirm = BooleanField(
+            'confirm large join',
+            description=(
+                'join even if the estimated number of rows '
+                'exceeds the row budget'
+            ),
+            default=False,
+            validators=[Optional()]
+        )
 
     return JoinTablesForm
 
@@ -466,12 +496,44 @@ def dynamic_runform(table_class):
         )
         multiprocess = IntegerField(
             'multiprocess',
-            description='use multiple cpus - 0 means False',
+            description='number of worker processes - 0 means a single process',
             default=0,
             validators=[
                 InputRequired(),
                 NumberRange(min=0, max=config['max_cpu'])
             ]
         )
+        priority = IntegerField(
+            'priority',
+            description='queued jobs with higher priority are run first',
+            default=0,
+            validators=[Optional()]
+        )
 
     return RunForm
+
+
+class ImportForm(Form, FormMixin):
+    import_file = DynamicFileField(
+        'file',
+        description='csv, parquet or json file with a column for each attribute',
+        validators=[InputRequired(), Extension(['csv', 'parquet', 'json'])]
+    )
+    chunk_size = IntegerField(
+        'chunk size',
+        description='number of entries per insert statement',
+        default=1000,
+        validators=[InputRequired(), NumberRange(min=1)]
+    )
+    skip_duplicates = BooleanField(
+        'skip duplicates',
+        description='skip entries whose primary key already exists',
+        default=False,
+        validators=[Optional()]
+    )
+    priority = IntegerField(
+        'priority',
+        description='queued jobs with higher priority are run first',
+        default=0,
+        validators=[Optional()]
+    )
@@ -12,12 +12,16 @@ from wtforms.widgets import HiddenInput
 from wtforms import Form as NoCsrfForm
 from flask_wtf.file import FileField
 from werkzeug.utils import secure_filename
+from flask import url_for
+from flask_login import current_user
 from wtforms.validators import InputRequired, Optional, NumberRange, \
     ValidationError, Length, UUID, URL, Email, StopValidation
 import datajoint as dj
 
 from loris import config
 from loris.app.forms import NONES
+from loris.app.uploads import Upload, is_upload_handle
+from loris.errors import LorisError
 
 
 class MetaHiddenField(BooleanField):
@@ -150,7 +154,27 @@ class RestrictionField(StringField):
 
 
 class DynamicFileField(FileField):
-    pass  # TODO
+    """file field that also accepts the handle of a completed upload
+    (see `loris.app.uploads`) instead of the file itself.
+    """
+
+    def __call__(self, **kwargs):
+        # upload url for resumable uploads (see static/js/upload.js)
+        kwargs.setdefault('data_upload', url_for('create_upload'))
+        return super().__call__(**kwargs)
+
+    def process_formdata(self, valuelist):
+        handles = [value for value in valuelist if is_upload_handle(value)]
+        if not handles:
+            return super().process_formdata(valuelist)
+
+        try:
+            self.data = config['_uploads'].resolve(
+                handles[0], current_user.user_name
+            )
+        except LorisError as e:
+            self.data = None
+            raise ValueError(str(e))
 
 
 class CamelCaseValidator:
@@ -426,6 +450,10 @@ class FormMixin:
             if field.data in NONES:
                 return nan_return
 
+            if isinstance(field.data, Upload):
+                # completed uploads are used in place
+                return field.data.path
+
             if isinstance(field, FileField):
                 filename = secure_filename(field.data.filename)
                 if filename in NONES:
@@ -2,7 +2,6 @@
 """
 
 from flask_login import UserMixin
-import datajoint as dj
 
 from loris import config
 from loris.settings import Config
@@ -65,13 +64,4 @@ class User(UserMixin):
 
     def check_password(self, password):
         # check password in mysql database
-        try:
-            dj.conn(
-                None, self.user_name, password,
-                reset=True
-            )
-            success = True
-        except Exception:
-            success = False
-        config.conn(reset=True)
-        return success
+        return config.check_password(self.user_name, password)
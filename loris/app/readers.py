@@ -0,0 +1,256 @@
+"""registry of file readers used when inserting uploaded files
+
+Readers are registered by file extension and return the data in the
+format that is cheapest to read (e.g. memory-mapped arrays or
+dataframes); `as_array`, `as_frame` and `as_records` convert the result
+to the type a field expects. Readers that need an optional package
+(pyarrow, h5py, tifffile) are skipped if the package is not installed.
+"""
+
+import os
+import json
+import importlib.util
+import pickle
+import threading
+import warnings
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from loris.errors import LorisError
+
+
+READERS = {}
+# maximum number of csv headers whose inferred column types are cached
+CSV_TYPES_CACHE_SIZE = 128
+
+
+def register_reader(*extensions, requires=None):
+    """decorator to register a reader function for file extensions
+
+    The reader takes the filepath and returns the data. Readers registered
+    later for the same extension take precedence. If the package given by
+    `requires` is not installed, the next reader for the extension is used.
+    """
+
+    def decorator(func):
+        for extension in extensions:
+            READERS.setdefault(extension.lower().lstrip('.'), []).insert(
+                0, (func, requires)
+            )
+        return func
+
+    return decorator
+
+
+def _installed(package):
+    return package is None or importlib.util.find_spec(package) is not None
+
+
+def get_extension(filepath):
+    return os.path.splitext(filepath)[-1].lower().lstrip('.')
+
+
+def get_reader(filepath):
+    """registered reader for the extension of filepath or None
+    """
+
+    for reader, requires in READERS.get(get_extension(filepath), []):
+        if _installed(requires):
+            return reader
+
+
+def read_file(filepath):
+    """read file with the registered reader for its extension
+
+    Raises a LorisError if no reader is registered for the extension or
+    none of the packages its readers need is installed.
+    """
+
+    reader = get_reader(filepath)
+    if reader is None:
+        extension = get_extension(filepath)
+        requires = sorted({
+            requires for _, requires in READERS.get(extension, [])
+            if requires is not None
+        })
+        if requires:
+            raise LorisError(
+                f'Reading .{extension} files requires '
+                f'{" or ".join(requires)}, which is not installed.'
+            )
+        raise LorisError(f'No reader exists for .{extension} files.')
+    return reader(filepath)
+
+
+def as_array(value):
+    """convert output of a reader to a numpy array
+    """
+
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return value.values
+    return value
+
+
+def as_frame(value):
+    """convert output of a reader to a pandas dataframe
+    """
+
+    if isinstance(value, pd.DataFrame):
+        return value
+    return pd.DataFrame(value)
+
+
+def as_records(value):
+    """convert dataframes read to numpy record arrays
+    """
+
+    if isinstance(value, pd.DataFrame):
+        return value.to_records(False)
+    return value
+
+
+@register_reader('npy')
+def read_npy(filepath):
+    try:
+        # data is only read from disk when it is accessed
+        return np.load(filepath, mmap_mode='r')
+    except ValueError:
+        # object arrays cannot be memory-mapped
+        return np.load(filepath)
+
+
+@register_reader('pkl')
+def read_pickle(filepath):
+    with open(filepath, 'rb') as f:
+        return pickle.load(f)
+
+
+@register_reader('json')
+def read_json(filepath):
+    with open(filepath, 'r') as f:
+        return json.load(f)
+
+
+class CsvTypesCache:
+    """column types inferred from csv files, keyed by the header line
+
+    Files with the same header (e.g. repeated exports of the same
+    recording setup) are read with the types of the previous file, which
+    skips type inference and keeps the types of a column consistent
+    across files. If the types do not fit a file, its types are inferred
+    again and replace the cached types.
+    """
+
+    def __init__(self, maxsize=CSV_TYPES_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._types = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def header(filepath):
+        with open(filepath, 'rb') as f:
+            return f.readline()
+
+    def get(self, header):
+        with self._lock:
+            types = self._types.get(header, None)
+            if types is not None:
+                self._types.move_to_end(header)
+            return types
+
+    def set(self, header, types):
+        with self._lock:
+            self._types[header] = types
+            self._types.move_to_end(header)
+            while len(self._types) > self.maxsize:
+                self._types.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._types.clear()
+
+
+csv_types_cache = CsvTypesCache()
+
+
+@register_reader('csv')
+def read_csv_pandas(filepath):
+    header = csv_types_cache.header(filepath)
+    dtypes = csv_types_cache.get(header)
+
+    if dtypes is not None:
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', RuntimeWarning)
+                return pd.read_csv(filepath, dtype=dtypes, engine='c')
+        except (ValueError, TypeError):
+            pass
+
+    frame = pd.read_csv(filepath, engine='c')
+    csv_types_cache.set(header, frame.dtypes.to_dict())
+    return frame
+
+
+@register_reader('csv', requires='pyarrow')
+def read_csv_arrow(filepath):
+    # multithreaded parser of pyarrow
+    import pyarrow as pa
+    from pyarrow import csv
+
+    header = csv_types_cache.header(filepath)
+    types = csv_types_cache.get(header)
+
+    if types is not None:
+        try:
+            return csv.read_csv(
+                filepath,
+                convert_options=csv.ConvertOptions(column_types=types)
+            ).to_pandas()
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            pass
+
+    table = csv.read_csv(filepath)
+    csv_types_cache.set(
+        header, {field.name: field.type for field in table.schema}
+    )
+    return table.to_pandas()
+
+
+@register_reader('parquet', 'pq', requires='pyarrow')
+def read_parquet(filepath):
+    import pyarrow.parquet as pq
+    return pq.read_table(filepath, memory_map=True).to_pandas()
+
+
+@register_reader('h5', 'hdf5', 'hdf', requires='h5py')
+def read_hdf5(filepath):
+    """single dataset as array or dictionary of all datasets
+    """
+
+    import h5py
+
+    datasets = {}
+    with h5py.File(filepath, 'r') as f:
+        f.visititems(
+            lambda name, obj: datasets.__setitem__(name, obj[()])
+            if isinstance(obj, h5py.Dataset) else None
+        )
+
+    if len(datasets) == 1:
+        return next(iter(datasets.values()))
+    return datasets
+
+
+@register_reader('tif', 'tiff', requires='tifffile')
+def read_tiff(filepath):
+    """tiff stack as array; memory-mapped if the file is uncompressed
+    """
+
+    import tifffile
+
+    try:
+        return tifffile.memmap(filepath, mode='r')
+    except ValueError:
+        return tifffile.imread(filepath)
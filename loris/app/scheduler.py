@@ -0,0 +1,426 @@
+"""local job scheduler for subprocesses (autopopulate and autoscripts)
+"""
+
+import datetime
+import json
+import os
+import socket
+import sqlite3
+import threading
+import uuid
+
+import pandas as pd
+from flask import flash
+
+from loris.errors import LorisError
+from loris.app.subprocess import Run
+
+
+JOB_COLUMNS = (
+    'job_id', 'name', 'user', 'priority', 'status', 'command', 'cwd',
+    'created', 'started', 'finished', 'rc', 'stdout', 'stderr',
+    'stdout_offset', 'files', 'host', 'pid'
+)
+# columns added after the first release of the jobs table
+NEW_COLUMNS = {
+    'stdout_offset': 'INTEGER', 'files': 'TEXT',
+    'host': 'TEXT', 'pid': 'INTEGER'
+}
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # process exists but belongs to another user
+        return True
+    return True
+
+
+class Scheduler:
+    """queue of subprocesses run by a bounded pool of workers
+
+    Job states are persisted in a SQLite database, so that the queue
+    and the output of finished jobs survive restarts of the app. Each
+    running job records the host and pid of the app process that started
+    it. On startup, running jobs of app processes on this host that no
+    longer exist are marked as interrupted.
+
+    Several app processes (e.g. multiple server workers) can share the
+    database: each queued job is claimed by exactly one of them and
+    `max_workers` applies per app process. Only the app process that
+    runs a job can terminate it; other app processes only mark it as
+    aborted.
+
+    Parameters
+    ----------
+    filepath : str
+        location of the SQLite database.
+    max_workers : int
+        maximum number of jobs running at the same time.
+    user_quota : int
+        maximum number of jobs running at the same time for a single user.
+        If None, only `max_workers` applies. Defaults to None.
+    """
+
+    def __init__(self, filepath, max_workers, user_quota=None):
+        self.filepath = filepath
+        self.max_workers = max_workers
+        self.user_quota = user_quota
+        self._processes = {}
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(filepath, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+
+        with self._lock, self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "job_id TEXT PRIMARY KEY, name TEXT, user TEXT, "
+                "priority INTEGER, status TEXT, command TEXT, cwd TEXT, "
+                "created TEXT, started TEXT, finished TEXT, rc INTEGER, "
+                "stdout TEXT, stderr TEXT, stdout_offset INTEGER, "
+                "files TEXT, host TEXT, pid INTEGER)"
+            )
+            columns = {
+                row['name']
+                for row in self._db.execute("PRAGMA table_info(jobs)")
+            }
+            for column, sqltype in NEW_COLUMNS.items():
+                if column not in columns:
+                    self._db.execute(
+                        f"ALTER TABLE jobs ADD COLUMN {column} {sqltype}"
+                    )
+
+        self._recover()
+        self._dispatch()
+
+    def _recover(self):
+        """mark running jobs of exited app processes on this host as
+        interrupted; jobs of other hosts are left alone.
+        """
+
+        with self._lock, self._db:
+            running = self._db.execute(
+                "SELECT job_id, pid, files FROM jobs "
+                "WHERE status = 'running' AND (host = ? OR host IS NULL)",
+                (socket.gethostname(),)
+            ).fetchall()
+
+            for job in running:
+                # jobs of a previous session cannot be reattached
+                if job['pid'] is not None and _pid_alive(job['pid']):
+                    continue
+                self._db.execute(
+                    "UPDATE jobs SET status = 'interrupted', finished = ? "
+                    "WHERE job_id = ? AND status = 'running'",
+                    (self._now(), job['job_id'])
+                )
+                self._remove_files(job['files'])
+
+    @staticmethod
+    def _remove_files(files):
+        """remove temporary files of a job (json list or None)
+        """
+
+        for filepath in json.loads(files or '[]'):
+            try:
+                os.remove(filepath)
+            except FileNotFoundError:
+                pass
+
+    @classmethod
+    def from_config(cls, config):
+        """create scheduler from loris configuration
+        """
+
+        filepath = config['scheduler_db']
+        if filepath is None:
+            filepath = os.path.join(config['tmp_folder'], 'loris_jobs.sqlite')
+
+        max_workers = config['max_cpu']
+        if config['scheduler_workers'] is not None:
+            max_workers = min(config['scheduler_workers'], max_workers)
+
+        return cls(filepath, max_workers, config['scheduler_user_quota'])
+
+    @staticmethod
+    def _now():
+        return str(datetime.datetime.now())
+
+    def submit(self, name, command, cwd, user=None, priority=0, files=None):
+        """add a job to the queue and start it if a worker is free
+
+        Parameters
+        ----------
+        name : str
+            name of the job (e.g. the table name).
+        command : list
+            command passed to subprocess.Popen.
+        cwd : str
+            working directory of the subprocess.
+        user : str
+            user that submitted the job.
+        priority : int
+            jobs with higher priority are started first.
+        files : list
+            temporary files of the job (e.g. its configuration) that are
+            removed once the job has finished or was aborted.
+
+        Returns
+        -------
+        job_id : str
+        """
+
+        job_id = str(uuid.uuid4())
+
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT INTO jobs (job_id, name, user, priority, status, "
+                "command, cwd, created, files) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    job_id, name, user, priority, 'queued',
+                    json.dumps(command), cwd, self._now(),
+                    json.dumps(list(files or []))
+                )
+            )
+
+        self._dispatch()
+
+        return job_id
+
+    def _dispatch(self):
+        """start queued jobs while workers and user quotas allow
+        """
+
+        with self._lock:
+            queued = self._db.execute(
+                "SELECT * FROM jobs WHERE status = 'queued' "
+                "ORDER BY priority DESC, created ASC"
+            ).fetchall()
+
+            for job in queued:
+                if len(self._processes) >= self.max_workers:
+                    break
+                if self.user_quota is not None and sum(
+                    process_user == job['user']
+                    for process_user, _ in self._processes.values()
+                ) >= self.user_quota:
+                    continue
+                self._start(job)
+
+    def _start(self, job):
+        job_id = job['job_id']
+
+        # claim the job, unless another app process already started it
+        with self._db:
+            claimed = self._db.execute(
+                "UPDATE jobs SET status = 'running', started = ?, "
+                "host = ?, pid = ? WHERE job_id = ? AND status = 'queued'",
+                (self._now(), socket.gethostname(), os.getpid(), job_id)
+            ).rowcount
+        if not claimed:
+            return
+
+        process = Run()
+        self._processes[job_id] = (job['user'], process)
+        process.start(
+            json.loads(job['command']), job['cwd'],
+            callback=lambda: self._finish(job_id)
+        )
+
+    def _finish(self, job_id):
+        """persist output of a finished job and start the next jobs
+        """
+
+        with self._lock:
+            _, process = self._processes.pop(job_id)
+            job = self.get(job_id)
+            status = job['status']
+            if status != 'aborted':
+                status = 'success' if process.rc == 0 else 'error'
+
+            # only the tail of stdout is kept; save where it starts so
+            # that offsets of readers stay valid after the job finished
+            stdout, offset = process.read()
+            with self._db:
+                self._db.execute(
+                    "UPDATE jobs SET status = ?, finished = ?, rc = ?, "
+                    "stdout = ?, stdout_offset = ?, stderr = ? "
+                    "WHERE job_id = ?",
+                    (
+                        status, self._now(), process.rc,
+                        stdout, offset - len(stdout.encode()),
+                        process.stderr, job_id
+                    )
+                )
+            self._remove_files(job['files'])
+
+        self._dispatch()
+
+    def abort(self, job_id):
+        """abort a running job or remove a queued job from the queue
+        """
+
+        with self._lock:
+            job = self.get(job_id)
+
+            if job['status'] not in ('queued', 'running'):
+                raise LorisError(f"Job {job_id} is not queued or running.")
+
+            with self._db:
+                self._db.execute(
+                    "UPDATE jobs SET status = 'aborted', finished = ? "
+                    "WHERE job_id = ?",
+                    (self._now(), job_id)
+                )
+
+            if job['status'] == 'queued':
+                self._remove_files(job['files'])
+
+            process = self.process(job_id)
+            if process is not None and process.p is not None:
+                process.p.terminate()
+
+    def get(self, job_id):
+        """get job as dictionary
+        """
+
+        with self._lock:
+            job = self._db.execute(
+                "SELECT * FROM jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+
+        if job is None:
+            raise LorisError(f"Job {job_id} does not exist.")
+
+        return dict(job)
+
+    def process(self, job_id):
+        """Run instance of a running job or None
+        """
+
+        entry = self._processes.get(job_id, None)
+        if entry is None:
+            return
+        return entry[1]
+
+    def latest(self, name=None, user=None):
+        """job_id of the last submitted job or None
+        """
+
+        jobs = self.jobs(name, user)
+        if not len(jobs):
+            return
+        return jobs['job_id'].iloc[0]
+
+    def jobs(self, name=None, user=None, limit=50):
+        """dataframe of jobs (newest first) without output and commands
+        """
+
+        restrictions = []
+        args = []
+        if name is not None:
+            restrictions.append("name = ?")
+            args.append(name)
+        if user is not None:
+            restrictions.append("user = ?")
+            args.append(user)
+
+        where = ''
+        if restrictions:
+            where = 'WHERE ' + ' AND '.join(restrictions)
+
+        columns = [
+            column for column in JOB_COLUMNS
+            if column not in (
+                'command', 'cwd', 'stdout', 'stderr', 'stdout_offset', 'files'
+            )
+        ]
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT {', '.join(columns)} FROM jobs {where} "
+                "ORDER BY created DESC LIMIT ?",
+                (*args, limit)
+            ).fetchall()
+
+        return pd.DataFrame([dict(row) for row in rows], columns=columns)
+
+    def output(self, job_id):
+        """stdout and stderr of a job
+        """
+
+        process = self.process(job_id)
+        if process is not None:
+            return process.stdout, process.stderr
+
+        job = self.get(job_id)
+        return job['stdout'] or '', job['stderr'] or ''
+
+    def read(self, job_id, offset=0):
+        """stdout of a job since offset and the new offset
+        """
+
+        process = self.process(job_id)
+        if process is not None:
+            return process.read(offset)
+
+        job = self.get(job_id)
+        stdout = (job['stdout'] or '').encode()
+        # absolute offset of the saved output (only the tail is saved)
+        start = job['stdout_offset'] or 0
+        return (
+            stdout[max(offset - start, 0):].decode('utf-8', errors='replace'),
+            start + len(stdout)
+        )
+
+    def wait_output(self, job_id, offset=0, timeout=None):
+        """block until there is new output of a running job since offset;
+        return output and the new offset.
+        """
+
+        process = self.process(job_id)
+        if process is not None:
+            return process.wait_output(offset, timeout)
+
+        return self.read(job_id, offset)
+
+
+def job_context(scheduler, job_id=None, name=None, user=None):
+    """template context for listing jobs and showing the output
+    of a single job; flashes the status of the job.
+    """
+
+    jobs = scheduler.jobs(name, user).to_dict('records')
+
+    if job_id is None:
+        flash('No job was submitted', 'secondary')
+        return dict(job=None, jobs=jobs, stdout=[], stderr=[], offset=0)
+
+    try:
+        job = scheduler.get(job_id)
+    except LorisError as e:
+        flash(f"{e}", 'error')
+        return dict(job=None, jobs=jobs, stdout=[], stderr=[], offset=0)
+
+    if job['status'] == 'success':
+        flash('Subprocess complete', 'success')
+    elif job['status'] in ('error', 'interrupted'):
+        flash(f"Subprocess failed: {job['rc']}", 'error')
+    elif job['status'] == 'aborted':
+        flash('Subprocess was aborted', 'warning')
+    elif job['status'] == 'running':
+        flash('Subprocess is still running', 'warning')
+    else:
+        flash('Subprocess is queued', 'secondary')
+
+    stdout, offset = scheduler.read(job_id)
+    stderr = scheduler.output(job_id)[1]
+
+    return dict(
+        job=job, jobs=jobs,
+        stdout=stdout.splitlines(), stderr=stderr.splitlines(),
+        offset=offset
+    )
@@ -0,0 +1,176 @@
+// Entity relationship diagrams laid out in the browser.
+//
+// The dependency graph of a table, a schema or all schemas is loaded as
+// json from the data-graph url of each .erd-graph element and laid out
+// with dagre, grouping tables by schema. Clicking a table opens its page
+// and clicking a schema opens its diagram. The filter input shows only
+// the tables whose name contains the text and their parents and children.
+(function() {
+
+  // same colors as the graphviz diagrams
+  var TIER_COLORS = {
+    Manual: '#006400',
+    Computed: '#9a32cd',
+    Lookup: '#838b8b',
+    Imported: '#000080',
+    Part: '#838b8b',
+    Settingstable: '#daa520',
+    AutoComputed: '#68228b',
+    AutoImported: '#000080'
+  };
+  var DEFAULT_COLOR = '#838b8b';
+  var FILTER_DELAY = 200;
+
+  var STYLE = [
+    {selector: 'node', style: {
+      'label': 'data(label)',
+      'shape': 'round-rectangle',
+      'background-color': 'data(color)',
+      'color': '#fff',
+      'font-family': 'helvetica',
+      'font-size': 10,
+      'text-valign': 'center',
+      'text-halign': 'center',
+      'width': 'label',
+      'height': 'label',
+      'padding': '6px'
+    }},
+    {selector: 'node.part', style: {'font-size': 6}},
+    {selector: 'node.root', style: {'border-width': 3, 'border-color': '#000'}},
+    {selector: 'node.cluster', style: {
+      'background-opacity': 0,
+      'border-width': 3,
+      'border-color': '#000',
+      'color': '#000',
+      'font-weight': 'bold',
+      'text-valign': 'top',
+      'padding': '12px'
+    }},
+    {selector: 'edge', style: {
+      'width': 1.5,
+      'line-color': 'data(color)',
+      'target-arrow-color': 'data(color)',
+      'target-arrow-shape': 'triangle',
+      'arrow-scale': 0.7,
+      'curve-style': 'taxi',
+      'taxi-direction': 'rightward'
+    }},
+    {selector: 'edge.secondary', style: {'line-style': 'dashed'}},
+    {selector: '.hidden', style: {'display': 'none'}}
+  ];
+
+  function clusterId(schema) {
+    return 'cluster:' + schema;
+  }
+
+  function elements(graph) {
+    var tiers = {};
+    var result = [];
+    graph.clusters.forEach(function(cluster) {
+      result.push({
+        group: 'nodes',
+        classes: 'cluster',
+        data: {id: clusterId(cluster.id), label: cluster.label, url: cluster.url}
+      });
+    });
+    graph.nodes.forEach(function(node) {
+      tiers[node.id] = node.tier;
+      var classes = [];
+      if (node.id === graph.root) { classes.push('root'); }
+      if (node.tier === 'Part') { classes.push('part'); }
+      result.push({
+        group: 'nodes',
+        classes: classes.join(' '),
+        data: {
+          id: node.id,
+          label: node.label,
+          parent: clusterId(node.schema),
+          url: node.url,
+          color: TIER_COLORS[node.tier] || DEFAULT_COLOR
+        }
+      });
+    });
+    graph.edges.forEach(function(edge) {
+      result.push({
+        group: 'edges',
+        // dependencies on non-primary attributes are dashed
+        classes: edge.primary ? 'primary' : 'secondary',
+        data: {
+          source: edge.source,
+          target: edge.target,
+          color: TIER_COLORS[tiers[edge.source]] || DEFAULT_COLOR
+        }
+      });
+    });
+    return result;
+  }
+
+  function layout() {
+    // dagre is loaded from a cdn; fall back to a built-in layout
+    if (typeof dagre === 'undefined') {
+      return {name: 'breadthfirst', directed: true, padding: 20};
+    }
+    return {name: 'dagre', rankDir: 'LR', nodeSep: 10, rankSep: 40, padding: 20};
+  }
+
+  function filter(cy, text) {
+    text = text.trim().toLowerCase();
+    cy.batch(function() {
+      cy.elements().removeClass('hidden');
+      if (!text) {
+        return;
+      }
+      var tables = cy.nodes().not('.cluster');
+      var matched = tables.filter(function(node) {
+        return node.id().toLowerCase().indexOf(text) >= 0;
+      });
+      var shown = matched.union(matched.neighborhood('node'));
+      tables.difference(shown).addClass('hidden');
+      cy.nodes('.cluster').forEach(function(cluster) {
+        if (cluster.children().not('.hidden').empty()) {
+          cluster.addClass('hidden');
+        }
+      });
+    });
+    cy.fit(cy.elements().not('.hidden'), 20);
+  }
+
+  function draw(container) {
+    var filterInput = $(container).closest('.erd').find('.erd-filter');
+    $.getJSON($(container).data('graph')).then(function(graph) {
+      var cy = cytoscape({
+        container: container,
+        elements: elements(graph),
+        style: STYLE,
+        layout: layout(),
+        wheelSensitivity: 0.2
+      });
+      cy.on('tap', 'node', function(event) {
+        var url = event.target.data('url');
+        if (url) {
+          window.location.href = url;
+        }
+      });
+
+      var timeout = null;
+      filterInput.on('input', function() {
+        var input = this;
+        clearTimeout(timeout);
+        timeout = setTimeout(function() { filter(cy, input.value); }, FILTER_DELAY);
+      });
+
+      // diagrams in collapsed cards have no size until they are shown
+      $(container).closest('.collapse').on('shown.bs.collapse', function() {
+        cy.resize();
+        cy.fit(cy.elements().not('.hidden'), 20);
+      });
+    }, function() {
+      $(container).text('The diagram could not be loaded.');
+    });
+  }
+
+  $(function() {
+    $('.erd-graph').each(function() { draw(this); });
+  });
+
+}).call(this);
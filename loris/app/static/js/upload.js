@@ -0,0 +1,126 @@
+// Resumable chunked uploads of large files in forms.
+//
+// Before a form is submitted, each selected file of an input with a
+// data-upload attribute that is larger than UPLOAD_THRESHOLD is sent in
+// chunks to the upload url. The file input is then disabled and replaced
+// by a hidden input with the handle of the completed upload, so that the
+// form itself stays small. Interrupted uploads are resumed from the
+// offset known to the server (also after reloading the page).
+(function() {
+
+  var UPLOAD_THRESHOLD = 8 * 1024 * 1024;
+  var MAX_RETRIES = 5;
+
+  function storageKey(file) {
+    return 'loris-upload-' + [file.name, file.size, file.lastModified].join('-');
+  }
+
+  function createUpload(createUrl, file) {
+    var stored = window.localStorage.getItem(storageKey(file));
+    var created = function() {
+      return $.ajax({
+        url: createUrl,
+        method: 'POST',
+        contentType: 'application/json',
+        data: JSON.stringify({filename: file.name, size: file.size})
+      }).then(function(info) {
+        window.localStorage.setItem(storageKey(file), info.url);
+        return info;
+      });
+    };
+    if (!stored) {
+      return created();
+    }
+    // resume an earlier upload of the same file
+    return $.getJSON(stored).then(
+      function(info) { return info; },
+      function() {
+        window.localStorage.removeItem(storageKey(file));
+        return created();
+      }
+    );
+  }
+
+  function sendChunks(file, info, progress, retries) {
+    progress(info.offset, file.size);
+    if (info.offset >= file.size) {
+      window.localStorage.removeItem(storageKey(file));
+      return $.Deferred().resolve(info.handle).promise();
+    }
+    var chunk = file.slice(info.offset, info.offset + info.chunk_size);
+    return $.ajax({
+      url: info.url,
+      method: 'PATCH',
+      data: chunk,
+      processData: false,
+      contentType: 'application/offset+octet-stream',
+      headers: {'Upload-Offset': info.offset}
+    }).then(
+      function(newInfo) {
+        return sendChunks(file, newInfo, progress, 0);
+      },
+      function() {
+        if (retries >= MAX_RETRIES) {
+          return $.Deferred().reject('upload of ' + file.name + ' failed').promise();
+        }
+        // ask for the offset the server received and continue from there
+        var delay = $.Deferred();
+        setTimeout(delay.resolve, 1000 * Math.pow(2, retries));
+        return delay.then(function() {
+          return $.getJSON(info.url);
+        }).then(function(newInfo) {
+          return sendChunks(file, newInfo, progress, retries + 1);
+        });
+      }
+    );
+  }
+
+  function uploadInput(input) {
+    var file = input.files[0];
+    var status = $('<small class="upload-progress"></small>');
+    $(input).after(status);
+    var progress = function(offset, size) {
+      status.text(' uploaded ' + Math.floor(100 * offset / Math.max(size, 1)) + '%');
+    };
+    return createUpload($(input).data('upload'), file).then(function(info) {
+      return sendChunks(file, info, progress, 0);
+    }).then(function(handle) {
+      $('<input type="hidden">').attr('name', input.name).val(handle).insertAfter(input);
+      input.disabled = true;
+    }, function(error) {
+      status.text(' ' + (typeof error === 'string' ? error : 'upload failed'));
+      return $.Deferred().reject(error).promise();
+    });
+  }
+
+  $(function() {
+    var submitter = null;
+    $(document).on('click', 'form :submit', function() {
+      submitter = this;
+    });
+
+    $(document).on('submit', 'form', function(event) {
+      var form = this;
+      var inputs = $(form).find('input[type=file][data-upload]').filter(function() {
+        return !this.disabled && this.files.length && this.files[0].size > UPLOAD_THRESHOLD;
+      });
+      if (!inputs.length) {
+        return;
+      }
+      event.preventDefault();
+
+      var button = (event.originalEvent && event.originalEvent.submitter) || submitter;
+      var uploads = inputs.map(function() { return uploadInput(this); }).get();
+
+      $.when.apply($, uploads).done(function() {
+        // the clicked button is not sent with a programmatic submit
+        if (button && button.name) {
+          $('<input type="hidden">').attr('name', button.name).val(button.value).appendTo(form);
+        }
+        // forms may have a field named submit that shadows the method
+        HTMLFormElement.prototype.submit.call(form);
+      });
+    });
+  });
+
+}).call(this);
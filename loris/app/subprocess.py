@@ -1,106 +1,210 @@
 """subprocess class
 """
 
+import os
 import subprocess
 import threading
 
-from flask import flash
-
 from loris.errors import LorisError
 
 
+class OutputBuffer:
+    """thread-safe ring buffer of process output with absolute byte offsets
+
+    Only the last `max_bytes` bytes are kept. Offsets count all bytes ever
+    written, so readers can ask for any output since a given offset.
+    """
+
+    def __init__(self, max_bytes=2**20):
+        self.max_bytes = max_bytes
+        self._data = bytearray()
+        self._start = 0  # absolute offset of first byte kept
+        self._closed = False
+        self._condition = threading.Condition()
+
+    @property
+    def end(self):
+        """absolute offset after last byte written
+        """
+        return self._start + len(self._data)
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def write(self, data):
+        with self._condition:
+            self._data.extend(data)
+            overflow = len(self._data) - self.max_bytes
+            if overflow > 0:
+                del self._data[:overflow]
+                self._start += overflow
+            self._condition.notify_all()
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    def read(self, offset=0):
+        """get output since offset (decoded) and the new offset
+        """
+
+        with self._condition:
+            return self._read(offset)
+
+    def _read(self, offset):
+        index = max(offset - self._start, 0)
+        text = bytes(self._data[index:]).decode('utf-8', errors='replace')
+        return text, self.end
+
+    def wait(self, offset=0, timeout=None):
+        """block until there is output after offset, the buffer is closed
+        or the timeout has passed; return output and the new offset.
+        """
+
+        with self._condition:
+            self._condition.wait_for(
+                lambda: self.end > offset or self._closed,
+                timeout=timeout
+            )
+            return self._read(offset)
+
+    def __str__(self):
+        return self.read()[0]
+
+
 class Run:
     """run a thread
     """
 
-    def __init__(self):
+    def __init__(self, max_bytes=2**20):
+        self.max_bytes = max_bytes
         self.reset()
 
     def reset(self):
         self.p = None
         self.cmd = None
         self.cwd = None
-        self.lines = []
         self.rc = None
-        self.stderr = ''
         self.thread = None
+        self.stdout_buffer = OutputBuffer(self.max_bytes)
+        self.stderr_buffer = OutputBuffer(self.max_bytes)
 
     @property
     def running(self):
         return self.p is not None and self.p.poll() is None
 
-    def start(self, cmd, cwd):
+    def start(self, cmd, cwd, callback=None):
+        """start subprocess in a thread; callback is called without
+        arguments once the subprocess has finished.
+        """
         self.reset()
         self.cmd = cmd
         self.cwd = cwd
-        self.thread = threading.Thread(target=self.run)
+        self.thread = threading.Thread(target=self.run, args=(callback,))
         self.thread.start()
 
-    def run(self):
-
-        self.p = subprocess.Popen(
-            self.cmd, shell=False,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            universal_newlines=True,
-            cwd=self.cwd, bufsize=1
-        )
+    def run(self, callback=None):
+
+        try:
+            self._run()
+        finally:
+            if callback is not None:
+                callback()
+
+    def _run(self):
+
+        try:
+            # local reference; self.p is only read by other threads
+            p = subprocess.Popen(
+                self.cmd, shell=False,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                cwd=self.cwd, bufsize=0
+            )
+        except OSError as e:
+            self.stderr_buffer.write(str(e).encode())
+            self.rc = -1
+            self.stdout_buffer.close()
+            self.stderr_buffer.close()
+            return
+
+        self.p = p
+        try:
+            # drain both pipes concurrently so that neither can fill up
+            readers = [
+                threading.Thread(
+                    target=self._drain, args=(p.stdout, self.stdout_buffer)
+                ),
+                threading.Thread(
+                    target=self._drain, args=(p.stderr, self.stderr_buffer)
+                )
+            ]
+            for reader in readers:
+                reader.start()
+            for reader in readers:
+                reader.join()
+
+            self.rc = p.wait()
+        finally:
+            self.stdout_buffer.close()
+            self.stderr_buffer.close()
+
+    @staticmethod
+    def _drain(pipe, buffer):
+        """read pipe until EOF into buffer (blocks, does not poll)
+        """
 
+        fd = pipe.fileno()
         while True:
-            output = self.p.stdout.readline()
-            if self.p.poll() is not None:
+            data = os.read(fd, 65536)
+            if not data:
                 break
-            if output:
-                self.lines.append(output)
-        self.rc = self.p.poll()
-        _, self.stderr = self.p.communicate()
+            buffer.write(data)
+        pipe.close()
 
     @property
     def stdout(self):
-        return ''.join(self.lines)
+        return str(self.stdout_buffer)
+
+    @property
+    def stderr(self):
+        return str(self.stderr_buffer)
 
     @property
     def lastline(self):
-        if self.stderr:
-            return self.stderr
-        elif self.lines:
-            return self.lines[-1]
+        stderr = self.stderr
+        if stderr:
+            return stderr
+        lines = self.stdout.splitlines()
+        if lines:
+            return lines[-1]
         else:
             return ''
 
-    def check(self):
-        """check on subprocess and flash messages
+    def read(self, offset=0, stderr=False):
+        """output since offset and the new offset
         """
 
-        if self.rc is not None:
-            if self.rc == 0:
-                flash('Subprocess complete', 'success')
-            else:
-                flash(f"Subprocess failed: "
-                      f"{self.rc}", 'error')
-            self.p = None
-        elif self.p is not None:
-            flash('Subprocess is still running', 'warning')
-        else:
-            flash('No subprocess is running', 'secondary')
-
-        return self.stdout.splitlines(), self.stderr.splitlines()
+        if stderr:
+            return self.stderr_buffer.read(offset)
+        return self.stdout_buffer.read(offset)
 
-    def abort(self):
-        """abort subprocess
+    def wait_output(self, offset=0, timeout=None, stderr=False):
+        """block until there is new output since offset or the
+        process has finished; return output and the new offset.
         """
-        if self.p is not None:
-            self.p.terminate()
-            self.p = None
-            flash('Aborting subprocess...', 'warning')
-        else:
-            flash('No subprocess is running')
+
+        if stderr:
+            return self.stderr_buffer.wait(offset, timeout)
+        return self.stdout_buffer.wait(offset, timeout)
 
     def wait(self):
         """wait for the subprocess to finish
         """
 
-        if self.p is None:
+        if self.thread is None:
             raise LorisError('No subprocess is running.')
 
         self.thread.join()
@@ -5,19 +5,26 @@ from flask import render_template, request, flash, url_for, redirect, \
     send_from_directory, session
 from flask_login import current_user
 import datajoint as dj
+import pandas as pd
 from ast import literal_eval
 
 from loris import config
 from loris.app.forms.dynamic_form import DynamicForm
-from loris.app.utils import user_has_permission, get_jsontable
+from loris.app.utils import (
+    user_has_permission, get_jsontable, use_serverside, get_serverside_url,
+    serverside_relation
+)
 from loris.utils import save_join
 
 
 def joined_table_template(
     table_names, name='Joined Table', redirect_url='#',
-    message='None', **kwargs
+    message='None', server_side=None, **kwargs
 ):
     """template for joined tables
+
+    If `server_side` is True, rows are loaded page by page. If None,
+    this is decided by the number of rows in the joined table.
     """
 
     if redirect_url != '#':
@@ -30,10 +37,19 @@ def joined_table_template(
         else:
             tables.append(config.get_table(table_name))
 
-    joined_table = save_join(tables)
-    df = joined_table.proj(
-        *joined_table.heading.non_blobs
-    ).fetch(format='frame').reset_index()
+    if server_side is None:
+        server_side = use_serverside(tables)
+
+    if server_side:
+        joined_table = serverside_relation(tables)
+        heading = joined_table.proj(*joined_table.heading.non_blobs).heading
+        df = pd.DataFrame(columns=heading.names)
+        kwargs['ajax_url'] = get_serverside_url(tables)
+    else:
+        joined_table = save_join(tables)
+        df = joined_table.proj(
+            *joined_table.heading.non_blobs
+        ).fetch(format='frame').reset_index()
     data = get_jsontable(
         df, joined_table.heading.primary_key,
         **kwargs
@@ -52,9 +68,12 @@ def joined_table_template(
 def form_template(
     schema, table, subtable, edit_url, overwrite_url, page='table',
     join_tables=None, joined_name=None, redirect_page=None,
-    override_permissions=False, load_url=None, **kwargs
+    override_permissions=False, load_url=None, server_side=None, **kwargs
 ):
     """template for rendering tables with forms
+
+    If `server_side` is True, rows are loaded page by page. If None,
+    this is decided by the number of rows in the table.
     """
 
     if current_user.user_name in config['administrators']:
@@ -109,13 +128,12 @@ def form_template(
         table_name, table_class, dynamicformclass, **kwargs
     )
 
-    filename = dynamicform.draw_relations()
-
     # load/notload table
     data = dynamicform.get_jsontable(
         edit_url, delete_url, overwrite_url,
         join_tables, joined_name,
-        load_url=load_url
+        load_url=load_url,
+        server_side=server_side
     )
 
     toggle_off_keys = [0]
@@ -179,8 +197,12 @@ def form_template(
         data=data,
         table_name=table_name,
         url=url_for('table', table=table, schema=schema, subtable=subtable),
+        import_url=(
+            url_for('bulkimport', table=table, schema=schema)
+            if subtable is None else None
+        ),
         toggle_off_keys=toggle_off_keys,
-        filename=filename,
+        graph_url=url_for('erd_graph', table=table_name),
         enter_show=enter_show,
         readonly=readonly
     )
@@ -0,0 +1,259 @@
+"""resumable uploads of large files
+
+Files are sent in chunks (range-based, similar to the tus protocol):
+an upload is created with the filename and total size, each chunk is
+appended at the current offset of the upload and an interrupted upload
+is resumed by asking for its offset. Chunks are streamed to disk in small
+pieces, so memory use does not depend on the file size. Forms reference
+a completed upload by its handle instead of containing the file.
+"""
+
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+
+from werkzeug.utils import secure_filename
+
+from loris.errors import LorisError
+
+
+HANDLE_PREFIX = 'upload:'
+INFO_FILE = 'info.json'
+# bytes read from the request stream at once
+BUFFER_SIZE = 2**20
+
+
+def is_upload_handle(value):
+    return isinstance(value, str) and value.startswith(HANDLE_PREFIX)
+
+
+class Upload:
+    """completed upload referenced in a form; behaves like the file
+    storage of a file field (filename and save).
+    """
+
+    def __init__(self, upload_id, filename, path):
+        self.upload_id = upload_id
+        self.filename = filename
+        self.path = path
+
+    def __bool__(self):
+        return True
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({self.filename!r})'
+
+    def save(self, dst):
+        shutil.copyfile(self.path, dst)
+
+
+class UploadStore:
+    """folder of partial and completed uploads
+
+    Parameters
+    ----------
+    folder : str
+        Folder in which each upload gets a subfolder.
+    chunk_size : int
+        Maximum number of bytes accepted per chunk.
+    expiry : int
+        Seconds after the last change of an upload before it is deleted.
+    """
+
+    def __init__(self, folder, chunk_size, expiry):
+        self.folder = folder
+        self.chunk_size = chunk_size
+        self.expiry = expiry
+        self._locks = {}
+        self._lock = threading.Lock()
+        os.makedirs(folder, exist_ok=True)
+
+    @classmethod
+    def from_config(cls, config):
+        """create upload store from loris configuration
+        """
+
+        return cls(
+            os.path.join(config['tmp_folder'], 'uploads'),
+            config['upload_chunk_size'],
+            config['upload_expiry']
+        )
+
+    def _upload_folder(self, upload_id):
+        # ids are generated by the store; anything else is rejected
+        try:
+            upload_id = str(uuid.UUID(upload_id))
+        except (ValueError, TypeError):
+            raise LorisError(f'Upload {upload_id} does not exist.')
+        return os.path.join(self.folder, upload_id)
+
+    def _upload_lock(self, upload_id):
+        with self._lock:
+            return self._locks.setdefault(upload_id, threading.Lock())
+
+    def _write_info(self, upload_id, info):
+        filepath = os.path.join(self._upload_folder(upload_id), INFO_FILE)
+        with open(filepath + '.tmp', 'w') as f:
+            json.dump(info, f)
+        os.replace(filepath + '.tmp', filepath)
+
+    def create(self, filename, size, user=None):
+        """create an empty upload
+
+        Returns
+        -------
+        info : dict
+        """
+
+        filename = secure_filename(filename or '')
+        if not filename:
+            raise LorisError('Upload requires a filename.')
+        if size is None or size < 0:
+            raise LorisError('Upload requires the size of the file.')
+
+        self.cleanup()
+
+        upload_id = str(uuid.uuid4())
+        folder = self._upload_folder(upload_id)
+        os.makedirs(folder)
+        open(os.path.join(folder, filename), 'wb').close()
+
+        info = {
+            'upload_id': upload_id,
+            'filename': filename,
+            'size': size,
+            'offset': 0,
+            'user': user,
+        }
+        self._write_info(upload_id, info)
+        return info
+
+    def get(self, upload_id, user=None):
+        """info of an upload
+
+        Raises a LorisError if the upload does not exist or belongs to
+        another user.
+        """
+
+        filepath = os.path.join(self._upload_folder(upload_id), INFO_FILE)
+        try:
+            with open(filepath, 'r') as f:
+                info = json.load(f)
+        except (OSError, ValueError):
+            raise LorisError(f'Upload {upload_id} does not exist.')
+
+        if user is not None and info['user'] not in (None, user):
+            raise LorisError(f'Upload {upload_id} does not exist.')
+
+        return info
+
+    def path(self, upload_id):
+        info = self.get(upload_id)
+        return os.path.join(
+            self._upload_folder(upload_id), info['filename']
+        )
+
+    def append(self, upload_id, offset, stream, length=None, user=None):
+        """append bytes of stream to an upload at offset
+
+        Parameters
+        ----------
+        upload_id : str
+        offset : int
+            Offset the client assumes; must equal the offset of the upload.
+        stream : file-like
+            Stream to read the chunk from.
+        length : int
+            Number of bytes of the chunk (e.g. the content length).
+        user : str
+            User that owns the upload.
+
+        Returns
+        -------
+        info : dict
+            Info of the upload with the new offset.
+        """
+
+        with self._upload_lock(upload_id):
+            info = self.get(upload_id, user)
+
+            if offset != info['offset']:
+                raise LorisError(
+                    f"Offset {offset} does not match upload offset "
+                    f"{info['offset']}."
+                )
+
+            remaining = info['size'] - info['offset']
+            if length is None:
+                length = min(remaining, self.chunk_size)
+            if length > min(remaining, self.chunk_size):
+                raise LorisError(
+                    f'Chunk of {length} bytes exceeds maximum chunk size '
+                    'or size of upload.'
+                )
+
+            filepath = self.path(upload_id)
+            written = 0
+            with open(filepath, 'r+b') as f:
+                f.seek(info['offset'])
+                try:
+                    while written < length:
+                        data = stream.read(
+                            min(BUFFER_SIZE, length - written)
+                        )
+                        if not data:
+                            break
+                        f.write(data)
+                        written += len(data)
+                finally:
+                    # bytes received before an interruption are kept;
+                    # the client resumes at the new offset
+                    f.truncate(info['offset'] + written)
+                    info['offset'] += written
+                    self._write_info(upload_id, info)
+
+        return info
+
+    def delete(self, upload_id, user=None):
+        self.get(upload_id, user)
+        shutil.rmtree(self._upload_folder(upload_id), ignore_errors=True)
+        with self._lock:
+            self._locks.pop(upload_id, None)
+
+    def resolve(self, handle, user=None):
+        """completed upload of handle (see `handle`)
+        """
+
+        upload_id = handle[len(HANDLE_PREFIX):]
+        info = self.get(upload_id, user)
+        if info['offset'] != info['size']:
+            raise LorisError(
+                f"Upload of {info['filename']} is incomplete: "
+                f"{info['offset']} of {info['size']} bytes."
+            )
+        return Upload(upload_id, info['filename'], self.path(upload_id))
+
+    @staticmethod
+    def handle(upload_id):
+        """string that references the upload in a form
+        """
+        return f'{HANDLE_PREFIX}{upload_id}'
+
+    def cleanup(self):
+        """delete uploads that have not changed for `expiry` seconds
+        """
+
+        now = time.time()
+        for upload_id in os.listdir(self.folder):
+            folder = os.path.join(self.folder, upload_id)
+            try:
+                mtime = os.path.getmtime(os.path.join(folder, INFO_FILE))
+            except OSError:
+                if not os.path.isdir(folder):
+                    continue
+                mtime = os.path.getmtime(folder)
+            if now - mtime > self.expiry:
+                shutil.rmtree(folder, ignore_errors=True)
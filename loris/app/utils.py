@@ -1,121 +1,345 @@
 """
 """
 
-import graphviz
 import os
+import time
 import pandas as pd
-import uuid
 import pickle
 import json
-import glob
 import datajoint as dj
 import numpy as np
 from datajoint.schemas import lookup_class_name
 from flask import render_template, request, flash, url_for, redirect
 
 from loris import config, conn
-from loris.utils import is_manuallookup
+from loris.utils import (
+    is_manuallookup, save_join, as_instances, join_projections, plan_join
+)
+from loris.app.readers import read_file, as_records
+from loris.app.erd import graph_digest
 
 
 def datareader(value):
-    """data reader for supported files, otherwise just return the file
+    """data reader for supported files
+
+    Files are read with the reader registered for their extension (see
+    `loris.app.readers`); tables are converted to record arrays.
     """
-    if value.endswith('npy'):
-        value = np.load(value)
-    elif value.endswith('csv'):
-        value = pd.read_csv(value).to_records(False)
-    elif value.endswith('pkl'):
-        with open(value, 'rb') as f:
-            value = pickle.load(f)
-    elif value.endswith('json'):
-        with open(value, 'r') as f:
-            value = json.load(f)
 
-    return value
+    return as_records(read_file(value))
 
 
-def user_has_permission(table, user, skip_tables=None):
-    """test if user is allowed to delete an entry or perform another action
-    on a datajoint.Table
+def explain_relation(relation, sql=None):
+    """query plan of a relation and the estimated number of rows
+
+    The estimate is the product of the rows examined (times the filtered
+    percentage) of each table in the outermost select of the plan.
+    `sql` is the query of the relation, if it was already made.
+
+    Returns
+    -------
+    plan : list of dicts
+        rows of MySQL's EXPLAIN output.
+    estimate : int
+        estimated number of rows of the relation.
     """
 
-    if user in config['administrators']:
-        return True
+    if sql is None:
+        sql = relation.make_sql()
+
+    plan = relation.connection.query(
+        'EXPLAIN ' + sql, as_dict=True
+    ).fetchall()
+
+    ids = [row['id'] for row in plan if row['id'] is not None]
+    outer = min(ids) if ids else None
+
+    estimate = 1
+    for row in plan:
+        if row['id'] != outer:
+            continue
+        filtered = row.get('filtered', None)
+        filtered = 100 if filtered is None else float(filtered)
+        estimate *= (row['rows'] or 0) * filtered / 100
+
+    return plan, int(round(estimate))
+
+
+def join_steps(tables, order=None):
+    """attributes each table shares with the tables joined before it in
+    the given order or the order planned by `loris.utils.plan_join`;
+    an empty list means that the table is joined as a cartesian product.
+
+    Returns
+    -------
+    steps : list of tuples
+        (full table name, shared attributes) for each table after the
+        first one joined.
+    """
+
+    tables = as_instances(tables)
+    projections = join_projections(tables)
+    if order is None:
+        order = plan_join(tables, projections)
+
+    steps = []
+    names = set(tables[order[0]].heading.primary_key) | set(
+        projections[order[0]]
+    )
+
+    for n in order[1:]:
+        table = tables[n]
+        joined_names = set(table.heading.primary_key) | set(projections[n])
+        shared = [
+            name for name in table.heading.names
+            if name in joined_names and name in names
+        ]
+        steps.append((table.full_table_name, shared))
+        names |= joined_names
+
+    return steps
 
-    if table.database in config.groups_of_user(user):
-        return True
 
-    if skip_tables is None:
-        skip_tables = []
+def preview_join(tables, restriction=None):
+    """preview of joining tables with `save_join` without running the join
+
+    The join is planned once; the joined relation is part of the preview,
+    so that it can be fetched afterwards.
+
+    Returns
+    -------
+    preview : dict
+        joined relation, sql, plan and estimated rows (see
+        `explain_relation`), the join steps (see `join_steps`) and the
+        tables joined as cartesian products.
+    """
+
+    tables = as_instances(tables)
+    order = plan_join(tables, join_projections(tables))
+    joined_table = save_join(tables, restriction, order=order)
+    sql = joined_table.make_sql()
+
+    plan, estimate = explain_relation(joined_table, sql)
+    steps = join_steps(tables, order)
+
+    return dict(
+        relation=joined_table,
+        sql=sql,
+        plan=plan,
+        estimate=estimate,
+        steps=steps,
+        cartesian=[name for name, shared in steps if not shared],
+        budget=config['join_row_budget'],
+        over_budget=(
+            config['join_row_budget'] is not None
+            and estimate > config['join_row_budget']
+        )
+    )
+
+
+def table_probe(table):
+    """row count and last update time of a table; used to detect changes
+    of a table that were made outside of loris.
+    """
+
+    return table.connection.query(
+        f"SELECT (SELECT COUNT(*) FROM {table.full_table_name}), "
+        "(SELECT update_time FROM information_schema.tables "
+        "WHERE table_schema = %s AND table_name = %s);",
+        args=(table.database, table.table_name)
+    ).fetchone()
+
+
+def get_foreign_data(table, name, aliased=None):
+    """get (cached) data of a single attribute of a parent table.
+
+    The cache is shared across all forms and keyed by the full table name
+    of the parent table. It is invalidated by `invalidate_foreign_data`
+    and, at most every `foreign_cache_timeout` seconds, checked against
+    the row count and update time of the parent table.
+
+    Parameters
+    ----------
+    table : datajoint.Table
+        parent table.
+    name : str
+        name of attribute to fetch.
+    aliased : dict
+        attribute map if the attribute is renamed in the child table.
+    """
+
+    entry = _foreign_entry(table)
+
+    if aliased is None:
+        key = name
+    else:
+        key = (name, tuple(sorted(aliased.items())))
+
+    if key not in entry['data']:
+        if aliased is None:
+            data = table.proj(name).fetch()[name]
+        else:
+            data = table.proj(**aliased).fetch()[name]
+        entry['data'][key] = data
+
+    return entry['data'][key]
+
+
+def _foreign_entry(table):
+    """cache entry of a table with its probe (see `table_probe`),
+    checked at most every `foreign_cache_timeout` seconds
+    """
 
-    # always add table name
-    skip_tables.append(table.full_table_name)
+    cache = config['_foreign_data']
+    entry = cache.get(table.full_table_name, None)
+    now = time.time()
 
-    if not table.connection.dependencies:
-        table.connection.dependencies.load()
+    if entry is None:
+        entry = {'probe': table_probe(table), 'checked': now, 'data': {}}
+        cache[table.full_table_name] = entry
+    elif now - entry['checked'] > config['foreign_cache_timeout']:
+        probe = table_probe(table)
+        if probe != entry['probe']:
+            entry['data'] = {}
+            entry['probe'] = probe
+        entry['checked'] = now
 
-    ancestors = table.ancestors()
+    return entry
 
-    if config.user_table.full_table_name in ancestors:
+
+def invalidate_foreign_data(*full_table_names):
+    """invalidate cached data of parent tables. If no table names
+    are given, the whole cache is emptied.
+    """
+
+    if not full_table_names:
+        config['_foreign_data'].clear()
+
+    for full_table_name in full_table_names:
+        config['_foreign_data'].pop(full_table_name, None)
+
+
+def ownership_paths(full_table_name):
+    """paths from a table to all tables that determine ownership of its
+    entries (i.e. that contain the user name attribute).
+
+    Each path is a list of (direction, full_table_name, attr_map) steps,
+    where direction is either 'parent' or 'child'. An empty path means that
+    the table itself contains the user name attribute. The paths are
+    memoized until the dependencies are refreshed.
+    """
+
+    ownership = config['_ownership']
+
+    if full_table_name not in ownership:
+        ownership[full_table_name] = _ownership_paths(
+            full_table_name, {full_table_name}
+        )
+
+    return ownership[full_table_name]
+
+
+def _ownership_paths(full_table_name, skip_tables):
+    """recursively walk parents and children to get ownership paths
+    """
+
+    dependencies = config['connection'].dependencies
+    if not dependencies:
+        dependencies.load()
+
+    table = config.get_table(full_table_name)
+    paths = []
+
+    def add_paths(direction, name, info, get_edges):
+        if info['aliased']:
+            # only a single one should exist if aliased
+            name = list(get_edges(name))[0]
+        if name in skip_tables:
+            return
+        skip_tables.add(name)
+        for path in _ownership_paths(name, skip_tables):
+            paths.append([(direction, name, info['attr_map'])] + path)
+
+    if (
+        config.user_table.full_table_name
+        in dependencies.ancestors(full_table_name)
+    ):
         if config['user_name'] in table.heading:
-            user_only = table & {config['user_name']: user}
-            return len(user_only) == len(table)
+            # the table itself determines ownership; children are not
+            # checked
+            return [[]]
         else:
-            for parent_name, parent_info in table.parents().items():
-                if parent_name in skip_tables:
-                    continue
-                if parent_info['aliased']:
-                    grandparents = table.connection.dependencies.parents(
-                        parent_name
-                    )
-                    # only a single one should exist if aliased
-                    parent_name = list(grandparents.keys())[0]
-
-                # get parent table
-                parent_table = config.get_table(parent_name)
-
-                # project only necessary keys
-                to_rename = {
-                    ele: key
-                    for key, ele in parent_info['attr_map'].items()
-                }
-                restricted_table = parent_table & table.proj(**to_rename)
-
-                if not user_has_permission(
-                    restricted_table, user, skip_tables
-                ):
-                    return False
+            for parent_name, parent_info in dependencies.parents(
+                full_table_name
+            ).items():
+                add_paths(
+                    'parent', parent_name, parent_info, dependencies.parents
+                )
 
     # checks if children have a parent table that is dependent on user table
-    for child_name, child_info in table.children().items():
-        if child_name in skip_tables:
-            continue
-        if child_info['aliased']:
-            grandchildren = table.connection.dependencies.children(
-                child_name
-            )
-            # only a single one should exist if aliased
-            child_name = list(grandchildren.keys())[0]
+    for child_name, child_info in dependencies.children(
+        full_table_name
+    ).items():
+        add_paths('child', child_name, child_info, dependencies.children)
 
-        # get child table
-        child_table = config.get_table(child_name)
+    return paths
 
-        # restrict only with necessary keys
-        restricted_table = child_table & table.proj(**child_info['attr_map'])
 
-        if not user_has_permission(
-            restricted_table, user, skip_tables
-        ):
-            return False
+def user_has_permission(table, user):
+    """test if user is allowed to delete an entry or perform another action
+    on a datajoint.Table
 
-    return True
+    All entries connected to the restricted table that belong to a user
+    are found with a single query using the (memoized) ownership paths.
+    """
+
+    if user in config['administrators']:
+        return True
+
+    groups = config.groups_of_user(user)
+
+    if table.database in groups:
+        return True
+
+    user_name = config['user_name']
+    quoted_user = str(user).replace("'", "''")
+    not_owned = f"`{user_name}` IS NULL OR `{user_name}` != '{quoted_user}'"
+
+    queries = []
+    for path in ownership_paths(table.full_table_name):
+        restricted_table = table
+        for direction, name, attr_map in path:
+            if name.replace('`', '').split('.')[0] in groups:
+                # tables in the schemas of the user's groups are allowed
+                break
+            if direction == 'parent':
+                to_rename = {ele: key for key, ele in attr_map.items()}
+            else:
+                to_rename = attr_map
+            restricted_table = (
+                config.get_table(name) & restricted_table.proj(**to_rename)
+            )
+        else:
+            queries.append(
+                f"EXISTS({(restricted_table & not_owned).make_sql()})"
+            )
+
+    if not queries:
+        return True
+
+    return not table.connection.query(
+        f"SELECT {' OR '.join(queries)};"
+    ).fetchone()[0]
 
 
 def get_jsontable(
     data, primary_key, edit_url=None, delete_url=None,
-    overwrite_url=None, name=None, load_url=None
+    overwrite_url=None, name=None, load_url=None, ajax_url=None
 ):
     """get json table from dataframe
+
+    If `ajax_url` is given, `data` only needs to have the correct columns;
+    the rows are loaded page by page from `ajax_url` (see `get_serverside`).
     """
 
     if primary_key is None:
@@ -132,6 +356,7 @@ def get_jsontable(
         data = pd.concat([_id, data], axis=1)
 
     jsontable = {}
+    jsontable['ajax_url'] = str(ajax_url)
     jsontable['delete_url'] = str(delete_url)
     jsontable['edit_url'] = str(edit_url)
     jsontable['load_url'] = str(load_url)
@@ -143,161 +368,270 @@ def get_jsontable(
     return jsontable
 
 
+def use_serverside(tables):
+    """whether (the join of) tables is large enough to be loaded page by
+    page
+
+    The row counts are cached with the foreign key choices (see
+    `get_foreign_data`) instead of counting the rows on every page load.
+    A join along foreign keys has about as many rows as its largest table.
+    """
+
+    limit = config['serverside_row_limit']
+
+    if limit is None:
+        return False
+
+    return max(
+        _foreign_entry(table)['probe'][0] for table in as_instances(tables)
+    ) > limit
+
+
+def serverside_relation(tables):
+    """joined relation of tables loaded page by page (see `get_serverside`)
+
+    The tables are joined in the given order instead of the order planned
+    by `loris.utils.plan_join`, which depends on row estimates, so that
+    the columns of the header and of each page are the same.
+    """
+
+    return save_join(tables, plan=False)
+
+
+def get_serverside_url(tables):
+    """url for the server-side json data of a (joined) list of tables
+    """
+
+    return url_for(
+        'datatable',
+        tables=[table.full_table_name for table in tables]
+    )
+
+
+def _like_restriction(column, value):
+    """restriction string to search for a value in a column
+    """
+
+    for char in ('\\', "'", '%', '_'):
+        value = value.replace(char, '\\' + char)
+
+    # percent signs are interpolated by the database driver
+    return f"`{column}` LIKE '%{value}%'".replace('%', '%%')
+
+
+def get_serverside(table, values):
+    """get a single page of a table according to the server-side
+    processing protocol of DataTables.
+
+    Parameters
+    ----------
+    table : datajoint.Table
+        (Joined) table to fetch. Only non-blob attributes are fetched.
+    values : dict-like
+        request values sent by DataTables (draw, start, length, order,
+        search and columns parameters).
+
+    Returns
+    -------
+    data : dict
+        dictionary with draw, recordsTotal, recordsFiltered and data keys.
+    """
+
+    table = table.proj(*table.heading.non_blobs)
+    primary_key = table.heading.primary_key
+    # first column is the _id column
+    columns = ['_id'] + list(table.heading.names)
+
+    # per column search
+    restricted_table = table
+    for n, column in enumerate(columns):
+        if not n:
+            continue
+        search = values.get(f'columns[{n}][search][value]', '')
+        if search:
+            restricted_table = (
+                restricted_table & _like_restriction(column, search)
+            )
+
+    # global search (list restrictions are combined with OR)
+    search = values.get('search[value]', '')
+    if search:
+        restricted_table = restricted_table & [
+            _like_restriction(column, search)
+            for column in columns[1:]
+        ]
+
+    # ordering
+    order_by = []
+    n = 0
+    while f'order[{n}][column]' in values:
+        index = int(values[f'order[{n}][column]'])
+        direction = values.get(f'order[{n}][dir]', 'asc').upper()
+        if 0 < index < len(columns) and direction in ('ASC', 'DESC'):
+            order_by.append(f'{columns[index]} {direction}')
+        n += 1
+    order_by.extend(primary_key)
+
+    start = max(int(values.get('start', 0)), 0)
+    length = int(values.get('length', 10))
+
+    kwargs = {}
+    if length > 0:
+        kwargs['limit'] = length
+        kwargs['offset'] = start
+
+    df = restricted_table.fetch(
+        format='frame', order_by=order_by, apply_adapter=False, **kwargs
+    ).reset_index()
+
+    if len(df):
+        _id = pd.Series(
+            df[primary_key].to_dict('records')
+        )
+        df = pd.concat([_id, df[columns[1:]]], axis=1)
+        data = df.astype(str).values.tolist()
+    else:
+        data = []
+
+    return {
+        'draw': int(values.get('draw', 0)),
+        'recordsTotal': len(table),
+        'recordsFiltered': len(restricted_table),
+        'data': data
+    }
+
+
 def name_lookup(full_name):
     """ Look for a table's class name given its full name. """
     return lookup_class_name(full_name, config['schemata']) or full_name
 
 
-def draw_helper(obj=None, type='table', only_essentials=False):
-    """
-    helper for drawing erds
+def erd_name(obj=None, type='table', only_essentials=False):
+    """name of a diagram of a table, a schema or all schemas (None)
     """
-    # Do not redo when image exists
+
     if obj is None:
-        filename = 'eerrdd'
+        name = 'erd'
     elif type == 'table':
-        filename = obj.full_table_name
+        name = obj.full_table_name.replace('`', '')
     else:
-        filename = obj
+        name = obj
 
-    filename = filename + str(only_essentials)
+    return f'{name}-{only_essentials}'
 
-    filepath = os.path.join(config['tmp_folder'], filename)
 
-    # append filename to empty list for removing when refreshing database
-    config['_empty'].append(filename)
+def erd_dependencies(obj=None, type='table'):
+    if type == 'table':
+        dependencies = obj.connection.dependencies
+    else:
+        dependencies = config['connection'].dependencies
+    if not dependencies:
+        dependencies.load()
+    return dependencies
 
-    filepaths = glob.glob(filepath + '*' + '.svg')
-    if len(filepaths) == 1:
-        return os.path.split(filepaths[0])[-1]
 
-    # add random string (for rendering purposes on browsers)
-    random_string = str(uuid.uuid4())
-    filename += random_string
-    filepath += random_string
+def dependency_graph(obj=None, type='table', only_essentials=False):
+    """tables and foreign keys of a diagram as a json-serializable dict
 
-    # rankdir TB?
-    # setup of graphviz
-    graph_attr = {
-        'size': '12, 12', 'rankdir': 'LR', 'splines': 'ortho',
-        'fontname':'helvetica'
-    }
-    node_attr = {
-        'style': 'filled, rounded', 'shape': 'record', 'align': 'center',
-        'ranksep': '0.1', 'fontsize': '10',
-        'penwidth': '1.5', 'height': '0.1', 'fontname':'helvetica'
-    }
-    edge_attr = {
-        'arrowsize': '0.7',
-        'headclip': 'true',
-        'penwidth': '1.5'
-    }
+    The graph contains the parents and children of a table (type 'table')
+    or all tables of a schema (or of all schemas if obj is None). Renamed
+    foreign keys are resolved to the parent table. Graphs are cached
+    until the dependency graph changes.
 
-    node_attrs = {
-        dj.Manual: {
-            'fillcolor': 'darkgreen',
-            'color': 'darkgreen',
-            'fontsize': '10',
-            'fontcolor': 'white'},
-        dj.Computed: {
-            'fillcolor': 'darkorchid3',
-            'color': 'darkorchid3',
-            'fontsize': '10',
-            'fontcolor': 'white'},
-        dj.Lookup: {
-            'fillcolor': 'azure4',
-            'color': 'azure4',
-            'fontsize': '10',
-            'fontcolor':'white'},
-        dj.Imported: {
-            'fillcolor': 'navyblue',
-            'color': 'navyblue',
-            'fontsize': '10',
-            'fontcolor': 'white'},
-        dj.Part: {
-            'fillcolor': 'azure4',
-            'color': 'azure4',
-            'fontsize': '6',
-            'fontcolor': 'white'},
-        dj.Settingstable: {
-            'fillcolor': 'goldenrod',
-            'color': 'goldenrod',
-            'fontsize': '6',
-            'fontcolor': 'white'},
-        dj.AutoComputed: {
-            'fillcolor': 'darkorchid4',
-            'color': 'darkorchid4',
-            'fontsize': '10',
-            'fontcolor': 'white'},
-        dj.AutoImported: {
-            'fillcolor': 'navy',
-            'color': 'navy',
-            'fontsize': '10',
-            'fontcolor': 'white'},
-    }
+    Returns
+    -------
+    graph : dict
+        digest of the dependency graph, root table (if any), clusters
+        (schemas), nodes (tables with class name, tier and url) and
+        edges (from parent to child).
+    """
 
-    edge_attrs = {
-        dj.Manual: {
-            'color': 'darkgreen',
-        },
-        dj.Computed: {
-            'color': 'darkorchid3',
-        },
-        dj.Lookup: {
-            'color': 'azure4',
-        },
-        dj.Imported: {
-            'color': 'navyblue',
-        },
-        dj.Part: {
-            'color': 'azure4',
-        },
-        dj.Settingstable: {
-            'color': 'goldenrod',
-        },
-        dj.AutoComputed: {
-            'color': 'darkorchid4',
-        },
-        dj.AutoImported: {
-            'color': 'navy',
-        },
-    }
+    dependencies = erd_dependencies(obj, type)
+    digest = graph_digest(dependencies)
+    name = erd_name(obj, type, only_essentials)
+
+    cache = config['_erds']
+    graph = cache.get_graph(name, digest)
+    if graph is not None:
+        return graph
 
-    dot = graphviz.Digraph(
-        graph_attr=graph_attr, node_attr=node_attr,
-        edge_attr=edge_attr, engine='dot', format='svg')
+    nodes = {}
+    clusters = {}
+    edges = {}
 
-    def add_node(name, node_attr={}):
+    def add_node(full_name):
         """
-        Add a node/table to the current graph (adding subgraphs if needed).
+        Add a node/table to the current graph (adding clusters if needed).
         """
 
+        name = class_name(full_name)
+        if name in nodes:
+            return name
+
         table_names = dict(
             zip(['schema', 'table', 'subtable'], name.split('.'))
         )
-        graph_attr = {
-            'color': 'black',
-            'label': '<<B>{}</B>>'.format(table_names['schema']),
-            'URL': url_for('erd', schema=table_names['schema']),
-            'target': '_top',
-            'style': 'rounded',
-            'penwidth': '3'
+        schema = table_names['schema']
+        if schema not in clusters:
+            clusters[schema] = {
+                'id': schema,
+                'label': schema,
+                'url': url_for('erd', schema=schema),
+            }
+        nodes[name] = {
+            'id': name,
+            'label': name.split('.')[-1],
+            'schema': schema,
+            'tier': dj.diagram._get_tier(full_name).__name__,
+            'url': url_for('table', **table_names),
         }
-
-        with dot.subgraph(
-            name='cluster_{}'.format(table_names['schema']),
-            node_attr=node_attr,
-            graph_attr=graph_attr
-        ) as subgraph:
-            subgraph.node(
-                name,
-                label='{}'.format(name.split('.')[-1]),
-                URL=url_for('table', **table_names),
-                target='_top', **node_attr
-            )
         return name
 
+    def add_edge(parent, child, full_parent, alias):
+        data = dependencies.get_edge_data(full_parent, alias) or {}
+        edges.setdefault((parent, child), {
+            'source': parent,
+            'target': child,
+            'primary': bool(data.get('primary', False)),
+            'aliased': bool(data.get('aliased', False)),
+        })
+
+    def resolve_child(node_name):
+        if dj.diagram._get_tier(node_name) is dj.diagram._AliasNode:
+            # renamed attribute
+            return list(dependencies.out_edges(node_name))[0][1]
+        return node_name
+
+    def resolve_parent(node_name):
+        if dj.diagram._get_tier(node_name) is dj.diagram._AliasNode:
+            # renamed attribute
+            return list(dependencies.in_edges(node_name))[0][0]
+        return node_name
+
+    class_names = {}
+
+    def class_name(full_name):
+        if full_name not in class_names:
+            class_names[full_name] = name_lookup(full_name)
+        return class_names[full_name]
+
+    essentials = {}
+    excluded_schemas = None
+
     def is_essential(name):
+        nonlocal excluded_schemas
+
+        if name in essentials:
+            return essentials[name]
+
+        if excluded_schemas is None:
+            # schemas of single users and groups
+            excluded_schemas = set(
+                config.group_table.proj().fetch()[config['group_name']]
+            ) | set(
+                config.user_table.proj().fetch()[config['user_name']]
+            )
+
         truth = dj.diagram._get_tier(name) in [
             dj.Manual, dj.Computed, dj.Lookup,
             dj.Imported, dj.AutoComputed, dj.AutoImported
@@ -305,7 +639,7 @@ def draw_helper(obj=None, type='table', only_essentials=False):
 
         if truth:
             try:
-                schema, table = name_lookup(name).split('.')
+                schema, table = class_name(name).split('.')
                 table = getattr(
                     config['schemata'][schema],
                     table
@@ -321,64 +655,31 @@ def draw_helper(obj=None, type='table', only_essentials=False):
                     or (
                         table.full_table_name
                         == config.assigned_table.full_table_name)
-                    or (
-                        schema
-                        in config.group_table.proj().fetch()[
-                            config['group_name']
-                        ]
-                    ) or (
-                        schema
-                        in config.user_table.proj().fetch()[
-                            config['user_name']
-                        ]
-                    )
+                    or schema in excluded_schemas
                 )
             except (KeyError, ValueError):
                 print('did not check essential table')
 
+        essentials[name] = truth
         return truth
 
+    root_id = None
     if type == 'table':
-        root_table = obj
-        root_dependencies = root_table.connection.dependencies
-        root_dependencies.load()
-        root_name = root_table.full_table_name
-        root_id = add_node(
-            name_lookup(root_name), node_attrs[dj.diagram._get_tier(root_name)]
-        )
+        root_name = obj.full_table_name
+        root_id = add_node(root_name)
 
         # in edges
-        for node_name, _ in root_dependencies.in_edges(root_name):
-            if dj.diagram._get_tier(node_name) is dj.diagram._AliasNode:
-                # renamed attribute
-                node_name = list(root_dependencies.in_edges(node_name))[0][0]
-
-            node_id = add_node(
-                name_lookup(node_name),
-                node_attrs[dj.diagram._get_tier(node_name)]
-            )
-            dot.edge(
-                node_id, root_id,
-                **edge_attrs[dj.diagram._get_tier(node_name)]
-            )
+        for alias, _ in dependencies.in_edges(root_name):
+            node_name = resolve_parent(alias)
+            node_id = add_node(node_name)
+            add_edge(node_id, root_id, node_name, alias)
 
         # out edges
-        for _, node_name in root_dependencies.out_edges(root_name):
-            if dj.diagram._get_tier(node_name) is dj.diagram._AliasNode:
-                # renamed attribute
-                node_name = list(root_dependencies.out_edges(node_name))[0][1]
-
-            node_id = add_node(
-                name_lookup(node_name),
-                node_attrs[dj.diagram._get_tier(node_name)]
-            )
-            dot.edge(
-                root_id, node_id,
-                **edge_attrs[dj.diagram._get_tier(root_name)]
-            )
+        for _, alias in dependencies.out_edges(root_name):
+            node_name = resolve_child(alias)
+            node_id = add_node(node_name)
+            add_edge(root_id, node_id, root_name, alias)
     else:
-        dependencies = config['connection'].dependencies
-        dependencies.load()
         for root_name in dependencies.nodes.keys():
             try:
                 int(root_name)
@@ -393,29 +694,21 @@ def draw_helper(obj=None, type='table', only_essentials=False):
             if only_essentials and not is_essential(root_name):
                 continue
 
-            root_id = add_node(
-                name_lookup(root_name),
-                node_attrs[dj.diagram._get_tier(root_name)]
-            )
+            node_id = add_node(root_name)
 
-            for _, node_name in dependencies.out_edges(root_name):
-                if dj.diagram._get_tier(node_name) is dj.diagram._AliasNode:
-                    # renamed attribute
-                    node_name = list(dependencies.out_edges(node_name))[0][1]
+            for _, alias in dependencies.out_edges(root_name):
+                node_name = resolve_child(alias)
                 if only_essentials and not is_essential(node_name):
                     continue
 
-                node_id = add_node(
-                    name_lookup(node_name),
-                    node_attrs[dj.diagram._get_tier(node_name)]
-                )
-                dot.edge(
-                    root_id, node_id,
-                    **edge_attrs[dj.diagram._get_tier(root_name)]
-                )
+                add_edge(node_id, add_node(node_name), root_name, alias)
 
-    if os.path.exists(filepath):
-        os.remove(filepath)
-    dot.render(filepath)
-
-    return f'{filename}.svg'
+    graph = {
+        'digest': digest,
+        'root': root_id,
+        'clusters': list(clusters.values()),
+        'nodes': list(nodes.values()),
+        'edges': list(edges.values()),
+    }
+    cache.set_graph(name, graph)
+    return graph
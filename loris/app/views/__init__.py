@@ -13,3 +13,4 @@ from .erd import *
 from .entries import *
 from .wiki import *
 from .autoscripts import *
+from .uploads import *
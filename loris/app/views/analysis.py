@@ -6,7 +6,7 @@ import os
 import subprocess
 
 from flask import render_template, request, flash, url_for, redirect, \
-    send_from_directory, session
+    send_from_directory, session, jsonify
 from functools import wraps
 from flask_login import current_user, login_user, login_required, logout_user
 import datajoint as dj
@@ -20,10 +20,11 @@ from loris.app.forms.fixed import (
     dynamic_jointablesform, dynamic_settingstableform, LoginForm,
     PasswordForm, dynamic_tablecreationform, dynamic_runform
 )
-from loris.app.utils import draw_helper, get_jsontable, user_has_permission
+from loris.app.utils import get_jsontable, user_has_permission
 from loris.utils import save_join
 from loris.app.login import User
-from loris.app.subprocess import Run
+from loris.app.scheduler import job_context
+from loris.errors import LorisError
 from loris.database.users import grantuser, change_password
 
 
@@ -130,14 +131,16 @@ def run(schema, table):
     table_class = getattr(config['schemata'][schema], table)
     form = dynamic_runform(table_class)()
     table_name = '.'.join([schema, table])
-    # load existing process
-    process = config['_autopopulate'].get(table_name, Run())
+    scheduler = config['_scheduler']
+    # show selected job or the last job of this table
+    job_id = request.args.get('job', None)
+    if job_id is None:
+        job_id = scheduler.latest(table_name)
 
     # guidance for running new populates
     dynamicform, _form = config.get_dynamicform(
         table_name, table_class, DynamicForm
     )
-    filename = dynamicform.draw_relations()
     # load/notload table
     data = dynamicform.get_jsontable()
     toggle_off_keys = [0]
@@ -145,14 +148,11 @@ def run(schema, table):
     if request.method == 'POST':
         submit = request.form.get('submit', None)
 
-        if (
-            not process.running
-            and submit == 'Run'
-            and form.validate_on_submit()
-        ):
+        if submit == 'Run' and form.validate_on_submit():
 
             formatted_dict = form.get_formatted()
             formatted_dict['reserve_jobs'] = True
+            priority = formatted_dict.pop('priority', None) or 0
 
             kwargs = json.dumps(formatted_dict)
 
@@ -173,25 +173,55 @@ def run(schema, table):
                 kwargs
             ]
 
-            config['_autopopulate'][table_name] = process
-            process.start(command, config['tmp_folder'])
-
-        elif submit == 'Abort':
-            process.abort()
+            job_id = scheduler.submit(
+                table_name, command, config['tmp_folder'],
+                user=current_user.user_name, priority=priority
+            )
+            flash(f'Queued job {job_id}', 'success')
 
-    stdout, stderr = process.check()
+        elif submit == 'Abort' and job_id is not None:
+            try:
+                scheduler.abort(job_id)
+            except LorisError as e:
+                flash(f"{e}", 'error')
+            else:
+                flash('Aborting job...', 'warning')
 
     return render_template(
         'pages/run.html',
         form=form,
         schema=schema,
         table=table,
-        stdout=stdout,
-        stderr=stderr,
         table_name=table_name,
         data=data,
         toggle_off_keys=toggle_off_keys,
-        filename=filename
+        graph_url=url_for('erd_graph', table=table_name),
+        url=url_for('run', schema=schema, table=table),
+        **job_context(scheduler, job_id, name=table_name)
+    )
+
+
+@app.route('/jobprogress/<job_id>')
+@login_required
+def jobprogress(job_id):
+    """wait (at most timeout seconds) for new output of a job since offset
+    """
+
+    scheduler = config['_scheduler']
+    offset = request.args.get('offset', 0, type=int)
+    timeout = min(request.args.get('timeout', 10, type=float), 60)
+
+    try:
+        output, offset = scheduler.wait_output(job_id, offset, timeout)
+        job = scheduler.get(job_id)
+    except LorisError as e:
+        return jsonify(error=str(e))
+
+    return jsonify(
+        output=output,
+        offset=offset,
+        status=job['status'],
+        running=job['status'] in ('queued', 'running')
     )
 
 
@@ -2,7 +2,7 @@
 """
 
 from flask import render_template, request, flash, url_for, redirect, \
-    send_from_directory, session
+    send_from_directory, session, jsonify
 from functools import wraps
 from flask_login import current_user, login_user, login_required, logout_user
 import datajoint as dj
@@ -18,19 +18,40 @@ from loris.app.forms.fixed import (
     dynamic_jointablesform, dynamic_settingstableform, LoginForm,
     PasswordForm, dynamic_tablecreationform, dynamic_autoscriptform,
 )
-from loris.app.utils import draw_helper, get_jsontable, user_has_permission
+from loris.app.utils import get_jsontable, user_has_permission
 from loris.utils import save_join
 from loris.app.login import User
 from loris.database.users import grantuser, change_password
 from loris.app.autoscripting.config_reader import ConfigReader
-from loris.app.subprocess import Run
+from loris.app.scheduler import job_context
+from loris.app.views.analysis import jobprogress
+from loris.errors import LorisError
 
 
 @app.route("/experimentprogress")
 def experimentprogress():
     """get lastline of ouput
+
+    If an offset is given, wait (at most timeout seconds) for output
+    since that offset and return it as json together with the new offset.
     """
-    return config.get('subprocess', Run()).lastline
+    scheduler = config['_scheduler']
+    job_id = request.args.get('job', None)
+    if job_id is None:
+        job_id = scheduler.latest()
+    if job_id is None:
+        return ''
+
+    offset = request.args.get('offset', None, type=int)
+
+    if offset is None:
+        stdout, stderr = scheduler.output(job_id)
+        if stderr:
+            return stderr
+        lines = stdout.splitlines()
+        return lines[-1] if lines else ''
+
+    return jobprogress(job_id)
 
 
 @app.route("/experiment",
@@ -59,7 +80,10 @@ def experiment(table_name, autoscript_folder):
 
     submit = request.args.get('submit', None)
 
-    process = config.get('subprocess', Run())
+    scheduler = config['_scheduler']
+    job_id = request.args.get('job', None)
+    if job_id is None and reader.initialized:
+        job_id = scheduler.latest(reader.job_name, current_user.user_name)
 
     if request.method == 'POST':
 
@@ -77,8 +101,13 @@ def experiment(table_name, autoscript_folder):
                 autoscript_folder=os.path.basename(autoscript_filepath),
                 table_name=table_name))
 
-        elif submit == 'Abort':
-            process.abort()
+        elif submit == 'Abort' and job_id is not None:
+            try:
+                scheduler.abort(job_id)
+            except LorisError as e:
+                flash(f"{e}", 'error')
+            else:
+                flash('Aborting job...', 'warning')
 
         elif reader.initialized:
             if (
@@ -90,7 +119,7 @@ def experiment(table_name, autoscript_folder):
                         'check all fields in the forms')
                 )
             ):
-                reader.run(submit)
+                job_id = reader.run(submit, current_user.user_name)
 
             elif (
                 (submit == 'Save')
@@ -109,8 +138,6 @@ def experiment(table_name, autoscript_folder):
     else:
         reader.populate_form(_id)
 
-    stdout, stderr = process.check()
-
     return render_template(
         f'pages/experiment.html',
         form=form,
@@ -121,8 +148,6 @@ def experiment(table_name, autoscript_folder):
         ultra_form=reader.ultra_form,
         buttons=reader.buttons,
         enter_show=enter_show,
-        stdout=stdout,
-        stderr=stderr,
         url_experiment=(None if table_name is None else url_for(
             'table',
             **{
@@ -130,7 +155,12 @@ def experiment(table_name, autoscript_folder):
                 for key, value in
                 zip(('schema', 'table', 'subtable'), table_name.split('.'))
             }
-        ))
+        )),
+        **job_context(
+            scheduler, job_id,
+            name=(reader.job_name if reader.initialized else None),
+            user=current_user.user_name
+        )
     )
 
 
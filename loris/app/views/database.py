@@ -5,7 +5,7 @@ import os
 import uuid
 
 from flask import render_template, request, flash, url_for, redirect, \
-    send_from_directory, session
+    send_from_directory, session, jsonify, Response, stream_with_context
 from functools import wraps
 from flask_login import current_user, login_user, login_required, logout_user
 import datajoint as dj
@@ -13,6 +13,7 @@ import pandas as pd
 from ast import literal_eval
 
 from loris import config
+from loris.errors import LorisError
 from loris.app.app import app
 from loris.app.templates import form_template
 from loris.app.forms.dynamic_form import DynamicForm
@@ -20,8 +21,11 @@ from loris.app.forms.fixed import (
     dynamic_jointablesform, dynamic_settingstableform, LoginForm,
     PasswordForm, dynamic_tablecreationform
 )
-from loris.app.utils import draw_helper, get_jsontable, user_has_permission
-from loris.utils import save_join
+from loris.app.utils import (
+    get_jsontable, user_has_permission, get_serverside,
+    serverside_relation, preview_join
+)
+from loris.app.export import export_relation, stream_csv
 from loris.app.login import User
 from loris.database.users import grantuser, change_password
 
@@ -29,7 +33,7 @@ from loris.database.users import grantuser, change_password
 @app.route('/refresh')
 @login_required
 def refresh():
-    app.session_refresh()
+    app.session_refresh(force=True)
     return render_template('pages/refresh.html')
 
 
@@ -72,6 +76,7 @@ def join():
     formclass = dynamic_jointablesform()
     form = formclass()
     data = "None"
+    preview = None
 
     if request.method == 'POST':
         submit = request.form.get('submit', None)
@@ -81,7 +86,7 @@ def join():
         if submit is None:
             pass
 
-        elif submit in ['Join', 'Download']:
+        elif submit in ['Preview', 'Join', 'Download']:
             if form.validate_on_submit():
                 formatted_dict = form.get_formatted()
 
@@ -90,31 +95,51 @@ def join():
                     for n, table_name in enumerate(formatted_dict['tables']):
                         tables.append(formclass.tables_dict[table_name])
 
-                    joined_table = save_join(tables)
-                    if formatted_dict['restriction'] is not None:
-                        joined_table = (
-                            joined_table & formatted_dict['restriction']
-                        )
+                    # explain join before running it
+                    preview = preview_join(
+                        tables, formatted_dict['restriction']
+                    )
+                    joined_table = preview['relation']
                 except dj.DataJointError as e:
                     flash(f"{e}", 'error')
                 else:
-                    if submit == 'Download':
-                        df = joined_table.fetch(format='frame').reset_index()
-                        filename = str(uuid.uuid4()) + '.pkl'
-                        filepath = os.path.join(
-                            config['tmp_folder'], filename
+                    for table_name in preview['cartesian']:
+                        flash(
+                            f"Table {table_name} shares no attributes with "
+                            "the tables before it and is joined as a "
+                            "cartesian product.", 'warning'
+                        )
+
+                    if submit == 'Preview':
+                        flash(
+                            f"Estimated number of rows: "
+                            f"{preview['estimate']}", 'secondary'
                         )
-                        df.to_pickle(filepath)
+                    elif (
+                        preview['over_budget']
+                        and not formatted_dict['confirm']
+                    ):
                         flash(
-                            f"Downloaded pandas pickle file {filename} "
-                            "for joined table",
-                            'success'
+                            f"The join is estimated to return "
+                            f"{preview['estimate']} rows, which exceeds the "
+                            f"row budget of {preview['budget']}; check the "
+                            "query plan and confirm the join to run it.",
+                            'error'
+                        )
+                    elif submit == 'Download':
+                        return download_relation(
+                            joined_table,
+                            formatted_dict['download_format'],
+                            formatted_dict['blobs']
                         )
-                        return redirect(url_for('tmpfile', filename=filename))
                     else:
-                        df = joined_table.proj(
-                            *joined_table.heading.non_blobs
-                        ).fetch(format='frame').reset_index()
+                        # blobs, attachments and filepaths are not shown
+                        non_blobs = set(joined_table.heading.non_blobs)
+                        df = joined_table.proj(*(
+                            name for name
+                            in joined_table.heading.secondary_attributes
+                            if name in non_blobs
+                        )).fetch(format='frame').reset_index()
                         data = get_jsontable(
                             df, joined_table.heading.primary_key
                         )
@@ -127,10 +152,63 @@ def join():
         form=form,
         url=url_for('join'),
         data=data,
+        preview=preview,
         toggle_off_keys=[0]
     )
 
 
+def download_relation(relation, fmt, blobs):
+    """download relation fetched in batches; csv files without blobs
+    are streamed directly, other files are written to the temporary
+    folder first.
+    """
+
+    batch_size = config['export_batch_size']
+
+    if fmt == 'csv' and blobs == 'exclude':
+        return Response(
+            stream_with_context(stream_csv(relation, batch_size)),
+            mimetype='text/csv',
+            headers={
+                'Content-Disposition':
+                f'attachment; filename={uuid.uuid4().hex}.csv'
+            }
+        )
+
+    try:
+        filename = export_relation(
+            relation, config['tmp_folder'], fmt, blobs, batch_size
+        )
+    except (LorisError, dj.DataJointError) as e:
+        flash(f"{e}", 'error')
+        return redirect(url_for('join'))
+
+    # append filename to empty list for removing when refreshing database
+    config['_empty'].append(filename)
+    return send_from_directory(
+        config['tmp_folder'], filename, as_attachment=True
+    )
+
+
+@app.route('/datatable', methods=['GET', 'POST'])
+@login_required
+def datatable():
+    """json data for server-side processing of (joined) tables
+    """
+
+    table_names = request.values.getlist('tables')
+
+    try:
+        if not table_names:
+            raise LorisError('No tables specified.')
+        tables = [config.get_table(table_name) for table_name in table_names]
+        data = get_serverside(serverside_relation(tables), request.values)
+    except (dj.DataJointError, LorisError, ValueError) as e:
+        return jsonify(error=str(e))
+
+    return jsonify(data)
+
+
 @app.route('/jobs/<schema>', methods=['GET', 'POST'])
 @login_required
 def jobs(schema):
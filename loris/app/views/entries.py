@@ -2,6 +2,9 @@
 """
 
 
+import json
+import os
+
 from flask import render_template, request, flash, url_for, redirect, \
     send_from_directory, session
 from functools import wraps
@@ -16,12 +19,16 @@ from loris.app.templates import form_template
 from loris.app.forms.dynamic_form import DynamicForm
 from loris.app.forms.fixed import (
     dynamic_jointablesform, dynamic_settingstableform, LoginForm,
-    PasswordForm, dynamic_tablecreationform
+    PasswordForm, dynamic_tablecreationform, ImportForm
+)
+from loris.app.utils import (
+    get_jsontable, user_has_permission, invalidate_foreign_data
 )
-from loris.app.utils import draw_helper, get_jsontable, user_has_permission
 from loris.utils import save_join
 from loris.app.login import User
 from loris.database.users import grantuser, change_password
+from loris.app.scheduler import job_context
+from loris.errors import LorisError
 
 
 
@@ -67,6 +74,9 @@ def delete(schema, table, subtable):
 
         if submit == 'Delete' and commit_transaction:
             conn.commit_transaction()
+            # deletes cascade, so all cached foreign key choices are stale
+            invalidate_foreign_data()
+            config.forget_groups()
             # reset table (will not cascade)
             dynamicform, form = config.get_dynamicform(
                 table_name, table_class, DynamicForm
@@ -157,3 +167,85 @@ def table(schema, table, subtable):
         schema, table, subtable, edit_url, overwrite_url, page='table',
         override_permissions=override_permissions
     )
+
+
+@app.route('/import/<schema>/<table>', methods=['GET', 'POST'])
+@login_required
+def bulkimport(schema, table):
+    """import a csv, parquet or json file into a table as a job
+    """
+
+    table_name = '.'.join([schema, table])
+    table_class = config['tables'].get(table_name, None)
+    if table_class is None:
+        flash(f'Table {table_name} does not exist', 'error')
+        return redirect(url_for('home'))
+
+    form = ImportForm()
+    scheduler = config['_scheduler']
+    job_name = f'import {table_name}'
+    job_id = request.args.get('job', None)
+    if job_id is None:
+        job_id = scheduler.latest(job_name, current_user.user_name)
+
+    if request.method == 'POST':
+        submit = request.form.get('submit', None)
+
+        if submit == 'Import' and form.validate_on_submit():
+            formatted_dict = form.get_formatted()
+            filepath = formatted_dict.pop('import_file')
+            priority = formatted_dict.pop('priority', None) or 0
+
+            # only administrators can insert entries of other users
+            if (
+                current_user.user_name not in config['administrators']
+                and config['user_name'] in table_class.heading
+            ):
+                formatted_dict['defaults'] = {
+                    config['user_name']: current_user.user_name
+                }
+
+            command = [
+                "python",
+                os.path.join(
+                    os.path.dirname(os.path.dirname(__file__)),
+                    "analysis",
+                    "run_import.py",
+                ),
+                "--schema",
+                schema,
+                "--table",
+                table,
+                "--file",
+                filepath,
+                "--kwargs",
+                json.dumps(formatted_dict)
+            ]
+
+            job_id = scheduler.submit(
+                job_name, command, config['tmp_folder'],
+                user=current_user.user_name, priority=priority,
+                files=[filepath]
+            )
+            flash(f'Queued job {job_id}', 'success')
+
+        elif submit == 'Abort' and job_id is not None:
+            try:
+                scheduler.abort(job_id)
+            except LorisError as e:
+                flash(f"{e}", 'error')
+            else:
+                flash('Aborting job...', 'warning')
+
+    return render_template(
+        'pages/import.html',
+        form=form,
+        schema=schema,
+        table=table,
+        table_name=table_name,
+        columns=table_class.heading.names,
+        url=url_for('bulkimport', schema=schema, table=table),
+        **job_context(
+            scheduler, job_id, name=job_name, user=current_user.user_name
+        )
+    )
@@ -3,7 +3,7 @@
 
 
 from flask import render_template, request, flash, url_for, redirect, \
-    send_from_directory, session
+    send_from_directory, session, jsonify
 from functools import wraps
 from flask_login import current_user, login_user, login_required, logout_user
 import datajoint as dj
@@ -18,7 +18,9 @@ from loris.app.forms.fixed import (
     dynamic_jointablesform, dynamic_settingstableform, LoginForm,
     PasswordForm, dynamic_tablecreationform
 )
-from loris.app.utils import draw_helper, get_jsontable, user_has_permission
+from loris.app.utils import (
+    get_jsontable, user_has_permission, dependency_graph
+)
 from loris.utils import save_join
 from loris.app.login import User
 from loris.database.users import grantuser, change_password
@@ -31,12 +33,50 @@ def erd(schema):
 
     only_essentials = literal_eval(request.args.get('only_essentials', 'False'))
 
-    filename = draw_helper(
-        schema, type='schema', only_essentials=only_essentials
-    )
-
     return render_template(
-        'pages/erd.html', filename=filename,
+        'pages/erd.html',
+        graph_url=url_for(
+            'erd_graph', schema=schema, only_essentials=only_essentials
+        ),
         url=url_for('erd', schema=schema),
         schema=('ERD' if schema is None else schema),
     )
+
+
+@app.route('/erd-graph', methods=['GET'])
+@login_required
+def erd_graph():
+    """dependency graph of a table (`table`), a schema (`schema`) or all
+    schemas as json, which is laid out in the browser
+    """
+
+    table_name = request.args.get('table', None)
+
+    if table_name is None:
+        only_essentials = literal_eval(
+            request.args.get('only_essentials', 'False')
+        )
+        graph = dependency_graph(
+            request.args.get('schema', None), type='schema',
+            only_essentials=only_essentials
+        )
+    else:
+        # same lookup as `form_template`; config['tables'] does not
+        # contain lookup tables and settings tables
+        try:
+            schema, table, *subtable = table_name.split('.')
+            table_class = getattr(config['schemata'][schema], table)
+            if subtable:
+                table_class = getattr(table_class, subtable[0])
+        except (ValueError, KeyError, AttributeError):
+            return jsonify(
+                error=f'Table {table_name} does not exist.'
+            ), 404
+        graph = dependency_graph(table_class)
+
+    # the browser only downloads the graph again if the schema changed
+    response = jsonify(graph)
+    response.set_etag(graph['digest'])
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
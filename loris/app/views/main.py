@@ -16,7 +16,7 @@ from loris.app.forms.fixed import (
     dynamic_jointablesform, dynamic_settingstableform, LoginForm,
     PasswordForm, dynamic_tablecreationform
 )
-from loris.app.utils import draw_helper, get_jsontable, user_has_permission
+from loris.app.utils import get_jsontable, user_has_permission
 from loris.utils import save_join
 from loris.app.login import User
 from loris.database.users import grantuser, change_password, grantprivileges
@@ -31,6 +31,7 @@ def login():
 
     if form.validate_on_submit():
         user = User(form.user_name.data)
+        config.forget_groups(user.user_name)
         if user.user_name == 'root':
             flash('Cannot login as root', 'error')
         elif not user.user_exists or not user.check_password(form.password.data):
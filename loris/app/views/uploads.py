@@ -0,0 +1,82 @@
+"""views for resumable uploads of large files
+"""
+
+from flask import request, url_for, jsonify
+from flask_login import current_user, login_required
+
+from loris import config
+from loris.errors import LorisError
+from loris.app.app import app
+
+
+def upload_response(info, status=200):
+    store = config['_uploads']
+    return jsonify(
+        upload_id=info['upload_id'],
+        handle=store.handle(info['upload_id']),
+        url=url_for('upload', upload_id=info['upload_id']),
+        filename=info['filename'],
+        size=info['size'],
+        offset=info['offset'],
+        chunk_size=store.chunk_size,
+        complete=info['offset'] == info['size']
+    ), status
+
+
+@app.route('/upload', methods=['POST'])
+@login_required
+def create_upload():
+    """create an upload given the filename and size of the file
+    """
+
+    data = request.get_json(silent=True) or request.form
+    try:
+        size = int(data.get('size'))
+        info = config['_uploads'].create(
+            data.get('filename'), size, current_user.user_name
+        )
+    except (LorisError, TypeError, ValueError) as e:
+        return jsonify(error=str(e)), 400
+
+    return upload_response(info, 201)
+
+
+@app.route('/upload/<upload_id>', methods=['GET', 'PATCH', 'DELETE'])
+@login_required
+def upload(upload_id):
+    """offset of an upload (GET), append a chunk at the offset given by
+    the Upload-Offset header (PATCH) or delete the upload (DELETE)
+    """
+
+    store = config['_uploads']
+    user = current_user.user_name
+
+    if request.method == 'GET':
+        try:
+            info = store.get(upload_id, user)
+        except LorisError as e:
+            return jsonify(error=str(e)), 404
+        return upload_response(info)
+
+    elif request.method == 'DELETE':
+        try:
+            store.delete(upload_id, user)
+        except LorisError as e:
+            return jsonify(error=str(e)), 404
+        return jsonify(upload_id=upload_id, deleted=True)
+
+    try:
+        offset = int(request.headers['Upload-Offset'])
+    except (KeyError, ValueError):
+        return jsonify(error='Upload-Offset header required.'), 400
+
+    try:
+        # the body is streamed to disk and never read into memory at once
+        info = store.append(
+            upload_id, offset, request.stream,
+            request.content_length, user
+        )
+    except LorisError as e:
+        return jsonify(error=str(e)), 409
+
+    return upload_response(info)
@@ -5,11 +5,15 @@ import re
 import os
 import shutil
 import json
+import uuid
+import hashlib
 
 import numpy as np
 import datajoint as dj
 
 from loris.database.mixin import Placeholder, ProcessMixin
+from loris.database.chunked import write_chunked, ChunkedArrayReader
+from loris.errors import LorisError
 
 
 class TrueBool(dj.AttributeAdapter):
@@ -312,6 +316,181 @@ class AttachPlaceholder(dj.AttributeAdapter, ProcessMixin):
         return self.get_process(Placeholder.read(value))
 
 
+class FilestoreArrayMixin:
+    """save numeric arrays in a filestore named by the hash of
+    their content.
+    """
+
+    subfolder = None
+    chunksize = 2**20
+
+    def __init__(self, store='datastore'):
+        self.store = store
+
+    @property
+    def location(self):
+        spec = dj.config['stores'].get(self.store, None)
+        if spec is None or spec.get('protocol', None) != 'file':
+            raise dj.DataJointError(
+                f"store '{self.store}' must be a filestore with "
+                f"protocol 'file' for {self.__class__.__name__}."
+            )
+        return spec['location']
+
+    def load_array(self, obj):
+        """array to save (.npy files are memory-mapped)
+        """
+
+        if isinstance(obj, str):
+            if not obj.endswith('.npy'):
+                raise dj.DataJointError(
+                    f"file '{obj}' must be a .npy file."
+                )
+            try:
+                return np.load(obj, mmap_mode='r')
+            except ValueError:
+                # arrays of python objects cannot be memory-mapped
+                raise LorisError(
+                    f"file '{obj}' contains an array of dtype object, "
+                    f"which cannot be saved as {self.__class__.__name__}."
+                )
+
+        obj = np.asanyarray(obj)
+        if obj.dtype.kind == 'O':
+            raise LorisError(
+                f'arrays of dtype object cannot be saved '
+                f'as {self.__class__.__name__}.'
+            )
+        return obj
+
+    def relpath(self, array, ext=''):
+        """path relative to filestore based on hash of array
+        """
+
+        digest = self._hash_array(array)
+        return os.path.join(
+            self.subfolder, digest[:2], digest[2:4], digest + ext
+        )
+
+    def _hash_array(self, array):
+        md5 = hashlib.md5(f'{array.dtype.str}{array.shape}'.encode())
+        if array.size == 0:
+            # empty arrays are defined by their dtype and shape
+            return md5.hexdigest()
+        # hash in chunks along the first axis to avoid copies of the array
+        array = array.reshape(len(array), -1) if array.ndim else array[None]
+        step = max(self.chunksize // max(array[:1].nbytes, 1), 1)
+        for idx in range(0, len(array), step):
+            md5.update(np.ascontiguousarray(array[idx:idx + step]).data)
+        return md5.hexdigest()
+
+
+class MemmapArray(FilestoreArrayMixin, dj.AttributeAdapter):
+    """numpy array saved as .npy file in a filestore and fetched as
+    a read-only memory-mapped array.
+
+    Only the path of the file relative to the filestore is saved in the
+    table. Files are named by the hash of their content.
+    Files are not removed when entries are deleted.
+    """
+
+    attribute_type = 'varchar(255)'
+    subfolder = 'memmap'
+
+    def put(self, obj):
+        """save array (or existing .npy file) in filestore
+        """
+
+        if obj is None:
+            return
+
+        filepath = obj if isinstance(obj, str) else None
+        obj = self.load_array(obj)
+        # hashed like arrays, so that the same data is saved once
+        relpath = self.relpath(obj, '.npy')
+        target = os.path.join(self.location, relpath)
+
+        if not os.path.exists(target):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            tmp_filepath = f'{target}.{uuid.uuid4().hex}.tmp'
+            try:
+                if filepath is not None:
+                    shutil.copyfile(filepath, tmp_filepath)
+                else:
+                    with open(tmp_filepath, 'wb') as f:
+                        np.save(f, obj)
+                os.replace(tmp_filepath, target)
+            finally:
+                if os.path.exists(tmp_filepath):
+                    os.remove(tmp_filepath)
+
+        return relpath
+
+    def get(self, value):
+        """memory-map array
+        """
+
+        if value is None:
+            return
+
+        return np.load(os.path.join(self.location, value), mmap_mode='r')
+
+
+class ChunkedArray(FilestoreArrayMixin, dj.AttributeAdapter):
+    """numpy array saved in compressed chunks along the first axis in
+    a filestore and fetched as a lazy array (ChunkedArrayReader), which
+    only decodes the chunks needed when sliced.
+
+    Chunks are compressed with blosc, zstd, lz4 or zlib (whichever is
+    installed first) and encoded/decoded in a thread pool.
+    Files are not removed when entries are deleted.
+    """
+
+    attribute_type = 'varchar(255)'
+    subfolder = 'chunked'
+
+    def __init__(
+        self, store='datastore', chunk_bytes=2**24, codec=None,
+        level=None, max_workers=None
+    ):
+        super().__init__(store)
+        self.chunk_bytes = chunk_bytes
+        self.codec = codec
+        self.level = level
+        self.max_workers = max_workers
+
+    def put(self, obj):
+        """compress array (or .npy file) into filestore
+        """
+
+        if obj is None:
+            return
+
+        obj = self.load_array(obj)
+        relpath = self.relpath(obj)
+        folder = os.path.join(self.location, relpath)
+
+        if not os.path.exists(folder):
+            write_chunked(
+                folder, obj, chunk_bytes=self.chunk_bytes,
+                codec=self.codec, level=self.level,
+                max_workers=self.max_workers
+            )
+
+        return relpath
+
+    def get(self, value):
+        """lazy chunked array
+        """
+
+        if value is None:
+            return
+
+        return ChunkedArrayReader(
+            os.path.join(self.location, value), self.max_workers
+        )
+
+
 chr = Chromosome()
 link = Link()
 fishidentifier = FishIdentifier()
@@ -323,6 +502,8 @@ tags = ListString()
 dictstring = DictString()
 attachprocess = AttachProcess()
 attachplaceholder = AttachPlaceholder()
+memmaparray = MemmapArray()
+chunkedarray = ChunkedArray()
 lookupname = LookupName()
 email = Email()
 phone = Phone()
@@ -339,6 +520,8 @@ custom_attributes_dict = {
     'tags': tags,
     'attachprocess': attachprocess,
     'attachplaceholder': attachplaceholder,
+    'memmaparray': memmaparray,
+    'chunkedarray': chunkedarray,
     'lookupname': lookupname,
     'email': email,
     'phone': phone
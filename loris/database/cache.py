@@ -0,0 +1,321 @@
+"""local cache of external blobs (e.g. blob@datastore attributes)
+"""
+
+import os
+import copy
+import uuid
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from datajoint import blob, external
+
+
+class CachedBlob(bytes):
+    """bytes of an external blob that know their hash
+
+    If the decoded object is in the memory cache, the bytes are empty and
+    `load` reads the actual bytes if needed.
+    """
+
+    def __new__(cls, data, key, load=None):
+        self = super().__new__(cls, data)
+        self.key = key
+        self.load = load
+        return self
+
+
+class BlobCache:
+    """size-bounded LRU cache of external blobs keyed by their hash
+
+    External blobs are content addressed, so cached entries never become
+    stale. The memory tier keeps decoded objects and the disk tier keeps
+    the raw bytes read from the filestore.
+
+    Parameters
+    ----------
+    memory_size : int
+        Maximum number of bytes of decoded objects kept in memory.
+        0 disables the memory tier.
+    disk_size : int
+        Maximum number of bytes kept in the disk folder. 0 disables the
+        disk tier.
+    folder : str
+        Folder of the disk tier.
+    copy : bool
+        Return copies of cached objects, so that modifying a fetched
+        object does not modify the cache. If False, cached numpy arrays
+        are returned read-only and other objects are shared. Defaults to
+        True.
+    """
+
+    def __init__(self, memory_size, disk_size=0, folder=None, copy=True):
+        self.memory_size = memory_size
+        self.disk_size = disk_size if folder is not None else 0
+        self.folder = folder
+        self.copy = copy
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.RLock()
+        # hash -> {squeeze: (object, size)}
+        self._objects = OrderedDict()
+        self._memory_used = 0
+        # hash -> size
+        self._files = OrderedDict()
+        self._disk_used = 0
+
+        if self.disk_size:
+            os.makedirs(folder, exist_ok=True)
+            self._scan()
+
+    @classmethod
+    def from_config(cls, config):
+        """create cache from loris configuration
+        """
+
+        folder = config['blob_cache_folder']
+        if folder is None:
+            folder = os.path.join(config['tmp_folder'], 'blob_cache')
+
+        return cls(
+            config['blob_cache_memory'],
+            config['blob_cache_disk'],
+            os.path.expanduser(folder),
+            config['blob_cache_copy']
+        )
+
+    def _scan(self):
+        # index existing files, least recently used first
+        files = []
+        for root, _, filenames in os.walk(self.folder):
+            for filename in filenames:
+                filepath = os.path.join(root, filename)
+                if filename.endswith('.tmp'):
+                    # left over by an interrupted write
+                    try:
+                        os.remove(filepath)
+                    except OSError:
+                        pass
+                    continue
+                stat = os.stat(filepath)
+                files.append((stat.st_mtime, filename, stat.st_size))
+        for _, filename, size in sorted(files):
+            self._files[filename] = size
+            self._disk_used += size
+        self._evict_files()
+
+    def _filepath(self, key):
+        return os.path.join(self.folder, key[:2], key[2:4], key)
+
+    def read(self, key):
+        """bytes from the disk tier or None
+        """
+
+        if not self.disk_size:
+            return
+
+        with self._lock:
+            if key not in self._files:
+                return
+            self._files.move_to_end(key)
+
+        filepath = self._filepath(key)
+        try:
+            with open(filepath, 'rb') as f:
+                data = f.read()
+            # keep recency across restarts
+            os.utime(filepath)
+        except OSError:
+            with self._lock:
+                self._disk_used -= self._files.pop(key, 0)
+            return
+
+        return data
+
+    def write(self, key, data):
+        """add bytes to the disk tier
+        """
+
+        if not self.disk_size or len(data) > self.disk_size:
+            return
+
+        filepath = self._filepath(key)
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        tmp_filepath = f'{filepath}.{uuid.uuid4().hex}.tmp'
+        try:
+            with open(tmp_filepath, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_filepath, filepath)
+        except OSError:
+            if os.path.exists(tmp_filepath):
+                os.remove(tmp_filepath)
+            return
+
+        with self._lock:
+            self._disk_used += len(data) - self._files.pop(key, 0)
+            self._files[key] = len(data)
+            self._evict_files()
+
+    def _evict_files(self):
+        while self._disk_used > self.disk_size and self._files:
+            key, size = self._files.popitem(last=False)
+            self._disk_used -= size
+            try:
+                os.remove(self._filepath(key))
+            except OSError:
+                pass
+
+    def has_object(self, key):
+        return key in self._objects
+
+    def get_object(self, key, squeeze):
+        """decoded object from the memory tier or None
+        """
+
+        with self._lock:
+            entry = self._objects.get(key, {}).get(squeeze, None)
+            if entry is None:
+                self.misses += 1
+                return None, False
+            self._objects.move_to_end(key)
+            self.hits += 1
+
+        return self._output(entry[0]), True
+
+    def put_object(self, key, squeeze, obj, size):
+        """add decoded object to the memory tier and return the object
+        that should be passed on
+        """
+
+        if not self.memory_size or size > self.memory_size:
+            return obj
+
+        if self.copy:
+            cached, obj = obj, self._copy(obj)
+        else:
+            cached = obj = self._readonly(obj)
+
+        with self._lock:
+            entries = self._objects.setdefault(key, {})
+            if squeeze in entries:
+                self._memory_used -= entries[squeeze][1]
+            entries[squeeze] = (cached, size)
+            self._memory_used += size
+            self._objects.move_to_end(key)
+
+            while self._memory_used > self.memory_size and self._objects:
+                _, entries = self._objects.popitem(last=False)
+                self._memory_used -= sum(
+                    size for _, size in entries.values()
+                )
+
+        return obj
+
+    def _output(self, obj):
+        if self.copy:
+            return self._copy(obj)
+        return obj
+
+    @staticmethod
+    def _copy(obj):
+        # plain arrays do not need the recursion of deepcopy
+        if isinstance(obj, np.ndarray) and obj.dtype != object:
+            return obj.copy()
+        return copy.deepcopy(obj)
+
+    @staticmethod
+    def _readonly(obj):
+        if isinstance(obj, np.ndarray):
+            obj.flags.writeable = False
+        return obj
+
+    def clear(self):
+        """empty the memory tier
+        """
+
+        with self._lock:
+            self._objects.clear()
+            self._memory_used = 0
+
+    @property
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'memory_used': self._memory_used,
+            'memory_entries': len(self._objects),
+            'disk_used': self._disk_used,
+            'disk_entries': len(self._files),
+        }
+
+
+_cache = None
+
+
+def get_blob_cache():
+    """currently installed blob cache or None
+    """
+    return _cache
+
+
+def install_blob_cache(cache):
+    """route datajoint external blob reads and decoding through cache
+
+    Installing a new cache replaces the previous one.
+    """
+
+    global _cache
+
+    if _cache is None:
+        _patch()
+
+    _cache = cache
+    return cache
+
+
+def _patch():
+    get = external.ExternalTable.get
+    unpack = blob.unpack
+
+    def cached_get(self, uuid, *args, **kwargs):
+        cache = _cache
+        if cache is None or uuid is None:
+            return get(self, uuid, *args, **kwargs)
+
+        key = uuid.hex
+
+        def load():
+            return get(self, uuid, *args, **kwargs)
+
+        # decoded object is already in memory
+        if cache.has_object(key):
+            return CachedBlob(b'', key, load)
+
+        data = cache.read(key)
+        if data is None:
+            data = load()
+            if data is None:
+                return data
+            cache.write(key, data)
+
+        return CachedBlob(data, key, load)
+
+    def cached_unpack(data, squeeze=False, *args, **kwargs):
+        cache = _cache
+        if cache is None or not isinstance(data, CachedBlob):
+            return unpack(data, squeeze, *args, **kwargs)
+
+        obj, found = cache.get_object(data.key, squeeze)
+        if found:
+            return obj
+
+        if not data:
+            # placeholder for an object evicted in the meantime
+            data = CachedBlob(data.load(), data.key)
+
+        obj = unpack(bytes(data), squeeze, *args, **kwargs)
+        size = obj.nbytes if isinstance(obj, np.ndarray) else len(data)
+        return cache.put_object(data.key, squeeze, obj, size)
+
+    external.ExternalTable.get = cached_get
+    blob.unpack = cached_unpack
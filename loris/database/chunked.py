@@ -0,0 +1,295 @@
+"""chunked and compressed storage of numeric arrays
+
+Arrays are split into chunks along the first axis. Each chunk is
+compressed and saved as a separate file in a folder, together with a
+json file describing the array. Chunks are encoded and decoded in a pool
+of threads (all codecs release the GIL).
+"""
+
+import os
+import json
+import uuid
+import shutil
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+
+META_FILE = 'meta.json'
+
+
+def _zlib_codec():
+    return (
+        lambda data, itemsize, level: zlib.compress(data, level),
+        zlib.decompress
+    )
+
+
+def _blosc_codec():
+    import blosc
+    return (
+        lambda data, itemsize, level: blosc.compress(
+            data, typesize=itemsize, clevel=level,
+            cname='zstd', shuffle=blosc.SHUFFLE
+        ),
+        blosc.decompress
+    )
+
+
+def _zstd_codec():
+    import zstandard
+    return (
+        lambda data, itemsize, level: zstandard.ZstdCompressor(
+            level=level
+        ).compress(data),
+        lambda data: zstandard.ZstdDecompressor().decompress(data)
+    )
+
+
+def _lz4_codec():
+    import lz4.frame
+    return (
+        lambda data, itemsize, level: lz4.frame.compress(
+            data, compression_level=level
+        ),
+        lz4.frame.decompress
+    )
+
+
+# codecs in order of preference
+CODECS = {
+    'blosc': _blosc_codec,
+    'zstd': _zstd_codec,
+    'lz4': _lz4_codec,
+    'zlib': _zlib_codec,
+}
+DEFAULT_LEVELS = {'blosc': 5, 'zstd': 3, 'lz4': 0, 'zlib': 1}
+
+
+def get_codec(name=None):
+    """name, compress and decompress function of a codec;
+    if name is None the first installed codec is used.
+    """
+
+    names = list(CODECS) if name is None else [name]
+
+    for codec_name in names:
+        try:
+            compress, decompress = CODECS[codec_name]()
+        except ImportError:
+            if name is not None:
+                raise
+            continue
+        return codec_name, compress, decompress
+
+
+def write_chunked(
+    folder, array, chunk_bytes=2**24, codec=None, level=None,
+    max_workers=None
+):
+    """write array as compressed chunks into folder
+
+    Parameters
+    ----------
+    folder : str
+        Folder to create. If it already exists nothing is written.
+    array : array-like
+        Numeric, datetime or timedelta array (can be a memory-mapped
+        array). Object arrays are not supported.
+    chunk_bytes : int
+        Approximate uncompressed size of each chunk.
+    codec : str
+        One of 'blosc', 'zstd', 'lz4', 'zlib'. Defaults to the first
+        installed codec.
+    level : int
+        Compression level. Defaults to a fast level of the codec.
+    max_workers : int
+        Number of threads.
+    """
+
+    array = np.asanyarray(array)
+    shape = array.shape
+    if not array.ndim:
+        array = array.reshape(1)
+
+    codec, compress, _ = get_codec(codec)
+    if level is None:
+        level = DEFAULT_LEVELS[codec]
+
+    row_bytes = max(array[:1].nbytes, 1)
+    chunklen = max(chunk_bytes // row_bytes, 1)
+    n_chunks = -(-len(array) // chunklen)
+
+    meta = {
+        'shape': list(shape),
+        'dtype': array.dtype.str,
+        'chunklen': chunklen,
+        'n_chunks': n_chunks,
+        'codec': codec,
+    }
+
+    # write into temporary folder and rename when complete
+    tmp_folder = f'{folder}.{uuid.uuid4().hex}.tmp'
+    os.makedirs(tmp_folder)
+
+    def encode(idx):
+        chunk = np.ascontiguousarray(
+            array[idx * chunklen:(idx + 1) * chunklen]
+        )
+        # a byte view, as the buffer protocol does not support datetimes
+        data = compress(
+            chunk.reshape(-1).view(np.uint8), array.itemsize, level
+        )
+        with open(os.path.join(tmp_folder, f'{idx}'), 'wb') as f:
+            f.write(data)
+
+    try:
+        with ThreadPoolExecutor(max_workers) as executor:
+            list(executor.map(encode, range(n_chunks)))
+        with open(os.path.join(tmp_folder, META_FILE), 'w') as f:
+            json.dump(meta, f)
+        os.makedirs(os.path.dirname(folder), exist_ok=True)
+        try:
+            os.rename(tmp_folder, folder)
+        except OSError:
+            # written by someone else in the meantime
+            if not os.path.exists(os.path.join(folder, META_FILE)):
+                raise
+    finally:
+        if os.path.exists(tmp_folder):
+            shutil.rmtree(tmp_folder)
+
+
+class ChunkedArrayReader:
+    """lazy array of a folder written by `write_chunked`
+
+    Indexing decodes only the chunks needed along the first axis.
+    Converting to a numpy array (e.g. with np.asarray or `read`) decodes
+    all chunks.
+
+    Parameters
+    ----------
+    folder : str
+        Folder written by `write_chunked`.
+    max_workers : int
+        Number of threads used to decode chunks.
+    """
+
+    def __init__(self, folder, max_workers=None):
+        self.folder = folder
+        self.max_workers = max_workers
+
+        with open(os.path.join(folder, META_FILE), 'r') as f:
+            meta = json.load(f)
+
+        self.shape = tuple(meta['shape'])
+        self.dtype = np.dtype(meta['dtype'])
+        self.chunklen = meta['chunklen']
+        self.n_chunks = meta['n_chunks']
+        self.codec = meta['codec']
+        _, _, self._decompress = get_codec(self.codec)
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    @property
+    def size(self):
+        return int(np.prod(self.shape))
+
+    @property
+    def nbytes(self):
+        return self.size * self.dtype.itemsize
+
+    def __len__(self):
+        if not self.shape:
+            raise TypeError('len() of unsized object')
+        return self.shape[0]
+
+    def __repr__(self):
+        return (
+            f'{self.__class__.__name__}(shape={self.shape}, '
+            f'dtype={self.dtype}, codec={self.codec})'
+        )
+
+    def _row_shape(self):
+        return self.shape[1:] if self.shape else ()
+
+    def _decode(self, idx):
+        with open(os.path.join(self.folder, f'{idx}'), 'rb') as f:
+            data = self._decompress(f.read())
+        return np.frombuffer(data, dtype=self.dtype).reshape(
+            (-1,) + self._row_shape()
+        )
+
+    def _read_rows(self, start, stop):
+        """decode rows start to stop of the first axis
+        """
+
+        first = start // self.chunklen
+        last = -(-stop // self.chunklen)
+        out = np.empty((stop - start,) + self._row_shape(), dtype=self.dtype)
+
+        def decode(idx):
+            chunk = self._decode(idx)
+            chunk_start = idx * self.chunklen
+            lo = max(start, chunk_start)
+            hi = min(stop, chunk_start + len(chunk))
+            out[lo - start:hi - start] = (
+                chunk[lo - chunk_start:hi - chunk_start]
+            )
+
+        with ThreadPoolExecutor(self.max_workers) as executor:
+            list(executor.map(decode, range(first, last)))
+
+        return out
+
+    def read(self):
+        """decode whole array
+        """
+
+        if not self.shape:
+            return self._read_rows(0, 1).reshape(())
+        return self._read_rows(0, self.shape[0])
+
+    def __array__(self, dtype=None, copy=None):
+        array = self.read()
+        if dtype is not None:
+            array = array.astype(dtype, copy=False)
+        return array
+
+    def __getitem__(self, key):
+        if not isinstance(key, tuple):
+            key = (key,)
+
+        if not self.shape or not key or key[0] is Ellipsis or key[0] is None:
+            return self.read()[key]
+
+        first, rest = key[0], key[1:]
+        length = self.shape[0]
+
+        if isinstance(first, (int, np.integer)):
+            if not -length <= first < length:
+                raise IndexError(
+                    f'index {first} is out of bounds for axis 0 '
+                    f'with size {length}'
+                )
+            first = first % length
+            return self._read_rows(first, first + 1)[(0,) + rest]
+
+        if isinstance(first, slice) and first.step in (None, 1):
+            start, stop, _ = first.indices(length)
+            return self._read_rows(start, max(start, stop))[
+                (slice(None),) + rest
+            ]
+
+        # slices with steps, integer or boolean arrays
+        rows = np.arange(length)[first]
+        if not rows.size:
+            return np.empty((0,) + self._row_shape(), self.dtype)[
+                (slice(None),) + rest
+            ]
+        start = rows.min()
+        data = self._read_rows(start, rows.max() + 1)
+        return data[(rows - start,) + rest]
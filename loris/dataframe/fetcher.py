@@ -1,31 +1,481 @@
-"""Base Class to handle fetched joined tables
+"""Fetcher class to stream joined tables in batches
 """
 
-from abc import abstractmethod, ABC
-import datajoint as dj
+import re
 
-from loris import config
+import numpy as np
+from datajoint.declare import match_type
+from pymysql.converters import escape_item
+
+from loris.utils import save_join
+from loris.errors import LorisError
 from loris.dataframe.transformer import Transformer
 
 
-class Fetcher(ABC, Transformer):
+ROW_INDEX = '_row'
+
+
+class Fetcher:
+    """stream a (joined) datajoint relation in primary key ordered batches
+    and transform each batch with a Transformer.
+
+    Steps added with `mapfunc`, `applyfunc`, `drop` and `tolong` are
+    recorded and applied to each batch when iterating over the fetcher,
+    so that the whole relation never has to be in memory.
+
+    Parameters
+    ----------
+    *tables : datajoint.Table or datajoint expression
+        Tables to join. If more than one table is given, the tables are
+        joined with `loris.utils.save_join`.
+    batch_size : int
+        Number of entries fetched per batch. Defaults to 1000.
+    datacols : list-like
+        The columns in the dataframe that are considered "data".
+        See `Transformer`. Defaults to None.
+    indexcols : list-like
+        The columns in the dataframe that are immutable types.
+        If None and datacols is None, the primary key is used as index and
+        all other attributes as data columns. Defaults to None.
+    **shared_axes : dict
+        Specify if two or more "data columns" share axes.
+        See `Transformer`.
 
-    def __ini__(
-        self,
-        *projs,
-        **renamed_projs
+    Methods
+    -------
+    tolong
+    applyfunc
+    mapfunc
+    drop
+    batches
+    chunks
+    to_parquet
+    to_feather
+    to_csv
+    """
+
+    def __init__(
+        self, *tables,
+        batch_size=1000, datacols=None, indexcols=None,
+        **shared_axes
     ):
-        pass
+        assert tables, "at least one table must be given."
+
+        if len(tables) == 1:
+            self._relation = tables[0]
+        else:
+            self._relation = save_join(tables)
+
+        self.batch_size = batch_size
+        self._datacols = datacols
+        self._indexcols = indexcols
+        self._shared_axes = shared_axes
+        self._steps = []
+        self._tolong_kwargs = None
+
+    @property
+    def relation(self):
+        return self._relation
+
+    @property
+    def primary_key(self):
+        return self.relation.primary_key
+
+    def __len__(self):
+        return len(self.relation)
+
+    def mapfunc(self, func, col, new_col_name=None, **kwargs):
+        """add `Transformer.mapfunc` step applied to each batch
+        """
+        self._steps.append(('mapfunc', (func, col, new_col_name), kwargs))
+        return self
+
+    def applyfunc(self, func, new_col_name, *args, extra_kwargs={}, **kwargs):
+        """add `Transformer.applyfunc` step applied to each batch
+        """
+        self._steps.append((
+            'applyfunc', (func, new_col_name, *args),
+            {'extra_kwargs': extra_kwargs, **kwargs}
+        ))
+        return self
+
+    def drop(self, *columns):
+        """add `Transformer.drop` step applied to each batch
+        """
+        self._steps.append(('drop', columns, {}))
+        return self
+
+    def tolong(self, **kwargs):
+        """transform each batch into a long dataframe after all other steps.
+        Keyword arguments are passed to `Transformer.tolong`.
+        """
+        self._tolong_kwargs = kwargs
+        return self
+
+    def _restriction_after(self, key):
+        """restriction for entries with a primary key after key
+        """
+
+        columns = ', '.join(f'`{name}`' for name in self.primary_key)
+        # % is doubled as queries are formatted by the driver
+        values = ', '.join(
+            escape_item(
+                # numpy scalars are converted to python types
+                key[name].item()
+                if isinstance(key[name], np.generic) else key[name],
+                'utf8'
+            ).replace('%', '%%')
+            for name in self.primary_key
+        )
+        return f'({columns}) > ({values})'
+
+    def batches(self):
+        """fetch wide dataframes in primary key order (keyset pagination)
+
+        Yields
+        ------
+        batch : pandas.DataFrame
+        """
+
+        last_key = None
+
+        while True:
+            relation = self.relation
+            if last_key is not None:
+                relation = relation & self._restriction_after(last_key)
+
+            batch = relation.fetch(
+                format='frame', order_by=self.primary_key,
+                limit=self.batch_size
+            )
+
+            if not len(batch):
+                return
+
+            last_key = batch.index[-1]
+            if not isinstance(last_key, tuple):
+                last_key = (last_key,)
+            last_key = dict(zip(batch.index.names, last_key))
+            yield batch
+
+            if len(batch) < self.batch_size:
+                return
+
+    def transform(self, batch):
+        """apply recorded steps to a single wide dataframe
+        """
+
+        table = batch.reset_index()
+        # row number within batch keeps rows unique (dropped afterwards)
+        table.index.name = ROW_INDEX
+
+        if self._datacols is None and self._indexcols is None:
+            transformer = Transformer(
+                table, indexcols=self.primary_key, inplace=True,
+                **self._shared_axes
+            )
+        else:
+            transformer = Transformer(
+                table,
+                datacols=self._datacols,
+                indexcols=self._indexcols,
+                inplace=True,
+                **self._shared_axes
+            )
+
+        for method, args, kwargs in self._steps:
+            getattr(transformer, method)(*args, **kwargs)
+
+        if self._tolong_kwargs is None:
+            chunk = transformer.table.reset_index()
+        else:
+            chunk = transformer.tolong(**self._tolong_kwargs)
+
+        return chunk.drop(columns=ROW_INDEX)
+
+    def chunks(self):
+        """transformed dataframes of each batch
+
+        Yields
+        ------
+        chunk : pandas.DataFrame
+        """
+
+        for batch in self.batches():
+            yield self.transform(batch)
+
+    def __iter__(self):
+        return self.chunks()
+
+    def arrow_types(self):
+        """pyarrow types of the attributes of the relation that are not
+        changed by any step; used for columns that are empty in the first
+        chunk written to a parquet or feather file.
+        """
+
+        pa, _ = _import_pyarrow()
+
+        changed = set()
+        for method, args, kwargs in self._steps:
+            if method == 'mapfunc':
+                func, col, new_col_name = args
+                changed.add(col if new_col_name is None else new_col_name)
+            elif method == 'applyfunc':
+                changed.add(args[1])
+
+        types = {}
+        for name, attr in self.relation.heading.attributes.items():
+            if name in changed or attr.adapter:
+                continue
+            arrow_type = _arrow_type(pa, attr.type)
+            if arrow_type is not None:
+                types[name] = arrow_type
+        return types
+
+    def to_parquet(self, filepath, types=None, **kwargs):
+        """write all chunks to a single parquet file; each chunk is
+        written as a separate row group. See `write_parquet`.
+
+        Types of empty columns default to those of `arrow_types`.
+        """
+        types = {**self.arrow_types(), **(types or {})}
+        return write_parquet(self.chunks(), filepath, types=types, **kwargs)
+
+    def to_feather(self, filepath, types=None, **kwargs):
+        """write all chunks to a single feather (arrow ipc) file; each chunk
+        is written as separate record batches. See `write_feather`.
+
+        Types of empty columns default to those of `arrow_types`.
+        """
+        types = {**self.arrow_types(), **(types or {})}
+        return write_feather(self.chunks(), filepath, types=types, **kwargs)
+
+    def to_csv(self, filepath, **kwargs):
+        """append all chunks to a single csv file. See `write_csv`.
+        """
+        return write_csv(self.chunks(), filepath, **kwargs)
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.ipc as ipc
+    except ImportError:
+        raise LorisError(
+            'pyarrow must be installed to write parquet or feather files.'
+        )
+    return pa, ipc
+
+
+def _arrow_type(pa, sql_type):
+    """pyarrow type of the values datajoint fetches for an sql type
+    or None for blobs, uuids and other objects.
+    """
+
+    category = match_type(sql_type)
+    sql_type = sql_type.lower()
+
+    if category == 'INTEGER':
+        if sql_type.startswith('bigint') and 'unsigned' in sql_type:
+            return pa.uint64()
+        return pa.int64()
+    elif category == 'FLOAT':
+        return pa.float64()
+    elif category == 'DECIMAL':
+        # mysql defaults to decimal(10, 0)
+        size = re.search(r'\(\s*(\d+)\s*(?:,\s*(\d+)\s*)?\)', sql_type)
+        if size is None:
+            return pa.decimal128(10, 0)
+        return pa.decimal128(int(size.group(1)), int(size.group(2) or 0))
+    elif category in ('STRING', 'ENUM'):
+        return pa.string()
+    elif category == 'TEMPORAL':
+        if sql_type.startswith(('datetime', 'timestamp')):
+            return pa.timestamp('us')
+        elif sql_type.startswith('date'):
+            return pa.date32()
+        elif sql_type.startswith('time'):
+            return pa.duration('us')
+        elif sql_type.startswith('year'):
+            return pa.int64()
+
+
+def _arrow_tables(pa, chunks, types=None):
+    """pyarrow tables of dataframes with the schema of the first table
+
+    Columns without values in the first dataframe (type null) get their
+    type from `types` (pyarrow types or their aliases, e.g. 'string'),
+    so that later dataframes can fill them.
+    """
+
+    types = {
+        name: pa.type_for_alias(arrow_type)
+        if isinstance(arrow_type, str) else arrow_type
+        for name, arrow_type in (types or {}).items()
+    }
+    schema = None
+
+    for chunk in chunks:
+        if schema is None:
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            schema = pa.schema(
+                [
+                    field.with_type(types[field.name])
+                    if pa.types.is_null(field.type) and field.name in types
+                    else field
+                    for field in table.schema
+                ],
+                metadata=table.schema.metadata
+            )
+            if schema.equals(table.schema):
+                yield table
+                continue
+
+        try:
+            yield pa.Table.from_pandas(
+                chunk, schema=schema, preserve_index=False
+            )
+        except pa.ArrowException as e:
+            empty = [
+                field.name for field in schema
+                if pa.types.is_null(field.type)
+            ]
+            if not empty:
+                raise
+            raise LorisError(
+                f'Columns {empty} were empty in the first chunk; '
+                'pass their types with `types`.'
+            ) from e
+
+
+def write_parquet(chunks, filepath, types=None, **kwargs):
+    """write dataframes to a single parquet file; each dataframe is
+    written as a separate row group.
+
+    Parameters
+    ----------
+    chunks : iterable of pandas.DataFrame
+        Dataframes with the same columns.
+    filepath : str
+        Location of parquet file.
+    types : dict
+        pyarrow types (or their aliases) of columns that may be empty in
+        the first dataframe.
+    **kwargs : dict
+        Keyword arguments passed to pyarrow.parquet.ParquetWriter.
+
+    Returns
+    -------
+    n_rows : int
+        number of rows written.
+    """
+
+    pa, _ = _import_pyarrow()
+    import pyarrow.parquet as pq
+
+    writer = None
+    n_rows = 0
+
+    try:
+        for table in _arrow_tables(pa, chunks, types):
+            if writer is None:
+                writer = pq.ParquetWriter(filepath, table.schema, **kwargs)
+            writer.write_table(table)
+            n_rows += table.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+
+    return n_rows
+
+
+def write_feather(chunks, filepath, types=None, **kwargs):
+    """write dataframes to a single feather (arrow ipc) file; each
+    dataframe is written as separate record batches.
+
+    Parameters
+    ----------
+    chunks : iterable of pandas.DataFrame
+        Dataframes with the same columns.
+    filepath : str
+        Location of feather file.
+    types : dict
+        pyarrow types (or their aliases) of columns that may be empty in
+        the first dataframe.
+    **kwargs : dict
+        Keyword arguments passed to pyarrow.ipc.IpcWriteOptions
+        (e.g. compression='zstd').
+
+    Returns
+    -------
+    n_rows : int
+        number of rows written.
+    """
+
+    pa, ipc = _import_pyarrow()
+
+    sink = None
+    writer = None
+    n_rows = 0
+
+    try:
+        for table in _arrow_tables(pa, chunks, types):
+            if writer is None:
+                sink = pa.OSFile(filepath, 'wb')
+                writer = ipc.new_file(
+                    sink, table.schema, options=ipc.IpcWriteOptions(**kwargs)
+                )
+            writer.write_table(table)
+            n_rows += table.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+        if sink is not None:
+            sink.close()
+
+    return n_rows
+
+
+def csv_lines(chunks, **kwargs):
+    """csv text of each dataframe; the header is only part of the first.
+
+    Parameters
+    ----------
+    chunks : iterable of pandas.DataFrame
+        Dataframes with the same columns.
+    **kwargs : dict
+        Keyword arguments passed to pandas.DataFrame.to_csv.
+
+    Yields
+    ------
+    text : str
+    """
+
+    header = True
+    for chunk in chunks:
+        yield chunk.to_csv(index=False, header=header, **kwargs)
+        header = False
+
+
+def write_csv(chunks, filepath, **kwargs):
+    """write dataframes to a single csv file; see `csv_lines`.
+
+    Returns
+    -------
+    n_rows : int
+        number of rows written.
+    """
 
-    def join(self):
-        pass
+    n_rows = 0
 
-    def fetch(self):
-        pass
+    def count(chunks):
+        nonlocal n_rows
+        for chunk in chunks:
+            n_rows += len(chunk)
+            yield chunk
 
-    @abstractmethod
-    def tables_dict(self):
-        pass
+    with open(filepath, 'w', newline='') as f:
+        for text in csv_lines(count(chunks), **kwargs):
+            f.write(text)
 
-    def plot_grid(self):
-        pass
+    return n_rows
@@ -0,0 +1,225 @@
+"""run functions on partitions of a dataframe in a pool of processes
+"""
+
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# use cloudpickle if installed (e.g. to send lambda functions)
+try:
+    import cloudpickle as _pickle
+except ImportError:
+    _pickle = pickle
+
+# shared memory requires python>=3.8; otherwise all columns are pickled
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    shared_memory = None
+
+
+# columns of a partition with more bytes in arrays go to shared memory
+SHARED_MEMORY_THRESHOLD = 2**20
+# byte alignment of arrays in shared memory
+ALIGNMENT = 64
+# partitions per worker for load balancing
+PARTITIONS_PER_WORKER = 4
+
+
+def partition(index, n_partitions, levels=None):
+    """split rows into contiguous partitions
+
+    Parameters
+    ----------
+    index : pandas.Index
+        Index of the table to partition.
+    n_partitions : int
+        Number of partitions.
+    levels : str or list-like
+        Index levels to partition by; rows with the same values in these
+        levels end up in the same partition. If None, rows are split evenly.
+
+    Returns
+    -------
+    positions : list of numpy.ndarray
+        row positions of each partition.
+    """
+
+    if not len(index):
+        return []
+
+    if levels is None:
+        positions = np.array_split(np.arange(len(index)), n_partitions)
+    else:
+        if isinstance(levels, str):
+            levels = [levels]
+        groups = pd.Series(np.arange(len(index)), index=index).groupby(
+            level=list(levels), sort=False
+        ).ngroup().values
+        positions = [
+            np.flatnonzero(np.isin(groups, group_ids))
+            for group_ids in np.array_split(
+                np.arange(groups.max() + 1), n_partitions
+            )
+        ]
+
+    return [position for position in positions if len(position)]
+
+
+def _shareable(series):
+    # only columns with large numeric arrays in each cell are shared
+    if series.dtype != object:
+        return False
+    nbytes = 0
+    for value in series.values:
+        if not (
+            isinstance(value, np.ndarray) and value.dtype.kind in 'biufcmM'
+        ):
+            return False
+        nbytes += value.nbytes
+    return nbytes >= SHARED_MEMORY_THRESHOLD
+
+
+def _share(series):
+    """copy array cells of series into a single shared memory block
+    """
+
+    layout = []
+    offset = 0
+    for value in series.values:
+        layout.append((offset, value.shape, value.dtype.str))
+        offset += -(-value.nbytes // ALIGNMENT) * ALIGNMENT
+
+    shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+    for value, (offset, shape, dtype) in zip(series.values, layout):
+        np.ndarray(shape, dtype, buffer=shm.buf, offset=offset)[...] = value
+
+    return shm, (shm.name, layout)
+
+
+def _attach(descriptor):
+    """views of arrays in shared memory
+    """
+
+    name, layout = descriptor
+    shm = shared_memory.SharedMemory(name=name)
+    values = np.empty(len(layout), dtype=object)
+    values[:] = [
+        np.ndarray(shape, dtype, buffer=shm.buf, offset=offset)
+        for offset, shape, dtype in layout
+    ]
+    return shm, values
+
+
+def _run_partition(payload):
+    """rebuild partition frame in worker and call task on it
+    """
+
+    task, frame, shared, columns = payload
+    task = _pickle.loads(task)
+    shms = []
+
+    try:
+        for col, descriptor in shared.items():
+            shm, values = _attach(descriptor)
+            shms.append(shm)
+            frame[col] = values
+        frame = frame[columns]
+
+        result = task(frame)
+
+        # results must not point to shared memory, which is closed below
+        if result.dtype == object:
+            result = result.map(
+                lambda x: x.copy() if isinstance(x, np.ndarray) else x
+            )
+        else:
+            result = result.copy()
+    finally:
+        del frame
+        for shm in shms:
+            try:
+                shm.close()
+            except BufferError:
+                # references to the arrays are still held by the task
+                pass
+
+    return result
+
+
+def run_partitioned(
+    task, frame, n_jobs=None, executor=None, levels=None
+):
+    """run task on partitions of frame in a process pool
+
+    Parameters
+    ----------
+    task : callable
+        Takes a partition of frame and returns a pandas.Series with the
+        same index as the partition.
+    frame : pandas.DataFrame
+        Table to partition. Large array columns are passed to the workers
+        through shared memory instead of being pickled (python>=3.8).
+    n_jobs : int
+        Number of processes if no executor is given. -1 means all cpus.
+    executor : concurrent.futures.Executor
+        Executor to use instead of creating a process pool.
+    levels : str or list-like
+        Index levels to partition by. See `partition`.
+
+    Returns
+    -------
+    result : pandas.Series
+        Results of task in the order of frame.
+    """
+
+    if n_jobs is None or n_jobs < 0:
+        n_jobs = os.cpu_count()
+
+    index = frame.index
+    positions = partition(
+        index, n_jobs * PARTITIONS_PER_WORKER, levels
+    )
+    # rows are identified by position to reassemble results in order
+    frame = frame.reset_index(drop=True)
+    use_shared_memory = shared_memory is not None and (
+        executor is None or isinstance(executor, ProcessPoolExecutor)
+    )
+    task = _pickle.dumps(task)
+
+    shms = []
+    payloads = []
+    try:
+        for position in positions:
+            part = frame.iloc[position]
+            shared = {}
+            if use_shared_memory:
+                for col in part.columns:
+                    if _shareable(part[col]):
+                        shm, descriptor = _share(part[col])
+                        shms.append(shm)
+                        shared[col] = descriptor
+            payloads.append((
+                task, part.drop(columns=list(shared)),
+                shared, list(part.columns)
+            ))
+
+        if executor is None:
+            with ProcessPoolExecutor(n_jobs) as executor:
+                results = list(executor.map(_run_partition, payloads))
+        else:
+            results = list(executor.map(_run_partition, payloads))
+    finally:
+        for shm in shms:
+            shm.close()
+            shm.unlink()
+
+    if not results:
+        return pd.Series([], index=index, dtype=object)
+
+    result = pd.concat(results).sort_index()
+    result.index = index
+    return result
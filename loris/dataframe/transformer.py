@@ -2,10 +2,13 @@
 """
 
 import re
+from functools import partial
 
 import pandas as pd
 import numpy as np
 
+from loris.dataframe.parallel import run_partitioned
+
 RESERVED_COLUMNS = {'func_result', 'max_depth', 'dropna', 'transformer'}
 
 
@@ -239,8 +242,11 @@ class Transformer:
                 return key
         return f"{label}_{n}"
 
-    @staticmethod
-    def _superstack_series(series, label, transformer, dropna, col_name):
+    @classmethod
+    def _superstack_series(cls, series, label, transformer, dropna, col_name):
+        # numpy arrays can be expanded without creating a series per cell
+        if transformer is iter and cls._is_array_series(series):
+            return cls._superstack_arrays(series, label, dropna, col_name)
         # apply series transformer (iter is default for sequences)
         # series.index is already assumed to be multi index
         # transform into dataframe
@@ -256,6 +262,68 @@ class Transformer:
         series.name = label
         return series
 
+    @staticmethod
+    def _is_array_series(series):
+        # all cells are numpy arrays that can be iterated over
+        return len(series) > 0 and all(
+            isinstance(value, np.ndarray) and value.ndim
+            for value in series.values
+        )
+
+    @staticmethod
+    def _superstack_arrays(series, label, dropna, col_name):
+        # vectorized version of _superstack_series for arrays
+        # with equal or ragged lengths along the first axis
+        values = series.values
+        lengths = np.array([len(value) for value in values], dtype=np.intp)
+        max_length = lengths.max()
+        rows = np.repeat(np.arange(len(values)), lengths)
+        # position of each element within its cell
+        offsets = np.cumsum(lengths) - lengths
+        positions = np.arange(lengths.sum()) - np.repeat(offsets, lengths)
+
+        if all(value.ndim == 1 for value in values):
+            data = np.concatenate(values)
+        else:
+            # cells are subarrays (views) along the first axis
+            data = np.empty(len(rows), dtype=object)
+            data[:] = [subarray for value in values for subarray in value]
+
+        if not dropna and (lengths != max_length).any():
+            # pad ragged cells with NaN (NaT for datetimes and timedeltas)
+            # like stacking with dropna=False
+            kind = data.dtype.kind
+            if kind in 'fc':
+                dtype, fill = data.dtype, np.nan
+            elif kind in 'iub':
+                dtype, fill = float, np.nan
+            elif kind == 'M':
+                dtype, fill = data.dtype, np.datetime64('NaT')
+            elif kind == 'm':
+                dtype, fill = data.dtype, np.timedelta64('NaT')
+            else:
+                dtype, fill = object, np.nan
+            padded = np.full(len(values) * max_length, fill, dtype=dtype)
+            padded[rows * max_length + positions] = data
+            data = padded
+            rows = np.repeat(np.arange(len(values)), max_length)
+            positions = np.tile(np.arange(max_length), len(values))
+
+        index = series.index
+        index = pd.MultiIndex(
+            levels=list(index.levels) + [np.arange(max_length)],
+            codes=[codes[rows] for codes in index.codes] + [positions],
+            names=list(index.names) + [col_name],
+            verify_integrity=False
+        )
+
+        series = pd.Series(data, index=index, name=label)
+
+        if dropna:
+            series = series[~pd.isnull(data)]
+
+        return series
+
     def __getitem__(self, key):
         # if it is a dataframe return new instance of transformer
         selected_table = self.table[key]
@@ -271,24 +339,110 @@ class Transformer:
         """
         return self[list(cols)].tolong(**kwargs)
 
-    def expand_col(self, col, reset_index=True):
+    def expand_col(self, col, reset_index=True, categorical=False):
         """
         Expand a column that contains long dataframes and return
         a single long dataframe.
+
+        Parameters
+        ----------
+        col : str
+            Name of column containing dataframes.
+        reset_index : bool
+            Whether to reset the index of the long dataframe. If False,
+            the long dataframe has a multiindex consisting of the index
+            of the table and the index of the nested dataframes.
+            Defaults to True.
+        categorical : bool
+            If reset_index is True, store the index columns of the table
+            as pandas.Categorical columns instead of repeating each value.
+            Defaults to False.
         """
 
         series = self[col]
-        long_df = pd.concat(
-            list(series), keys=series.index, names=series.index.names,
-            sort=False
-        )
-
-        if reset_index:
-            return long_df.reset_index()
-        else:
+        frames = list(series)
+
+        columns = frames[0].columns if frames else None
+        if not frames or not all(
+            frame.columns.equals(columns) for frame in frames
+        ):
+            # columns differ between dataframes
+            long_df = pd.concat(
+                frames, keys=series.index, names=series.index.names,
+                sort=False
+            )
+            if reset_index:
+                return long_df.reset_index()
             return long_df
 
-    def mapfunc(self, func, col, new_col_name=None, **kwargs):
+        lengths = np.array([len(frame) for frame in frames], dtype=np.intp)
+        outer = series.index
+        if not isinstance(outer, pd.MultiIndex):
+            outer = pd.MultiIndex.from_arrays([outer])
+        outer_codes = [np.repeat(codes, lengths) for codes in outer.codes]
+
+        inner = frames[0].index.append([frame.index for frame in frames[1:]])
+        if not isinstance(inner, pd.MultiIndex):
+            inner = pd.MultiIndex.from_arrays([inner])
+
+        # each data column is allocated once
+        data = {
+            column: self._concat_values(
+                [frame[column] for frame in frames], lengths.sum()
+            )
+            for column in columns
+        }
+
+        if not reset_index:
+            index = pd.MultiIndex(
+                levels=list(outer.levels) + list(inner.levels),
+                codes=outer_codes + list(inner.codes),
+                names=list(outer.names) + list(inner.names),
+                verify_integrity=False
+            )
+            return pd.DataFrame(data, index=index, copy=False)
+
+        index_data = {}
+        for level, codes, name in zip(outer.levels, outer_codes, outer.names):
+            if categorical:
+                index_data[name] = pd.Categorical.from_codes(codes, level)
+            else:
+                index_data[name] = level.take(codes)
+        for n, name in enumerate(inner.names):
+            if name is None:
+                # same naming as reset_index
+                name = f'level_{len(outer.names) + n}'
+            index_data[name] = inner.get_level_values(n)
+
+        return pd.DataFrame({**index_data, **data}, copy=False)
+
+    @staticmethod
+    def _concat_values(serieses, length):
+        # concatenate values of series into a single preallocated array
+        dtypes = {series.dtype for series in serieses}
+        if len(dtypes) == 1:
+            dtype = dtypes.pop()
+            if not isinstance(dtype, np.dtype):
+                # extension dtypes (e.g. categorical)
+                return pd.concat(serieses, ignore_index=True).values
+        else:
+            dtype = np.result_type(*(
+                (series.dtype if isinstance(series.dtype, np.dtype)
+                 else object)
+                for series in serieses
+            ))
+
+        values = np.empty(length, dtype=dtype)
+        start = 0
+        for series in serieses:
+            values[start:start + len(series)] = series.to_numpy()
+            start += len(series)
+        return values
+
+    def mapfunc(
+        self, func, col, new_col_name=None,
+        n_jobs=None, executor=None, partition_by=None, **kwargs
+    ):
         """apply a function to a single column
 
         Parameters
@@ -301,18 +455,38 @@ class Transformer:
             Name of computed new column. If None, this will be set
             to the name of the column; i.e. the name of the column will be
             overwritter. Defaults to None.
+        n_jobs : int
+            Number of processes to apply the function in parallel.
+            -1 means all cpus. If None and no executor is given, the
+            function is applied in the current process. Defaults to None.
+        executor : concurrent.futures.Executor
+            Executor used to apply the function to partitions of the
+            table in parallel. Defaults to None.
+        partition_by : str or list-like
+            Index levels used to partition the table for parallel
+            execution. Defaults to None.
         **kwargs : dict
             Keyword Arguments passed to the apply method of a pandas.Series,
             and thus to the function.
         """
         if new_col_name is None:
             new_col_name = col
-        self.table[new_col_name] = self._select_frame(
-            self.table, col
-        ).apply(func, **kwargs)
+        series = self._select_frame(self.table, col)
+        if self._parallel(n_jobs, executor):
+            result = run_partitioned(
+                partial(_map_task, func, kwargs),
+                series.to_frame(col),
+                n_jobs, executor, partition_by
+            )
+        else:
+            result = series.apply(func, **kwargs)
+        self.table[new_col_name] = result
         return self
 
-    def applyfunc(self, func, new_col_name, *args, extra_kwargs={}, **kwargs):
+    def applyfunc(
+        self, func, new_col_name, *args, extra_kwargs={}, vectorized=False,
+        n_jobs=None, executor=None, partition_by=None, **kwargs
+    ):
         """apply a function across columns by mapping args and kwargs
         of func.
 
@@ -327,27 +501,67 @@ class Transformer:
             in the dataframe. This value is passed instead of the string.
         extra_kwargs : dict
             Keyword arguments passed to function
+        vectorized : bool
+            If True, the function is called once with whole columns as
+            numpy arrays instead of once per row. Columns where each cell
+            is an array of the same shape are stacked into a single array.
+            The function must return one value per row. Defaults to False.
+        n_jobs : int
+            Number of processes to apply the function in parallel.
+            -1 means all cpus. If None and no executor is given, the
+            function is applied in the current process. Defaults to None.
+        executor : concurrent.futures.Executor
+            Executor used to apply the function to partitions of the
+            table in parallel. Defaults to None.
+        partition_by : str or list-like
+            Index levels used to partition the table for parallel
+            execution. Defaults to None.
         **kwargs : dict
             Same as *args just as keyword arguments.
         """
         if new_col_name is None:
             new_col_name = 'func_result'
-        self.table[new_col_name] = self.table.reset_index().apply(
-            lambda x: func(
-                *(x[arg] for arg in args),
-                **{key: x[arg] for key, arg in kwargs.items()},
-                **extra_kwargs
-            ),
-            axis=1, result_type='reduce'
+        frame = self._columns_frame(
+            self.table, list(args) + list(kwargs.values())
+        )
+        task = partial(
+            _apply_task, func, args, kwargs, extra_kwargs,
+            vectorized=vectorized
         )
+        if self._parallel(n_jobs, executor):
+            result = run_partitioned(
+                task, frame, n_jobs, executor, partition_by
+            )
+        else:
+            result = task(frame)
+        self.table[new_col_name] = result
         return self
 
+    @staticmethod
+    def _parallel(n_jobs, executor):
+        return executor is not None or (n_jobs is not None and n_jobs != 1)
+
     @staticmethod
     def _select_frame(table, col):
         if col in table.columns:
             return table[col]
         else:
-            table.index.to_frame(False)[col]
+            return pd.Series(
+                table.index.get_level_values(col),
+                index=table.index, name=col
+            )
+
+    @staticmethod
+    def _columns_frame(table, cols):
+        # columns and index levels needed by a function (without
+        # resetting the whole index)
+        return pd.DataFrame(
+            {
+                col: Transformer._select_frame(table, col)
+                for col in dict.fromkeys(cols)
+            },
+            index=table.index
+        )
 
     def drop(self, *columns):
         """drop columns
@@ -357,3 +571,57 @@ class Transformer:
             inplace=True
         )
         return self
+
+
+def _map_task(func, kwargs, frame):
+    # apply function to the single column of frame
+    return frame.iloc[:, 0].apply(func, **kwargs)
+
+
+def _apply_task(func, args, kwargs, extra_kwargs, frame, vectorized=False):
+    # apply function to each row of frame or to whole columns
+    if vectorized:
+        columns = {col: _column_values(frame[col]) for col in frame.columns}
+        result = func(
+            *(columns[arg] for arg in args),
+            **{key: columns[arg] for key, arg in kwargs.items()},
+            **extra_kwargs
+        )
+        if np.ndim(result) == 0:
+            return pd.Series(result, index=frame.index)
+        if isinstance(result, (pd.Series, pd.Index)):
+            result = result.values
+        elif isinstance(result, np.ndarray) and result.ndim > 1:
+            # one subarray per row
+            result = list(result)
+        return pd.Series(result, index=frame.index)
+
+    # positions of arguments in row tuples
+    positions = {col: idx for idx, col in enumerate(frame.columns)}
+    arg_positions = [positions[arg] for arg in args]
+    kwarg_positions = {key: positions[arg] for key, arg in kwargs.items()}
+
+    return pd.Series(
+        [
+            func(
+                *(row[idx] for idx in arg_positions),
+                **{key: row[idx] for key, idx in kwarg_positions.items()},
+                **extra_kwargs
+            )
+            for row in frame.itertuples(index=False, name=None)
+        ],
+        index=frame.index, dtype=None if len(frame) else object
+    )
+
+
+def _column_values(series):
+    # numpy array of column; same-shape array cells are stacked
+    values = series.to_numpy()
+    if (
+        values.dtype == object
+        and len(values)
+        and all(isinstance(value, np.ndarray) for value in values)
+        and len({value.shape for value in values}) == 1
+    ):
+        return np.stack(values)
+    return values
@@ -0,0 +1,206 @@
+"""pool of database connections for multithreaded servers
+"""
+
+import queue
+import threading
+import time
+import weakref
+
+import datajoint as dj
+from datajoint.dependencies import Dependencies
+
+from loris.errors import LorisError
+
+
+class ConnectionPool:
+    """bounded pool of datajoint connections with per-thread checkout
+
+    Each thread checks out its own connection the first time it accesses
+    the database and keeps it until `checkin` is called (e.g. at the end
+    of a request) or the thread ends, so that background threads do not
+    hold on to connections. All connections share the schema registry of
+    the primary connection and a single dependency graph (see
+    `PooledDependencies`).
+
+    Parameters
+    ----------
+    primary : datajoint.Connection
+        connection whose schemas are shared.
+    size : int
+        maximum number of connections checked out at the same time.
+    timeout : float
+        seconds to wait for a free connection before raising an error.
+    ping_interval : float
+        idle connections older than this are checked before reuse.
+    """
+
+    def __init__(self, primary, size, timeout=30, ping_interval=30):
+        self._primary = primary
+        self._size = size
+        self._timeout = timeout
+        self._ping_interval = ping_interval
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle = queue.LifoQueue()
+        self._local = threading.local()
+        self.connection = PooledConnection(self)
+        self._dependencies = PooledDependencies(self.connection)
+
+    @property
+    def size(self):
+        return self._size
+
+    @property
+    def primary(self):
+        return self._primary
+
+    def _new(self):
+        """create a new connection sharing schemas and dependencies
+        """
+
+        conn = dj.Connection(
+            dj.config['database.host'],
+            dj.config['database.user'],
+            dj.config['database.password'],
+            port=dj.config['database.port'],
+        )
+        conn.schemas = self.primary.schemas
+        conn.dependencies = self._dependencies
+        return conn
+
+    def _healthy(self, conn, last_used):
+        """check if idle connection can be reused
+        """
+
+        if time.time() - last_used < self._ping_interval:
+            return True
+
+        try:
+            return conn.is_connected
+        except Exception:
+            return False
+
+    def checkout(self):
+        """connection of the current thread
+        """
+
+        checkout = getattr(self._local, 'checkout', None)
+        if checkout is not None:
+            return checkout.conn
+
+        if not self._slots.acquire(timeout=self._timeout):
+            raise LorisError(
+                f'All {self.size} database connections are in use; '
+                'try again later.'
+            )
+
+        try:
+            while True:
+                try:
+                    conn, last_used = self._idle.get_nowait()
+                except queue.Empty:
+                    conn = self._new()
+                    break
+                if self._healthy(conn, last_used):
+                    break
+                self._close(conn)
+        except Exception:
+            self._slots.release()
+            raise
+
+        self._local.checkout = _Checkout(self, conn)
+        return conn
+
+    def checkin(self):
+        """return the connection of the current thread to the pool
+        """
+
+        checkout = self._local.__dict__.pop('checkout', None)
+
+        if checkout is not None:
+            checkout.release()
+
+    def _checkin(self, conn):
+        try:
+            if conn.in_transaction:
+                conn.cancel_transaction()
+        except Exception:
+            self._close(conn)
+        else:
+            self._idle.put((conn, time.time()))
+        self._slots.release()
+
+    def reset(self):
+        """close connection of current thread and idle connections
+        """
+
+        checkout = self._local.__dict__.pop('checkout', None)
+
+        if checkout is not None:
+            checkout.detach()
+            self._close(checkout.conn)
+            self._slots.release()
+
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._close(conn)
+
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+class _Checkout:
+    """connection checked out by a thread; stored in the thread-local
+    data of the pool, so that the connection is checked in when the
+    thread ends and its thread-local data is discarded.
+    """
+
+    def __init__(self, pool, conn):
+        self.conn = conn
+        self._finalizer = weakref.finalize(self, pool._checkin, conn)
+        # do not touch the database while the interpreter shuts down
+        self._finalizer.atexit = False
+
+    def release(self):
+        self._finalizer()
+
+    def detach(self):
+        self._finalizer.detach()
+
+
+class PooledDependencies(Dependencies):
+    """dependency graph shared by pooled connections
+
+    The graph is loaded through the connection of the calling thread
+    (instead of the primary connection, whose socket must not be used by
+    several threads at once) and by one thread at a time.
+    """
+
+    def __init__(self, connection=None):
+        super().__init__(connection)
+        self._load_lock = threading.Lock()
+
+    def load(self, *args, **kwargs):
+        with self._load_lock:
+            return super().load(*args, **kwargs)
+
+
+class PooledConnection:
+    """stand-in for a datajoint connection that forwards everything
+    to the connection checked out by the current thread.
+    """
+
+    def __init__(self, pool):
+        self._pool = pool
+
+    def __getattr__(self, name):
+        return getattr(self._pool.checkout(), name)
+
+    def __repr__(self):
+        return f'PooledConnection(size={self._pool.size})'
@@ -6,6 +6,7 @@ import os
 import sys
 import shutil
 import inspect
+import hashlib
 import multiprocessing as mp
 from collections import defaultdict
 import datajoint as dj
@@ -15,17 +16,23 @@ from sshtunnel import SSHTunnelForwarder, HandlerSSHTunnelForwarderError
 from werkzeug.utils import secure_filename
 
 from loris.database.attributes import custom_attributes_dict
+from loris.database.cache import BlobCache, install_blob_cache
 from loris.utils import is_manuallookup
 from loris.errors import LorisError
+from loris.pool import ConnectionPool
 
 
 # defaults for application
 defaults = dict(
     textarea_startlength=512,
     # UPLOAD EXTENSIONS
-    extensions=['csv', 'npy', 'json', 'pkl'],
+    # files read into blobs (see loris.app.readers)
+    extensions=[
+        'csv', 'npy', 'json', 'pkl', 'parquet', 'h5', 'hdf5', 'hdf',
+        'tif', 'tiff'
+    ],
     attach_extensions=(
-        ['csv', 'npy', 'json', 'pkl'] + [
+        ['csv', 'npy', 'json', 'pkl', 'parquet', 'h5'] + [
             'tiff', 'png', 'jpeg', 'mpg', 'hdf', 'hdf5', 'tar', 'zip',
             'txt', 'gif', 'svg', 'tif', 'bmp', 'doc', 'docx', 'rtf',
             'odf', 'ods', 'gnumeric', 'abw', 'xls', 'xlsx', 'ini',
@@ -35,6 +42,10 @@ defaults = dict(
     ),
     # foreign key select field limit
     fk_dropdown_limit=200,
+    # seconds before cached foreign key choices are checked for changes
+    foreign_cache_timeout=5,
+    # tables with more rows are loaded page by page (None to disable)
+    serverside_row_limit=5000,
     user_schema="experimenters",
     user_table="Experimenter",
     user_name="experimenter",
@@ -44,6 +55,28 @@ defaults = dict(
     assignedgroup_schema="experimenters",
     assignedgroup_table="AssignedExperimentalProject",
     max_cpu=None,
+    # number of pooled database connections for the app (None to disable)
+    connection_pool_size=None,
+    connection_pool_timeout=30,
+    # job scheduler for autopopulate and autoscripts
+    scheduler_db=None,
+    scheduler_workers=None,
+    scheduler_user_quota=None,
+    # cache of external blobs (bytes per process; 0 disables a tier);
+    # without copies, cached arrays are returned read-only
+    blob_cache_memory=256 * 2**20,
+    blob_cache_disk=0,
+    blob_cache_folder=None,
+    blob_cache_copy=True,
+    # resumable uploads (bytes per chunk; seconds until unused uploads
+    # are deleted)
+    upload_chunk_size=8 * 2**20,
+    upload_expiry=24 * 60 * 60,
+    # entries fetched at a time when downloading tables
+    export_batch_size=1000,
+    # joins estimated to return more rows need to be confirmed
+    # (None to disable)
+    join_row_budget=10**6,
     init_database=False,
     include_fish=True
 )
@@ -77,7 +110,11 @@ class Config(dict):
         config = cls(config)
         config['custom_attributes'] = custom_attributes_dict
         config['_empty'] = []  # list of files in tmp to delete on refresh
-        config['_autopopulate'] = {}  # dictionary of subprocesses
+        config['_checksums'] = {}  # checksums of table definitions per schema
+        config['_grants'] = None  # user privileges granted at last refresh
+        config['_foreign_data'] = {}  # cached foreign key choices
+        config['_ownership'] = {}  # ownership paths of tables
+        config['_groups_of_user'] = {}  # cached groups of logged in users
         config.perform_checks()
         config.datajoint_configuration()
 
@@ -169,12 +206,67 @@ class Config(dict):
 
     def conn(self, *args, **kwargs):
         """connect to database with hostname, username, and password.
+
+        If a connection pool was started, the pooled connection is
+        returned and resetting only affects the current thread.
         """
         self.datajoint_configuration()
         self.connect_ssh()
-        self['connection'] = dj.conn(*args, **kwargs)
+        if self.get('_pool', None) is not None:
+            if kwargs.get('reset', False):
+                self['_pool'].reset()
+            self['connection'] = self['_pool'].connection
+        else:
+            self['connection'] = dj.conn(*args, **kwargs)
         return self['connection']
 
+    def start_pool(self, size=None):
+        """start a pool of connections, so that each thread
+        (e.g. of a multithreaded server) uses its own connection.
+        All schemas are rebuilt using the pooled connection.
+        """
+
+        if size is None:
+            size = self['connection_pool_size']
+
+        self.datajoint_configuration()
+        self.connect_ssh()
+        self['_pool'] = ConnectionPool(
+            dj.conn(), size, timeout=self['connection_pool_timeout']
+        )
+        self['connection'] = self['_pool'].connection
+
+        for key in ('schemata', 'tables', 'settings_tables',
+                    'automaker_tables', 'dynamicforms'):
+            self.pop(key, None)
+        self['_checksums'] = {}
+
+        return self['_pool']
+
+    def checkin(self):
+        """return the connection of the current thread to the pool
+        """
+
+        if self.get('_pool', None) is not None:
+            self['_pool'].checkin()
+
+    def check_password(self, user, password):
+        """check password of user with a separate connection, without
+        resetting the connection of the app.
+        """
+
+        self.connect_ssh()
+        try:
+            conn = dj.Connection(
+                self['database.host'], user, password,
+                port=self['database.port']
+            )
+        except Exception:
+            return False
+
+        conn.close()
+        return True
+
     def datajoint_configuration(self):
         # --- managing external file stores for database --- #
         if 'stores' not in dj.config:
@@ -199,6 +291,16 @@ class Config(dict):
             else:
                 self[key] = ele
 
+        # --- caching of external blobs --- #
+        # installed once; this method runs again for every (pooled)
+        # connection
+        if self.get('_blob_cache', None) is None and (
+            self['blob_cache_memory'] or self['blob_cache_disk']
+        ):
+            self['_blob_cache'] = install_blob_cache(
+                BlobCache.from_config(self)
+            )
+
     def perform_checks(self):
         """perform various checks (create directories if they don't exist)
         """
@@ -219,11 +321,29 @@ class Config(dict):
         if self['max_cpu'] is None:
             self['max_cpu'] = mp.cpu_count()
 
-    def refresh_schema(self):
+    def refresh_schema(self, schemas=None):
         """refresh container of schemas
+
+        Parameters
+        ----------
+        schemas : iterable
+            Only rebuild the virtual modules of these schemas and drop
+            schemas that do not exist anymore. If None, all schemas are
+            rebuilt. Defaults to None.
         """
-        schemata = {}
-        for schema in dj.list_schemas():
+        if schemas is None or 'schemata' not in self:
+            schemata = {}
+            schemas = dj.list_schemas(connection=self['connection'])
+        else:
+            existing = set(dj.list_schemas(connection=self['connection']))
+            schemata = {
+                schema: module
+                for schema, module in self['schemata'].items()
+                if schema in existing
+            }
+            schemas = set(schemas) & existing
+
+        for schema in schemas:
             if schema in self["skip_schemas"]:
                 continue
             # TODO error messages
@@ -237,6 +357,58 @@ class Config(dict):
 
         self['schemata'] = schemata
 
+    def schema_checksums(self):
+        """checksum of all table definitions for each schema
+
+        The checksums are computed from a single query on
+        `information_schema.columns` and are used to decide which
+        schemas need to be rebuilt when refreshing.
+        """
+
+        checksums = {
+            schema: hashlib.md5()
+            for schema in dj.list_schemas(connection=self['connection'])
+            if schema not in self['skip_schemas']
+        }
+
+        if not checksums:
+            return {}
+
+        rows = self['connection'].query(
+            "SELECT table_schema, table_name, column_name, column_type, "
+            "column_key, is_nullable, column_default, column_comment "
+            "FROM information_schema.columns "
+            "WHERE table_schema IN ({}) "
+            "ORDER BY table_schema, table_name, ordinal_position;".format(
+                ', '.join(['%s'] * len(checksums))
+            ),
+            args=tuple(checksums)
+        ).fetchall()
+
+        for row in rows:
+            checksums[row[0]].update(repr(row[1:]).encode())
+
+        return {
+            schema: checksum.hexdigest()
+            for schema, checksum in checksums.items()
+        }
+
+    def changed_schemas(self, checksums=None):
+        """set of schemas that were added, removed or whose table
+        definitions changed since the last refresh
+        """
+
+        if checksums is None:
+            checksums = self.schema_checksums()
+
+        previous = self['_checksums']
+
+        return {
+            schema
+            for schema in set(checksums) | set(previous)
+            if checksums.get(schema) != previous.get(schema)
+        }
+
     def get_table(self, full_table_name):
         """get table from schemata
         """
@@ -278,35 +450,64 @@ class Config(dict):
                     '; refresh database'
                 )
 
-    def refresh_tables(self):
+    def refresh_tables(self, schemas=None):
         """refresh container of tables
+
+        Parameters
+        ----------
+        schemas : iterable
+            Only update the tables of these schemas. If None, the container
+            is rebuilt from all schemas. Defaults to None.
         """
 
-        tables = {}
+        if schemas is None or 'tables' not in self:
+            tables = {}
+            schemas = self['schemata']
+        else:
+            schemas = set(schemas)
+            tables = {
+                table_name: table
+                for table_name, table in self['tables'].items()
+                if table_name.split('.')[0] not in schemas
+            }
 
-        for schema, module in self['schemata'].items():
+        for schema in schemas:
             # skip mysql schema etc
             if schema in self["skip_schemas"]:
                 continue
-            for key, ele in module.__dict__.items():
-                if key.split('.')[0] in self['schemata']:
-                    continue
-                if isinstance(ele, dj.user_tables.OrderedClass):
-                    if is_manuallookup(ele) or issubclass(ele, dj.Settingstable):
-                        continue
-                    tables[f'{schema}.{key}'] = ele
-
-                    # get part tables
-                    for part_name, part_table in ele.__dict__.items():
-                        if isinstance(part_table, dj.user_tables.OrderedClass):
-                            if issubclass(part_table, dj.Part):
-                                tables[f'{schema}.{key}.{part_name}'] = \
-                                    part_table
+            # schema may have been dropped
+            module = self['schemata'].get(schema, None)
+            if module is None:
+                continue
+            tables.update(self._tables_of_module(schema, module))
 
         self['tables'] = tables
 
         return tables
 
+    def _tables_of_module(self, schema, module):
+        """get all tables and part tables of a single schema module
+        """
+
+        tables = {}
+
+        for key, ele in module.__dict__.items():
+            if key.split('.')[0] in self['schemata']:
+                continue
+            if isinstance(ele, dj.user_tables.OrderedClass):
+                if is_manuallookup(ele) or issubclass(ele, dj.Settingstable):
+                    continue
+                tables[f'{schema}.{key}'] = ele
+
+                # get part tables
+                for part_name, part_table in ele.__dict__.items():
+                    if isinstance(part_table, dj.user_tables.OrderedClass):
+                        if issubclass(part_table, dj.Part):
+                            tables[f'{schema}.{key}.{part_name}'] = \
+                                part_table
+
+        return tables
+
     @property
     def user_table(self):
         """return the user table
@@ -416,10 +617,16 @@ class Config(dict):
             self['schemata'][self['assignedgroup_schema']],
             self['assignedgroup_table'])
 
-    def groups_of_user(self, user):
+    def groups_of_user(self, user, cached=True):
         """groups user belongs to (includes user name)
+
+        The groups are cached until `forget_groups` is called
+        (e.g. at login or when groups are assigned).
         """
 
+        if cached and user in self['_groups_of_user']:
+            return list(self['_groups_of_user'][user])
+
         groups = [user]
 
         table = self.assigned_table & {
@@ -429,8 +636,35 @@ class Config(dict):
             list(table.proj(self['group_name']).fetch()[self['group_name']])
         )
 
+        self['_groups_of_user'][user] = groups
+
+        return list(groups)
+
+    def refresh_groups(self):
+        """fetch the groups of all users at once and cache them
+        """
+
+        groups = {user: [user] for user in self.users}
+
+        for entry in self.assigned_table.proj(self['group_name']).fetch(
+            as_dict=True
+        ):
+            user = entry[self['user_name']]
+            groups.setdefault(user, [user]).append(entry[self['group_name']])
+
+        self['_groups_of_user'] = groups
+
         return groups
 
+    def forget_groups(self, user=None):
+        """empty cache of groups of a user or of all users
+        """
+
+        if user is None:
+            self['_groups_of_user'].clear()
+        else:
+            self['_groups_of_user'].pop(user, None)
+
     def schemas_of_user(self, user):
         """schemas user belongs to (should be the same as groups_of_user except
         when administrator), if each group has an associated schema.
@@ -461,19 +695,36 @@ class Config(dict):
                 "singular entries for given user and group."
             )
 
-    def refresh_permissions(self):
+    def refresh_permissions(self, force=True):
         """refresh permissions of users
+
+        Parameters
+        ----------
+        force : bool
+            If False, privileges are only granted if the schemas
+            of any user changed since the last refresh. Defaults to True.
         """
 
-        for user in self.users:
-            for schema in self.schemas_of_user(user):
-                conn = self['connection']
-                conn.query("FLUSH PRIVILEGES;")
+        self.refresh_groups()
+        grants = {
+            user: tuple(sorted(self.schemas_of_user(user)))
+            for user in self.users
+        }
+
+        if not force and grants == self['_grants']:
+            return
+
+        conn = self['connection']
+        conn.query("FLUSH PRIVILEGES;")
+        for user, schemas in grants.items():
+            for schema in schemas:
                 conn.query(
                     f"GRANT ALL PRIVILEGES ON {schema}.* to %s@%s;",
                     (user, '%')
                 )
-                conn.query("FLUSH PRIVILEGES;")
+        conn.query("FLUSH PRIVILEGES;")
+
+        self['_grants'] = grants
 
     def refresh_settings_tables(self):
         """refresh container of settings table
@@ -544,6 +795,7 @@ class Config(dict):
         """
 
         self['connection'].dependencies.load()
+        self['_ownership'].clear()
 
     def empty_tmp_folder(self):
         """empty temporary folder
@@ -563,19 +815,44 @@ class Config(dict):
 
         self['_empty'] = []
 
-    def refresh(self):
+    def refresh(self, force=False):
         """refresh all containers and empty temporary folder
+
+        Parameters
+        ----------
+        force : bool
+            Rebuild all schemas and tables. Otherwise only the schemas
+            whose table definitions changed since the last refresh are
+            rebuilt. Defaults to False.
         """
 
-        self.pop('dynamicforms', None)
         self.pop('autoscriptforms', None)
         self.empty_tmp_folder()
-        self.refresh_dependencies()
-        self.refresh_schema()
-        self.refresh_tables()
-        self.refresh_settings_tables()
-        self.refresh_automaker_tables()
-        self.refresh_permissions()
+
+        checksums = self.schema_checksums()
+        if force:
+            changed = None
+        else:
+            changed = self.changed_schemas(checksums)
+
+        if changed is None:
+            self.pop('dynamicforms', None)
+        elif changed:
+            # only reset forms of tables within changed schemas
+            for forms in self['dynamicforms'].values():
+                for table_name in list(forms):
+                    if table_name.split('.')[0] in changed:
+                        forms.pop(table_name)
+
+        if changed is None or changed:
+            self.refresh_dependencies()
+            self.refresh_schema(changed)
+            self.refresh_tables(changed)
+            self.refresh_settings_tables()
+            self.refresh_automaker_tables()
+            self['_checksums'] = checksums
+
+        self.refresh_permissions(force=force)
 
     def get_dynamicform(
         self, table_name, table_class, dynamic_class, **kwargs
@@ -1,6 +1,8 @@
 """Basic utility functions
 """
 
+import inspect
+
 
 def is_manuallookup(table, ):
     """check if table is a manuallookup table
@@ -26,18 +28,237 @@ def is_manuallookup(table, ):
     return truth
 
 
-def save_join(tables):
+def as_instances(tables):
+    """instantiate table classes
+    """
+
+    return [
+        table() if inspect.isclass(table) else table
+        for table in tables
+    ]
+
+
+def join_projections(tables, skip_blobs=False):
+    """attributes of each table that are kept when joining the tables in
+    the given order: the primary key and the secondary attributes that
+    are not already secondary attributes of the tables before it.
+
+    Returns
+    -------
+    projections : list of lists
+        Secondary attributes to project for each table.
+    """
+
+    projections = []
+    secondary = set()
+    primary = set()
+
+    for table in tables:
+        proj = [
+            name for name in table.heading.secondary_attributes
+            if name not in secondary
+        ]
+        # same heading rules as joining relations in datajoint
+        secondary = (
+            (secondary - set(table.heading.primary_key))
+            | (set(proj) - primary)
+        )
+        primary |= set(table.heading.primary_key)
+        if skip_blobs:
+            non_blobs = set(table.heading.non_blobs)
+            proj = [name for name in proj if name in non_blobs]
+        projections.append(proj)
+
+    return projections
+
+
+def estimated_rows(tables):
+    """estimated number of rows of each table from the table statistics
+    of the database (None if unknown)
+    """
+
+    names = [
+        (getattr(table, 'database', None), getattr(table, 'table_name', None))
+        for table in tables
+    ]
+    known = [name for name in names if None not in name]
+    if not known:
+        return [None] * len(tables)
+
+    rows = dict(
+        ((schema, table_name), n)
+        for schema, table_name, n in tables[0].connection.query(
+            "SELECT table_schema, table_name, table_rows "
+            "FROM information_schema.tables WHERE "
+            + " OR ".join(
+                ["(table_schema = %s AND table_name = %s)"] * len(known)
+            ),
+            args=tuple(value for name in known for value in name)
+        ).fetchall()
+    )
+
+    return [rows.get(name, None) for name in names]
+
+
+def _foreign_keys(tables):
+    """pairs of tables (by index) that are directly connected by a foreign
+    key, also through renamed attributes.
+    """
+
+    dependencies = tables[0].connection.dependencies
+    if not dependencies:
+        dependencies.load()
+
+    index = {
+        getattr(table, 'full_table_name', None): n
+        for n, table in enumerate(tables)
+    }
+    pairs = set()
+    for name, n in index.items():
+        if name is None or name not in dependencies:
+            continue
+        for child in dependencies.successors(name):
+            # renamed foreign keys are stored as alias nodes
+            if child.isdigit():
+                children = dependencies.successors(child)
+            else:
+                children = [child]
+            for child in children:
+                if child in index:
+                    pairs.add(frozenset((n, index[child])))
+
+    return pairs
+
+
+def plan_join(tables, projections=None):
+    """order in which to join tables
+
+    Starting with the first table, the next table joined is one that
+    shares attributes with the tables already joined (i.e. is not a
+    cartesian product), preferably with a direct foreign key, and has
+    the fewest estimated rows. Tables that would be joined on an
+    attribute that is dependent in both relations are skipped for now.
+    If no such order exists, the given order is kept.
+
+    Parameters
+    ----------
+    tables : list of datajoint tables
+    projections : list of lists
+        Secondary attributes of each table (see `join_projections`).
+
+    Returns
+    -------
+    order : list of int
+        Indices of tables.
+    """
+
+    if len(tables) < 3:
+        return list(range(len(tables)))
+
+    tables = as_instances(tables)
+    if projections is None:
+        projections = join_projections(tables)
+
+    rows = estimated_rows(tables)
+    foreign_keys = _foreign_keys(tables)
+
+    order = [0]
+    primary = set(tables[0].heading.primary_key)
+    secondary = set(projections[0])
+    remaining = list(range(1, len(tables)))
+
+    while remaining:
+        candidates = []
+        for n in remaining:
+            table_primary = set(tables[n].heading.primary_key)
+            table_secondary = set(projections[n])
+            if table_secondary & secondary:
+                continue
+            shared = (primary | secondary) & (table_primary | table_secondary)
+            connected = any(
+                frozenset((m, n)) in foreign_keys for m in order
+            )
+            candidates.append((
+                not shared,
+                not connected,
+                float('inf') if rows[n] is None else rows[n],
+                n
+            ))
+
+        if not candidates:
+            return list(range(len(tables)))
+
+        n = min(candidates)[-1]
+        table_primary = set(tables[n].heading.primary_key)
+        secondary = (
+            (secondary - table_primary)
+            | (set(projections[n]) - primary)
+        )
+        primary |= table_primary
+        order.append(n)
+        remaining.remove(n)
+
+    return order
+
+
+def save_join(
+    tables, restriction=None, skip_blobs=False, plan=True, order=None
+):
     """savely join tables ignoring dependent attributes that match.
+
+    Dependent attributes that exist in multiple tables are taken from the
+    first table that contains them. The join does not depend on the
+    order in which the tables are joined (see `plan_join`).
+
+    Parameters
+    ----------
+    tables : list of datajoint tables
+    restriction : dict or other datajoint restriction
+        Restriction of the joined table. The attributes of a dictionary
+        are restricted on each table that contains them before the
+        tables are joined; other restrictions are applied to the
+        joined table.
+    skip_blobs : bool
+        Do not include blobs, attachments and filepaths of the tables.
+    plan : bool
+        Order the tables before joining them (see `plan_join`).
+    order : list of int
+        Indices of tables in the order to join them, e.g. as planned
+        before by `plan_join`; overrides `plan`.
     """
 
-    for n, table in enumerate(tables):
+    tables = as_instances(tables)
+    projections = join_projections(tables, skip_blobs)
+    pushdown = isinstance(restriction, dict)
+
+    relations = []
+    for table, proj in zip(tables, projections):
+        if len(proj) == len(table.heading.secondary_attributes):
+            relation = table
+        else:
+            relation = table.proj(*proj)
+        if pushdown:
+            names = set(relation.heading.names)
+            restrict = {
+                key: value for key, value in restriction.items()
+                if key in names
+            }
+            if restrict:
+                relation = relation & restrict
+        relations.append(relation)
 
+    if order is None and plan:
+        order = plan_join(tables, projections)
+    elif order is None:
+        order = list(range(len(tables)))
+
+    for n, index in enumerate(order):
         if n == 0:
-            joined_table = table
+            joined_table = relations[index]
         else:
-            dep1 = joined_table.heading.secondary_attributes
-            dep2 = table.heading.secondary_attributes
-            proj = list(set(dep2) - set(dep1))
-            joined_table = joined_table * table.proj(*proj)
+            joined_table = joined_table * relations[index]
+
+    if restriction is not None and not pushdown:
+        joined_table = joined_table & restriction
 
     return joined_table
@@ -0,0 +1,35 @@
+"""tests of chunked and compressed array storage
+"""
+
+import os
+
+import numpy as np
+
+from loris.database.chunked import write_chunked, ChunkedArrayReader
+
+
+def test_datetime_round_trip(tmp_path):
+    array = np.arange(
+        '2020-01-01', '2020-03-01', dtype='datetime64[D]'
+    ).astype('datetime64[ns]').reshape(-1, 4)
+    folder = os.path.join(str(tmp_path), 'datetimes')
+
+    # small chunks so that the array is split into several chunks
+    write_chunked(folder, array, chunk_bytes=64, codec='zlib')
+    reader = ChunkedArrayReader(folder)
+
+    assert reader.n_chunks > 1
+    assert reader.dtype == array.dtype
+    np.testing.assert_array_equal(reader.read(), array)
+    np.testing.assert_array_equal(reader[3:7], array[3:7])
+
+
+def test_timedelta_round_trip(tmp_path):
+    array = np.array([1, 2, 3], dtype='timedelta64[ms]')
+    folder = os.path.join(str(tmp_path), 'timedeltas')
+
+    write_chunked(folder, array, codec='zlib')
+
+    np.testing.assert_array_equal(
+        ChunkedArrayReader(folder).read(), array
+    )
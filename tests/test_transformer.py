@@ -0,0 +1,53 @@
+"""tests of the Transformer class
+"""
+
+import numpy as np
+import pandas as pd
+
+from loris.dataframe import Transformer
+
+
+def test_tolong_pads_ragged_timestamps_with_nat():
+    table = pd.DataFrame({
+        'entry': [1, 2],
+        'timestamps': [
+            np.array(
+                ['2020-01-01', '2020-01-02', '2020-01-03'],
+                dtype='datetime64[ns]'
+            ),
+            np.array(['2021-01-01'], dtype='datetime64[ns]'),
+        ]
+    })
+
+    long = Transformer(
+        table, datacols=['timestamps'], indexcols=['entry']
+    ).tolong(dropna=False)
+    long = long.sort_values(['entry', 'timestamps_0'])
+
+    assert long['timestamps'].dtype == np.dtype('datetime64[ns]')
+    assert list(long['entry']) == [1, 1, 1, 2, 2, 2]
+    assert list(long['timestamps']) == [
+        pd.Timestamp('2020-01-01'), pd.Timestamp('2020-01-02'),
+        pd.Timestamp('2020-01-03'), pd.Timestamp('2021-01-01'),
+        pd.NaT, pd.NaT
+    ]
+
+
+def test_tolong_drops_padding_of_ragged_timedeltas():
+    table = pd.DataFrame({
+        'entry': [1, 2],
+        'durations': [
+            np.array([1, 2], dtype='timedelta64[s]'),
+            np.array([3], dtype='timedelta64[s]'),
+        ]
+    })
+
+    long = Transformer(
+        table, datacols=['durations'], indexcols=['entry']
+    ).tolong(dropna=True)
+
+    assert long['durations'].dtype.kind == 'm'
+    assert sorted(long['durations']) == [
+        pd.Timedelta(seconds=1), pd.Timedelta(seconds=2),
+        pd.Timedelta(seconds=3)
+    ]